@@ -1,6 +1,19 @@
 # coding=utf-8
-from . import yolo_host
-from . import tcp_streaming_server_host
-from . import tcp_streaming_client_host
-from . import tcp_streaming_server_host_config_focus
-from . import modbus_tcp_io_test
+# The console scripts are "poe_host:<module>.cli": each one only imports its own module, not the dependencies and the
+# command line parsing of the others
+from importlib import import_module
+
+__all__ = [
+    "yolo_host",
+    "tcp_streaming_server_host",
+    "tcp_streaming_client_host",
+    "tcp_streaming_server_host_config_focus",
+    "tcp_streaming_server_host_dual",
+    "modbus_tcp_io_test",
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
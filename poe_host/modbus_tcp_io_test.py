@@ -10,10 +10,10 @@ from pyModbusTCP.client import ModbusClient
 parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
 parser.add_argument("-H", "--host", type=str, default="169.254.1.222", help="Host")
 parser.add_argument("-p", "--port", type=int, default=5000, help="TCP port")
-args = parser.parse_args()
 
 
 def cli():
+    args = parser.parse_args()
     # init modbus client
     client = ModbusClient(host=args.host, port=args.port, auto_open=True, debug=False)
     bit = True
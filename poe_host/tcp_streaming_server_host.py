@@ -8,7 +8,6 @@ import numpy as np
 parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
 parser.add_argument("-H", "--host", type=str, default="169.254.1.222", help="Host")
 parser.add_argument("-p", "--port", type=int, default=5000, help="TCP port")
-args = parser.parse_args()
 
 
 def get_frame(socket, size):
@@ -23,6 +22,7 @@ def get_frame(socket, size):
 
 
 def cli():
+    args = parser.parse_args()
     sock = socket.socket()
     sock.connect((args.host, args.port))
 
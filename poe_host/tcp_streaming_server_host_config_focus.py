@@ -8,7 +8,8 @@ import numpy as np
 parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
 parser.add_argument("-H", "--host", type=str, default="169.254.1.222", help="Host")
 parser.add_argument("-p", "--port", type=int, default=5000, help="TCP port")
-args = parser.parse_args()
+parser.add_argument("-rs", "--roi_size", type=int, nargs=2, default=(0, 0), metavar=("WIDTH", "HEIGHT"),
+                    help="Size the device scales the ROI to, 0 0 keeps the size of the cropped region")
 
 
 def get_frame(socket, size):
@@ -29,11 +30,43 @@ def send_lens_pos(socket, value):
     socket.send(bytes(header, encoding="ascii"))
 
 
+def send_roi(socket, roi, size):
+    # Normalized coordinates with 2 decimals fit the 32 bytes record, eg. "ROI,.25,.25,.75,.75,1280,720"
+    coords = ",".join(f"{v:.2f}".lstrip("0") for v in roi)
+    header = f"ROI,{coords},{size[0]},{size[1]}".ljust(32)
+    print(f"Setting ROI to", roi)
+    socket.send(bytes(header, encoding="ascii"))
+
+
+def select_roi(frame, roi):
+    """
+    Let the user draw a rectangle on the displayed frame, mapped back to the full frame.
+
+    :param roi: normalized (xmin, ymin, xmax, ymax) the displayed frame was cropped from
+    :return: the new normalized roi, or None if the selection was cancelled
+    """
+    x, y, w, h = cv2.selectROI("color", frame, showCrosshair=False)
+    if not w or not h:
+        return None
+    height, width = frame.shape[:2]
+    scale_x, scale_y = roi[2] - roi[0], roi[3] - roi[1]
+    return (
+        roi[0] + x / width * scale_x,
+        roi[1] + y / height * scale_y,
+        roi[0] + (x + w) / width * scale_x,
+        roi[1] + (y + h) / height * scale_y,
+    )
+
+
 def cli():
+    args = parser.parse_args()
     sock = socket.socket()
     sock.connect((args.host, args.port))
 
     lensPos = 100
+    fullRoi = (0.0, 0.0, 1.0, 1.0)
+    roi = fullRoi
+    frame = None
 
     try:
         while True:
@@ -58,6 +91,14 @@ def cli():
             elif key == ord(",") and 0 < lensPos:  # lensPos --
                 lensPos -= 1
                 send_lens_pos(sock, lensPos)
+            elif key == ord("r") and frame is not None:  # crop to a region of the current view
+                newRoi = select_roi(frame, roi)
+                if newRoi:
+                    roi = newRoi
+                    send_roi(sock, roi, args.roi_size)
+            elif key == ord("f"):  # back to the full frame
+                roi = fullRoi
+                send_roi(sock, roi, (0, 0))
 
     except Exception as e:
         print("Error:", e)
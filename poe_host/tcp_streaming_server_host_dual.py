@@ -0,0 +1,67 @@
+# coding=utf-8
+import argparse
+import socket
+
+import cv2
+import numpy as np
+
+parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument("-H", "--host", type=str, default="169.254.1.222", help="Host")
+parser.add_argument("-p", "--port", type=int, default=5000, help="TCP port")
+parser.add_argument("-t", "--threshold", type=float, default=1.25,
+                    help="Switch to the full resolution stream when the window is this much larger than the preview")
+
+
+def get_frame(socket, size):
+    # Never read past `size`, the next message may already be waiting in the socket
+    bytes = b""
+    while len(bytes) < size:
+        chunk = socket.recv(min(4096, size - len(bytes)))
+        if not chunk:
+            raise ConnectionError("Connection closed by the device")
+        bytes += chunk
+    return bytes
+
+
+def want_full(preview_shape, full, threshold):
+    """Pick the stream from the size of the window, with some hysteresis to avoid flapping."""
+    _, _, width, height = cv2.getWindowImageRect("color")
+    ratio = max(width / preview_shape[1], height / preview_shape[0])
+    return ratio > (1 if full else threshold)
+
+
+def cli():
+    args = parser.parse_args()
+    sock = socket.socket()
+    sock.connect((args.host, args.port))
+    cv2.namedWindow("color", cv2.WINDOW_NORMAL)
+
+    full = False
+    previewShape = None
+    try:
+        while True:
+            header = sock.recv(32, socket.MSG_WAITALL).decode("ascii")
+            chunks = header.split()
+            img = get_frame(sock, int(chunks[2]))
+            if chunks[0] in ("THUMB", "FULL"):
+                frame = cv2.imdecode(np.frombuffer(img, dtype=np.byte), cv2.IMREAD_COLOR)
+                if chunks[0] == "THUMB":
+                    previewShape = frame.shape
+                cv2.imshow("color", frame)
+
+            if previewShape is not None and want_full(previewShape, full, args.threshold) != full:
+                full = not full
+                print("Switching to the", "full resolution" if full else "preview", "stream")
+                # Subscribe to the new stream before leaving the old one, so the window never starves
+                sock.sendall(b"SUB full\nUNSUB preview\n" if full else b"SUB preview\nUNSUB full\n")
+
+            if cv2.waitKey(1) == ord("q"):
+                break
+    except Exception as e:
+        print("Error:", e)
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    cli()
@@ -2,6 +2,7 @@
 import argparse
 import json
 import socket
+import time
 from collections import deque
 
 import cv2
@@ -21,26 +22,31 @@ except:
 parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
 parser.add_argument("-H", "--host", type=str, default="169.254.1.222", help="Host")
 parser.add_argument("-p", "--port", type=int, default=5000, help="TCP port")
-args = parser.parse_args()
+parser.add_argument("-d", "--detections_only", action="store_true",
+                    help="Receive only the detections, plus a snapshot of a detected frame at most once per second")
 
 
 def get_frame(socket, size):
-    bytes = socket.recv(4096)
-    while True:
-        read = 4096
-        if size - len(bytes) < read:
-            read = size - len(bytes)
-        bytes += socket.recv(read)
-        if size == len(bytes):
-            return bytes
+    # Never read past `size`, the next message may already be waiting in the socket
+    bytes = b""
+    while len(bytes) < size:
+        chunk = socket.recv(min(4096, size - len(bytes)))
+        if not chunk:
+            raise ConnectionError("Connection closed by the device")
+        bytes += chunk
+    return bytes
 
 
 dets_queue = deque()
 
 
 def cli():
+    args = parser.parse_args()
     sock = socket.socket()
     sock.connect((args.host, args.port))
+    if args.detections_only:
+        sock.sendall(b"UNSUB frame\n")
+    lastSnap = 0
 
     fps = FPSHandler()
     while True:
@@ -55,7 +61,20 @@ def cli():
             # print(f"{data = }")
             dets_queue.append(json.loads(data))
             # print(f"{dets_queue[-1] = }")
-        elif chunks[0] == "FRAME":
+            if args.detections_only:
+                # Keep only the detections of the frame we ask a snapshot of
+                detections = dets_queue.pop()
+                print(detections)
+                if time.monotonic() - lastSnap > 1:
+                    lastSnap = time.monotonic()
+                    dets_queue.clear()
+                    dets_queue.append(detections)
+                    sock.sendall(f"SNAP {detections[0]['seq']}\n".encode("ascii"))
+        elif chunks[0] == "NOSNAP":
+            print("Snapshot not available anymore")
+        elif chunks[0] == "EVENT":
+            print("Event:", json.loads(get_frame(sock, int(chunks[2]))))
+        elif chunks[0] in ("FRAME", "SNAP"):
             fps.tick("FRAME")
             # print(f">{header}<")
             ts = float(chunks[1])
@@ -1,23 +1,22 @@
 # coding=utf-8
-
-from . import (
-    standalone,
-    utils,
-    script_http_server,
-    script_mjpeg_server,
-    tcp_streaming_client,
-    tcp_streaming_server,
-    yolo,
-    modbus_tcp,
-)
+import importlib
 
 __all__ = [
     "standalone",
     "utils",
     "script_http_server",
     "script_mjpeg_server",
+    "script_video_still_server",
     "tcp_streaming_client",
     "tcp_streaming_server",
     "yolo",
     "modbus_tcp",
+    "multi_protocol_server",
 ]
+
+
+def __getattr__(name):
+    # Submodules are imported on first access, importing the package must not pay for all the pipelines
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -8,8 +8,10 @@ from loguru import logger
 from string import Template
 try:
     from poe_standalone.utils import getDeviceInfo
+    from poe_standalone.script_tools import set_script
 except ImportError:
     from utils import getDeviceInfo
+    from script_tools import set_script
 
 
 def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
@@ -67,7 +69,8 @@ def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
             node.warn(f"Serving at {get_ip_address('re0')}:{PORT}")
             httpd.serve_forever()
     """)
-    script.setScript(
+    set_script(
+        script,
         scrpt_str.safe_substitute(_PORT=port)
     )
 
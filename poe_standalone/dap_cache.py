@@ -0,0 +1,109 @@
+# coding=utf-8
+"""
+Content-addressed cache of the Depthai Application Packages, so that a pipeline is only compressed once per build.
+"""
+import hashlib
+import json
+import os
+import threading
+
+try:
+    from poe_standalone.fingerprint import package_fingerprint
+    from poe_standalone.utils import CACHE_DIR
+except ImportError:
+    from fingerprint import package_fingerprint
+    from utils import CACHE_DIR
+
+DAP_CACHE_DIR = CACHE_DIR / "dap"
+MAX_PACKAGES = 20
+
+
+def pipeline_digest(pipeline, compress=True) -> str:
+    """
+    Hash of what the package of `pipeline` is made of: the serialized pipeline, its assets (scripts, blobs...),
+    the depthai version, which brings the device firmware, and the compression setting.
+    """
+    import depthai as dai
+
+    serialized = pipeline.serializeToJson()
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        "depthai": dai.__version__,
+        "compress": compress,
+        "pipeline": serialized["pipeline"],
+        "assets": serialized["assets"],
+    }, sort_keys=True).encode())
+    digest.update(bytes(serialized["assetStorage"]))
+    return digest.hexdigest()
+
+
+class DapCache:
+    """
+    Built packages in `directory`, named by their `pipeline_digest`, the least recently used beyond `max_packages` are
+    deleted.
+    """
+
+    def __init__(self, directory=DAP_CACHE_DIR, max_packages=MAX_PACKAGES):
+        self.directory = directory
+        self.max_packages = max_packages
+        self.lock = threading.Lock()
+
+    def path(self, digest):
+        return self.directory / f"{digest}.dap"
+
+    def get(self, pipeline, compress=True):
+        """
+        :return: (digest, path) of the package of `pipeline`, built on a miss
+        """
+        import depthai as dai
+
+        digest = pipeline_digest(pipeline, compress)
+        path = self.path(digest)
+        with self.lock:
+            if path.exists():
+                os.utime(path)
+                return digest, path
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Written aside then renamed, a parallel build never reads a partial package
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            dai.DeviceBootloader.saveDepthaiApplicationPackage(str(tmp), pipeline, compress=compress)
+            os.replace(tmp, path)
+            self.prune()
+        return digest, path
+
+    def load(self, pipeline, compress=True):
+        """:return: (digest, package) ready for `DeviceBootloader.flashDepthaiApplicationPackage`"""
+        import numpy as np
+
+        digest, path = self.get(pipeline, compress)
+        return digest, np.fromfile(path, dtype="uint8")
+
+    def prune(self):
+        packages = sorted(self.directory.glob("*.dap"), key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in packages[self.max_packages:]:
+            try:
+                path.unlink()
+            except FileNotFoundError:  # Pruned by a parallel invocation
+                pass
+
+
+def package_manifest(pipeline, path, digest=None) -> dict:
+    """
+    What a built package holds, to ship next to it: its size and fingerprint, the nodes and the assets with their sizes.
+
+    :param path: the package built from `pipeline`
+    :param digest: its `pipeline_digest`, computed if not given
+    """
+    import depthai as dai
+
+    serialized = pipeline.serializeToJson()
+    nodes = sorted(pipeline.getAllNodes(), key=lambda node: node.id)
+    return {
+        "package": path.name,
+        "size": path.stat().st_size,
+        "fingerprint": package_fingerprint(path.read_bytes()),
+        "digest": digest or pipeline_digest(pipeline),
+        "depthai": dai.__version__,
+        "nodes": [{"id": node.id, "name": node.getName()} for node in nodes],
+        "assets": [{"key": key, "size": asset["size"]} for key, asset in sorted(serialized["assets"]["map"].items())],
+    }
@@ -0,0 +1,98 @@
+# coding=utf-8
+"""
+On-disk cache of the discovered OAK POE devices, so that commands targeting a known device skip the discovery broadcasts.
+"""
+import json
+import os
+import threading
+import time
+from ipaddress import IPv4Address
+from pathlib import Path
+
+from validators.ip_address import ipv4
+
+try:
+    from poe_standalone.utils import CACHE_DIR
+except ImportError:
+    from utils import CACHE_DIR
+
+CACHE_PATH = CACHE_DIR / "devices.json"
+DEFAULT_TTL = 600
+
+
+class DeviceCache:
+    """
+    MXID, IP, state and last seen time of the discovered devices, in a JSON file shared by every CLI invocation.
+
+    :param path: the cache file
+    :param ttl: seconds an entry is trusted after the device was last seen, 0 disables the cache
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+    def load(self) -> dict:
+        """:return: the entries by MXID, eg. {"14442C10D13EABCE00": {"mxid": ..., "ip": ..., "state": ..., "last_seen": ...}}"""
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, entries):
+        # Written aside then renamed, parallel invocations never read a partial file
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(entries, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def fresh(self) -> list:
+        """:return: the entries seen within the TTL, sorted by IP"""
+        now = time.time()
+        entries = [entry for entry in self.load().values() if now - entry["last_seen"] <= self.ttl]
+        return sorted(entries, key=lambda entry: int(IPv4Address(entry["ip"])))
+
+    def find(self, device):
+        """:return: the fresh entry whose IP or MXID is `device`, or None"""
+        for entry in self.fresh():
+            if device in (entry["ip"], entry["mxid"]):
+                return entry
+        return None
+
+    def discover(self) -> list:
+        """Discover the POE devices now and record them, the other entries are kept until they expire."""
+        import depthai as dai
+
+        device_infos = [device_info for device_info in dai.Device.getAllAvailableDevices() if ipv4(device_info.name)]
+        device_infos.sort(key=lambda device_info: int(IPv4Address(device_info.name)))
+        now = time.time()
+        with self.lock:
+            entries = self.load()
+            for device_info in device_infos:
+                entries[device_info.getMxId()] = {
+                    "mxid": device_info.getMxId(),
+                    "ip": device_info.name,
+                    "state": device_info.state.name,
+                    "last_seen": now,
+                }
+            self.save(entries)
+        return device_infos
+
+    def discover_in_background(self) -> threading.Thread:
+        """Refresh the cache without holding the command back, the thread doesn't keep the CLI from exiting."""
+        thread = threading.Thread(target=self.discover, name="device-discovery", daemon=True)
+        thread.start()
+        return thread
+
+
+def connect_info(ip) -> "dai.DeviceInfo":
+    """
+    Device info to connect straight to `ip`, depthai only searches that address instead of broadcasting.
+
+    Its state is X_LINK_ANY_STATE, the state of the device is only known once connected.
+    """
+    import depthai as dai
+
+    return dai.DeviceInfo(ip)
@@ -0,0 +1,76 @@
+# coding=utf-8
+"""
+Fingerprint of the flashed application, kept in the bootloader config next to the network settings, so that flashing
+the package the device already runs can be skipped.
+"""
+import hashlib
+
+CONFIG_KEY = "poeStandalone"
+
+
+def package_fingerprint(package) -> str:
+    """sha256 of the application package bytes."""
+    return hashlib.sha256(bytes(package)).hexdigest()
+
+
+def read_config(bootloader):
+    """
+    :return: the bootloader config, or None if it can't be read. Writing a default config instead would reset the
+        network settings of the device, eg. its static IP, so the fingerprint is then neither checked nor stored.
+    """
+    try:
+        return bootloader.readConfigData()
+    except RuntimeError:
+        return None
+
+
+def has_application(bootloader) -> bool:
+    import depthai as dai
+
+    try:
+        return bootloader.readApplicationInfo(dai.DeviceBootloader.Memory.FLASH).hasApplication
+    except RuntimeError:  # Bootloader too old to tell, the fingerprint is cleared along with the application anyway
+        return True
+
+
+def flash_package(bootloader, package, progress, force=False):
+    """
+    Flash `package` unless the fingerprint stored on the device says it already runs it, or `force`.
+
+    The stored fingerprint is removed before flashing, so that it never outlives a partially overwritten application,
+    and written once the package is flashed. When the config can't be read the package is flashed without it.
+
+    :return: (success, message) like the DeviceBootloader methods
+    """
+    fingerprint = package_fingerprint(package)
+    config = read_config(bootloader)
+    if config is None:
+        success, error = bootloader.flashDepthaiApplicationPackage(progress, package)
+        message = f"flashed {fingerprint[:12]}, the bootloader config can't be read, fingerprint not stored"
+        return success, error if not success else message
+    stored = config.get(CONFIG_KEY, {}).get("fingerprint")
+    if stored == fingerprint and not force and has_application(bootloader):
+        progress(1.0)
+        return True, f"skipped, already running {fingerprint[:12]}"
+    if stored is not None:
+        del config[CONFIG_KEY]
+        success, error = bootloader.flashConfigData(config)
+        if not success:
+            return success, error
+    success, error = bootloader.flashDepthaiApplicationPackage(progress, package)
+    if not success:
+        return success, error
+    config[CONFIG_KEY] = {"fingerprint": fingerprint}
+    success, error = bootloader.flashConfigData(config)
+    return success, error if not success else f"flashed {fingerprint[:12]}"
+
+
+def clear_application(bootloader):
+    """Clear the flashed application and its fingerprint, see `DeviceBootloader.flashClear`."""
+    config = read_config(bootloader)
+    if config is not None and CONFIG_KEY in config:
+        del config[CONFIG_KEY]
+        success, error = bootloader.flashConfigData(config)
+        if not success:
+            return success, error
+    return bootloader.flashClear()
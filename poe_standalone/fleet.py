@@ -0,0 +1,154 @@
+# coding=utf-8
+"""
+Run a bootloader operation on many devices at once: a bounded pool of workers, a progress bar per device, retries and
+a summary of the results.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from rich.console import Console
+from rich.progress import BarColumn, Progress, TextColumn, TimeElapsedColumn
+from rich.table import Table
+from validators.ip_address import ipv4
+
+try:
+    from poe_standalone.dap_cache import DapCache
+    from poe_standalone.discovery import connect_info
+    from poe_standalone.utils import get_local_ip
+except ImportError:
+    from dap_cache import DapCache
+    from discovery import connect_info
+    from utils import get_local_ip
+
+
+@dataclass
+class FleetResult:
+    device: str
+    ok: bool = False
+    message: str = ""
+    attempts: int = 0
+    seconds: float = 0.0
+
+
+def resolve_devices(targets, cache) -> dict:
+    """
+    Device infos of the targets: IPs are connected to directly, MXIDs through the discovery cache, "all" discovers.
+
+    :param targets: IPs, MXIDs or "all"
+    :param cache: the `discovery.DeviceCache`
+    :return: dict mapping each target, or the IP of each discovered device, to its device info
+    :raises ValueError: for MXIDs that can't be found
+    """
+    devices = {}
+    missing = []
+    for target in targets:
+        if target.lower() == "all":
+            devices.update((device_info.name, device_info) for device_info in cache.discover())
+        elif ipv4(target):
+            devices[target] = connect_info(target)
+        else:
+            entry = cache.find(target)
+            if entry is None:
+                missing.append(target)
+            else:
+                devices[target] = connect_info(entry["ip"])
+    if missing:
+        discovered = {device_info.getMxId(): device_info for device_info in cache.discover()}
+        unknown = [mxid for mxid in missing if mxid not in discovered]
+        if unknown:
+            raise ValueError(f"No OAK POE device found with the MXID {', '.join(unknown)}")
+        devices.update((mxid, discovered[mxid]) for mxid in missing)
+    return devices
+
+
+def run_fleet(devices, operation, workers=8, retries=2, retry_delay=3.0, console=None) -> list:
+    """
+    Call `operation(device_info, progress)` for every device, `workers` at a time.
+
+    `operation` reports its progress as a fraction with `progress`, like the DeviceBootloader callbacks, and returns a
+    (success, message) tuple like the DeviceBootloader methods. Failures and exceptions are retried `retries` times,
+    an exception only fails its device, eg. a package that doesn't build.
+
+    :param devices: dict mapping names to device infos, see `resolve_devices`
+    :return: a FleetResult per device, in the order of `devices`
+    """
+    console = console or Console()
+    results = {name: FleetResult(name) for name in devices}
+    columns = (TextColumn("{task.fields[device]:<18}"), BarColumn(), TextColumn("{task.percentage:>6.1f}%"),
+               TimeElapsedColumn(), TextColumn("{task.fields[status]}"))
+    with Progress(*columns, console=console) as progress:
+        tasks = {name: progress.add_task("", total=1.0, device=name, status="queued") for name in devices}
+        overall = progress.add_task("", total=len(devices), device="all devices", status="")
+
+        def work(name):
+            result = results[name]
+            task = tasks[name]
+            start = time.monotonic()
+            for attempt in range(1, retries + 2):
+                result.attempts = attempt
+                progress.update(task, completed=0, status=f"attempt {attempt}" if attempt > 1 else "running")
+                try:
+                    result.ok, result.message = operation(devices[name], lambda p: progress.update(task, completed=p))
+                except Exception as ex:
+                    result.ok, result.message = False, str(ex) or type(ex).__name__
+                if result.ok:
+                    break
+                if attempt <= retries:
+                    progress.update(task, status=f"retrying: {result.message}")
+                    time.sleep(retry_delay)
+            result.seconds = time.monotonic() - start
+            if result.ok:
+                progress.update(task, completed=1.0, status="[green]done")
+            else:
+                # The bar stays where the last attempt stopped
+                progress.update(task, status=f"[red]failed: {result.message}")
+            progress.advance(overall)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fleet") as executor:
+            # list() re-raises what the workers didn't catch
+            list(executor.map(work, devices))
+    return [results[name] for name in devices]
+
+
+def print_summary(results, console=None):
+    console = console or Console()
+    table = Table(title=f"{sum(result.ok for result in results)}/{len(results)} devices succeeded")
+    for column in ("Device", "Result", "Attempts", "Seconds", "Message"):
+        table.add_column(column)
+    for result in results:
+        table.add_row(result.device, "[green]ok" if result.ok else "[red]failed", str(result.attempts),
+                      f"{result.seconds:.1f}", result.message)
+    console.print(table)
+
+
+class PackageCache:
+    """
+    The application package of each host IP, loaded from the `DapCache` or built on first use, and shared by the
+    workers. Host IPs whose packages have the same digest share one, eg. for a pipeline that doesn't embed the host IP.
+
+    :param create_pipeline: called with `device_ip=...`, see `standalone.build_pipeline`
+    :param host_ip: the --host_ip option, when given every device gets the same package
+    """
+
+    def __init__(self, create_pipeline, host_ip=None):
+        self.create_pipeline = create_pipeline
+        self.host_ip = host_ip
+        # Digest of the package of each host IP, and the packages by digest
+        self.digests = {}
+        self.packages = {}
+        self.dap_cache = DapCache()
+        self.lock = threading.Lock()
+
+    def get(self, device_ip):
+        import numpy as np
+
+        host_ip = self.host_ip or get_local_ip(device_ip)
+        with self.lock:
+            if host_ip not in self.digests:
+                digest, path = self.dap_cache.get(self.create_pipeline(device_ip=device_ip))
+                if digest not in self.packages:
+                    self.packages[digest] = np.fromfile(path, dtype="uint8")
+                self.digests[host_ip] = digest
+            return self.packages[self.digests[host_ip]]
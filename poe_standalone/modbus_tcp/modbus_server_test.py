@@ -9,8 +9,10 @@ from loguru import logger
 from string import Template
 try:
     from poe_standalone.utils import getDeviceInfo
+    from poe_standalone.script_tools import set_script
 except ImportError:
     from utils import getDeviceInfo
+    from script_tools import set_script
 
 
 def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
@@ -65,7 +67,8 @@ while 1:
     server.data_bank.set_holding_registers(0, [int(time.time()) % (24*3600) // 10])
     time.sleep(5)
     """)
-    script.setScript(
+    set_script(
+        script,
         scrpt_str.safe_substitute(_PORT=port, _pyModbusTCP=(Path(__file__).parent / "pyModbusTCP.py").read_text())
     )
 
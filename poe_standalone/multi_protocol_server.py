@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import json
+import time
+from pathlib import Path
+from string import Template
+from textwrap import dedent
+
+import click
+import depthai as dai
+
+try:
+    from poe_standalone.utils import check_send_policy, getDeviceInfo, read_script_lib
+    from poe_standalone.script_tools import set_script
+except ImportError:
+    from utils import check_send_policy, getDeviceInfo, read_script_lib
+    from script_tools import set_script
+
+SERVICES = {"tcp": None, "mjpeg": 8080, "snapshot": 8080, "modbus": 502}
+HTTP_SERVICES = ("mjpeg", "snapshot")
+
+
+def get_services(port=5000, config_path=None, services=None):
+    """
+    Ports of the enabled services, from the defaults, then the "services" of the config file, then `services`.
+
+    A service set to None or false is disabled. mjpeg and snapshot may share an HTTP port, the TCP stream defaults to `port`.
+
+    :return: dict mapping each service name to its port or None
+    """
+    ports = dict(SERVICES, tcp=port)
+    if config_path:
+        with Path(config_path).open() as f:
+            ports.update(json.load(f).get("services", {}))
+    ports.update(services or {})
+    unknown = set(ports) - set(SERVICES)
+    if unknown:
+        raise ValueError(f"Unknown services {sorted(unknown)}, expected some of {list(SERVICES)}")
+    ports = {name: int(value) if value else None for name, value in ports.items()}
+    used = [ports[name] for name in ("tcp", "modbus") if ports[name]]
+    used += {ports[name] for name in HTTP_SERVICES if ports[name]}
+    if len(used) != len(set(used)):
+        raise ValueError(f"Services can't share a port, except {' and '.join(HTTP_SERVICES)}: {ports}")
+    return ports
+
+
+def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None, services=None, send_policy="drop-oldest",
+                    stall_ms=2000, frame_history=60, frame_history_bytes=4 * 1024 * 1024, queue_depth=2):
+    """
+    One MJPEG encoder shared by a TCP stream, an HTTP MJPEG stream, HTTP snapshots and a Modbus server.
+
+    - tcp: frames framed like the tcp_streaming_server ("ABCDE " messages), with the Hub send policies.
+      "RANGE [seq|ts] <start> <end>" fetches the recent frames in a range, see `serve_ranges`.
+    - mjpeg: "/video" multipart MJPEG stream.
+    - snapshot: "/img", the next frame of the stream as one JPEG.
+      "/frames?from=<start>&to=<end>[&by=ts]" the recent frames in a range, as a multipart/mixed response whose parts
+      carry X-Seq and X-Timestamp headers.
+    - modbus: holding registers 0-3 hold the frame count (modulo 65536), the frame rate, the TCP clients and the
+      HTTP viewers, updated every second.
+
+    :param config_path: optional JSON file with a "services" object, eg. {"services": {"modbus": null, "mjpeg": 8081}}
+    :param services: dict overriding the ports of the config file, see `get_services`
+    :param send_policy: what the queue of a slow TCP client does, "drop-oldest", "drop-to-keyframe" or "disconnect"
+    :param stall_ms: how long a TCP client or HTTP viewer may not take any data before it is disconnected
+    :param frame_history: how many recent frames the script keeps for range requests, 0 disables them
+    :param frame_history_bytes: memory budget of the kept frames, the oldest are dropped beyond it, 0 for no limit
+    :param queue_depth: frames queued per TCP client before the send policy applies
+    """
+    check_send_policy(send_policy, queue_depth)
+    ports = get_services(port, config_path, services)
+    http_routes = {}
+    for name in HTTP_SERVICES:
+        if ports[name]:
+            http_routes.setdefault(ports[name], []).append(name)
+
+    # Start defining a pipeline
+    pipeline = dai.Pipeline()
+
+    # Define a source - color camera
+    camRgb = pipeline.create(dai.node.ColorCamera)
+    camRgb.setBoardSocket(dai.CameraBoardSocket.RGB)
+    camRgb.setResolution(dai.ColorCameraProperties.SensorResolution.THE_1080_P)
+
+    # The only encoder, every protocol reads its output
+    videoEnc = pipeline.create(dai.node.VideoEncoder)
+    videoEnc.setDefaultProfilePreset(camRgb.getFps(), dai.VideoEncoderProperties.Profile.MJPEG)
+    camRgb.video.link(videoEnc.input)
+
+    # Script node
+    script = pipeline.create(dai.node.Script)
+    script.setProcessor(dai.ProcessorType.LEON_CSS)
+    videoEnc.bitstream.link(script.inputs['frame'])
+    script.inputs['frame'].setBlocking(False)
+    script.inputs['frame'].setQueueSize(1)
+
+    scrpt_str = Template(dedent("""
+        import time
+        import socket
+        import fcntl
+        import struct
+        import threading
+        from socketserver import ThreadingMixIn
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        from urllib.parse import urlsplit, parse_qs
+        ${_script_lib}
+        ${_pyModbusTCP}
+
+        TCP_PORT = ${_tcp_port}
+        MODBUS_PORT = ${_modbus_port}
+        HTTP_ROUTES = ${_http_routes}
+        STALL_S = ${_stall_ms} / 1000
+        JPEG_RESPONSE = b"HTTP/1.1 200 OK\\r\\nContent-Type: image/jpeg\\r\\nContent-Length: %d\\r\\n\\r\\n"
+        PART_HEADER = b"--jpgboundary\\r\\nContent-type: image/jpeg\\r\\nContent-length: %d\\r\\n\\r\\n"
+        PART_END = b"\\r\\n"
+        RANGE_RESPONSE = b"HTTP/1.1 200 OK\\r\\nContent-Type: multipart/mixed; boundary=frame\\r\\nContent-Length: %d\\r\\n\\r\\n"
+        RANGE_PART_HEADER = b"--frame\\r\\nContent-Type: image/jpeg\\r\\nContent-Length: %d\\r\\nX-Seq: %d\\r\\nX-Timestamp: %.6f\\r\\n\\r\\n"
+        RANGE_END = b"--frame--\\r\\n"
+
+        # The main loop pulls every frame once, the HTTP threads read the latest one from here
+        frames = LatestValue()
+        # The recent frames for range requests, appended by the main loop and read from any thread
+        history = FrameRing(${_frame_history}, ${_frame_history_bytes})
+        viewers = [0]
+        viewers_lock = threading.Lock()
+
+        def get_ip_address(ifname):
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            return socket.inet_ntoa(fcntl.ioctl(
+                s.fileno(),
+                -1071617759,  # SIOCGIFADDR
+                struct.pack('256s', ifname[:15].encode())
+            )[20:24])
+
+        class ThreadingSimpleServer(ThreadingMixIn, HTTPServer):
+            pass
+
+        class HTTPHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                routes = HTTP_ROUTES[self.server.server_address[1]]
+                url = urlsplit(self.path)
+                if url.path == '/':
+                    links = ''.join(f'<a href="{path}">{path}</a> ' for path, name in (("video", "mjpeg"), ("img", "snapshot"))
+                                    if name in routes)
+                    self.reply(200, f'<h1>[DepthAI] Hello, world!</h1><p>{links}</p>'.encode())
+                elif url.path == '/video' and "mjpeg" in routes:
+                    self.stream()
+                elif url.path == '/img' and "snapshot" in routes:
+                    seq, frame = frames.wait(frames.seq, STALL_S)
+                    if frame is None:
+                        # Connected before the first frame
+                        self.reply(503, b'No frame yet, try again')
+                    else:
+                        send_framed(self.connection, (JPEG_RESPONSE % len(frame[1]), frame[1]))
+                elif url.path == '/frames' and "snapshot" in routes:
+                    self.send_range(url.query)
+                else:
+                    self.reply(404, b'Url not found...')
+
+            def reply(self, code, body):
+                self.send_response(code)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_range(self, query):
+                params = {name: values[0] for name, values in parse_qs(query).items()}
+                try:
+                    selected = history.between(*parse_range(
+                        f"{params.get('by', 'seq')} {params.get('from', '')} {params.get('to', '')}"))
+                except ValueError:
+                    self.reply(400, b'Expected from=<start>&to=<end>[&by=seq|ts]')
+                    return
+                buffers = []
+                for seq, ts, data in selected:
+                    buffers += (RANGE_PART_HEADER % (len(data), seq, ts.total_seconds()), data, PART_END)
+                buffers.append(RANGE_END)
+                send_framed(self.connection, [RANGE_RESPONSE % buffers_size(buffers)] + buffers)
+
+            def stream(self):
+                self.send_response(200)
+                self.send_header('Content-type', 'multipart/x-mixed-replace; boundary=--jpgboundary')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                self.close_connection = True
+                self.connection.settimeout(STALL_S)
+                with viewers_lock:
+                    viewers[0] += 1
+                seq = 0
+                try:
+                    while True:
+                        seq, (ts, data) = frames.wait(seq)
+                        send_framed(self.connection, (PART_HEADER % len(data), data, PART_END))
+                except OSError as ex:
+                    node.warn(f"Client disconnected {self.client_address}: {ex!r}")
+                finally:
+                    with viewers_lock:
+                        viewers[0] -= 1
+
+        ip = get_ip_address('re0')
+        for http_port, routes in HTTP_ROUTES.items():
+            httpd = ThreadingSimpleServer(("", http_port), HTTPHandler)
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+            node.warn(f"HTTP {'/'.join(routes)} at {ip}:{http_port}")
+
+        modbus = None
+        if MODBUS_PORT:
+            modbus = ModbusServer(host="", port=MODBUS_PORT, no_block=True)
+            modbus.start()
+            node.warn(f"ModbusServer at {ip}:{MODBUS_PORT}")
+
+        hub = None
+        if TCP_PORT:
+            hub = Hub(TCP_PORT, ("frame",), {"frame": SendPolicy("${_send_policy}", depth=${_queue_depth}, stall_ms=${_stall_ms})})
+            serve_ranges(hub, history)
+            node.warn(f"TCP stream at {ip}:{TCP_PORT}")
+
+        count = 0
+        counted = 0
+        counted_at = time.monotonic()
+        while True:
+            if hub is not None:
+                hub.poll(0.005)
+                pck = node.io['frame'].tryGet()
+            else:
+                pck = node.io['frame'].get()
+            if pck is not None:
+                count += 1
+                seq, ts, data = history.append(pck)
+                frames.publish((ts, data))
+                if hub is not None and hub.clients:
+                    hub.publish("frame", pack("ABCDE ", ts, data))
+            now = time.monotonic()
+            if modbus is not None and now - counted_at >= 1:
+                fps = round((count - counted) / (now - counted_at))
+                tcp_clients = len(hub.clients) if hub is not None else 0
+                modbus.data_bank.set_holding_registers(0, [count % 65536, fps, tcp_clients, viewers[0]])
+                counted, counted_at = count, now
+    """))
+    set_script(
+        script,
+        scrpt_str.safe_substitute(
+            _tcp_port=ports["tcp"],
+            _modbus_port=ports["modbus"],
+            _http_routes={http_port: tuple(routes) for http_port, routes in http_routes.items()},
+            _send_policy=send_policy,
+            _stall_ms=stall_ms,
+            _queue_depth=queue_depth,
+            _frame_history=frame_history,
+            _frame_history_bytes=frame_history_bytes,
+            _script_lib=read_script_lib("framing", "hub", "snapshot", "ring"),
+            _pyModbusTCP=(Path(__file__).parent / "modbus_tcp" / "pyModbusTCP.py").read_text() if ports["modbus"] else "",
+        )
+    )
+    return pipeline
+
+
+if __name__ == '__main__':
+    # Connect to device with pipeline
+    device_info = getDeviceInfo()
+    with dai.Device(create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None), device_info) as device:
+        click.echo(f"\t>>> Name: {device_info.name}")
+        click.echo(f"\t>>> MXID: {device.getMxId()}")
+        click.echo(f"\t>>> Cameras: {[c.name for c in device.getConnectedCameras()]}")
+        click.echo(f"\t>>> USB speed: {device.getUsbSpeed().name}")
+        while not device.isClosed():
+            time.sleep(1)
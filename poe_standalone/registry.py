@@ -0,0 +1,205 @@
+# coding=utf-8
+"""
+Registry of the pipelines the CLI can build, by name. Only the metadata is read to list them, a pipeline is imported
+when it is selected.
+
+Besides the built-in pipelines, it finds:
+
+- the pipelines other installed packages register in the "poe_standalone.pipelines" entry point group, eg. in their
+  pyproject.toml::
+
+    [tool.poetry.plugins."poe_standalone.pipelines"]
+    site_a_counter = "site_a.counter:create_pipeline"
+
+- custom files defining `create_pipeline(port, blob_path, config_path, host_ip)`, named after the file, in the files
+  and directories listed in POE_STANDALONE_PIPELINES (separated like PATH).
+
+A name is taken by the first pipeline registered with it, in that order.
+"""
+import inspect
+import os
+import sys
+import time
+import warnings
+from dataclasses import dataclass
+from functools import reduce
+from importlib import import_module
+from pathlib import Path
+
+try:
+    from importlib.metadata import entry_points
+except ImportError:  # Python 3.7
+    try:
+        from importlib_metadata import entry_points
+    except ImportError:
+        entry_points = None
+
+try:
+    from poe_standalone.utils import lazy_import
+except ImportError:
+    from utils import lazy_import
+
+ENTRY_POINT_GROUP = "poe_standalone.pipelines"
+PATH_ENV = "POE_STANDALONE_PIPELINES"
+# Passed to every `create_pipeline`, the other parameters are the options of the pipeline
+COMMON_PARAMETERS = ("port", "blob_path", "config_path", "host_ip")
+
+# "module:function" relative to the poe_standalone package
+BUILTIN_PIPELINES = {
+    "script_http_server": "script_http_server:create_pipeline",
+    "script_mjpeg_server": "script_mjpeg_server:create_pipeline",
+    "script_video_still_server": "script_video_still_server:create_pipeline",
+    "tcp_streaming_server": "tcp_streaming_server.tcp_streaming_server:create_pipeline",
+    "tcp_streaming_server_config_focus": "tcp_streaming_server.tcp_streaming_server_config_focus:create_pipeline",
+    "tcp_streaming_server_dual": "tcp_streaming_server.tcp_streaming_server_dual:create_pipeline",
+    "tcp_streaming_client": "tcp_streaming_client.tcp_streaming_client:create_pipeline",
+    "yolo_decoding": "yolo.yolo_decoding:create_pipeline",
+    "yolo_stereo_decoding": "yolo.yolo_stereo_decoding:create_pipeline",
+    "modbus_server_test": "modbus_tcp.modbus_server_test:create_pipeline",
+    "multi_protocol_server": "multi_protocol_server:create_pipeline",
+}
+
+
+@dataclass
+class PipelineSource:
+    """
+    Where the `create_pipeline` function of a pipeline is, imported by `load`.
+
+    :param kind: "builtin", "plugin" or "file"
+    :param module: the module, relative to poe_standalone for the built-in pipelines, or the path of a custom file
+    :param function: the function in `module`, dotted for an attribute of a class
+    :param origin: shown to the user, the package of a plugin or the custom file
+    """
+    name: str
+    kind: str
+    module: str
+    function: str = "create_pipeline"
+    origin: str = "poe_standalone"
+
+    @property
+    def module_name(self):
+        """Name of the module in sys.modules once loaded."""
+        if self.kind == "file":
+            # Named after the pipeline, custom files with the same module name don't replace each other
+            return f"poe_standalone_custom_{self.name}"
+        if self.kind == "builtin" and __package__:
+            return f"{__package__}.{self.module}"
+        return self.module
+
+    def load(self):
+        if self.kind == "file":
+            module = sys.modules.get(self.module_name) or lazy_import(self.module_name, self.module)
+        else:
+            module = import_module(self.module_name)
+        return reduce(getattr, self.function.split("."), module)
+
+
+def pipeline_options(create_pipeline) -> dict:
+    """:return: the options of a `create_pipeline` function with their defaults, eg. {"stall_ms": 1000}"""
+    return {
+        name: parameter.default for name, parameter in inspect.signature(create_pipeline).parameters.items()
+        if name not in COMMON_PARAMETERS and parameter.kind in (parameter.POSITIONAL_OR_KEYWORD, parameter.KEYWORD_ONLY)
+    }
+
+
+def file_source(path, name=None) -> PipelineSource:
+    path = Path(path)
+    return PipelineSource(name or path.stem, "file", str(path), origin=str(path))
+
+
+def plugin_sources() -> list:
+    if entry_points is None:
+        return []
+    try:
+        found = entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:  # Python < 3.10, a dict of the groups
+        found = entry_points().get(ENTRY_POINT_GROUP, [])
+    sources = []
+    for entry_point in found:
+        module, _, function = entry_point.value.partition(":")
+        dist = getattr(entry_point, "dist", None)
+        origin = f"{dist.metadata['Name']} {dist.version}" if dist is not None else entry_point.value
+        sources.append(PipelineSource(entry_point.name, "plugin", module.strip(), function.strip() or "create_pipeline",
+                                      origin))
+    return sources
+
+
+def path_sources(paths=None) -> list:
+    """:param paths: files and directories, default from POE_STANDALONE_PIPELINES"""
+    if paths is None:
+        paths = filter(None, os.environ.get(PATH_ENV, "").split(os.pathsep))
+    sources = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            sources += [file_source(file) for file in sorted(path.glob("*.py")) if not file.name.startswith("_")]
+        elif path.is_file():
+            sources.append(file_source(path))
+        else:
+            warnings.warn(f"{PATH_ENV}: {path} doesn't exist")
+    return sources
+
+
+class PipelineRegistry:
+    """
+    The pipelines by name, see the module docstring.
+
+    :param plugins: whether to look for the entry points
+    :param paths: see `path_sources`
+    """
+
+    def __init__(self, plugins=True, paths=None):
+        self.sources = {}
+        self.timings = {}
+        builtin = [PipelineSource(name, "builtin", *target.split(":")) for name, target in BUILTIN_PIPELINES.items()]
+        for source in builtin + (plugin_sources() if plugins else []) + path_sources(paths):
+            self.register(source)
+
+    def register(self, source, replace=False) -> PipelineSource:
+        """
+        :param replace: replace the pipeline registered with the same name, eg. for a file the user chose
+        :return: the source registered with its name, `source` unless the name is already taken
+        """
+        if replace:
+            self.sources[source.name] = source
+        registered = self.sources.setdefault(source.name, source)
+        if registered is not source:
+            warnings.warn(f"Pipeline {source.name} of {source.origin} ignored, already registered by {registered.origin}")
+        return registered
+
+    def names(self) -> list:
+        return list(self.sources)
+
+    def load(self, name):
+        """
+        Import the `create_pipeline` function of the pipeline `name`.
+
+        :raises ValueError: if it isn't registered or can't be imported, a broken plugin only fails once selected
+        """
+        source = self.sources.get(name)
+        if source is None:
+            raise ValueError(f"Unknown pipeline {name}, expected one of {', '.join(self.sources)}")
+        try:
+            return source.load()
+        except (ImportError, AttributeError, OSError, SyntaxError) as ex:
+            raise ValueError(f"Pipeline {name} of {source.origin} can't be imported: {ex!r}") from ex
+
+    def build(self, name, *args, **kwargs):
+        """
+        Import and call the `create_pipeline` function of `name`, the seconds each step took are kept in `timings`.
+
+        :param kwargs: options of the pipeline, see `pipeline_options`
+        :return: the dai.Pipeline
+        :raises ValueError: for an option the pipeline doesn't have
+        """
+        start = time.perf_counter()
+        create_pipeline = self.load(name)
+        loaded = time.perf_counter()
+        options = pipeline_options(create_pipeline)
+        unknown = [option for option in kwargs if option not in options and option not in COMMON_PARAMETERS]
+        if unknown and not any(parameter.kind == parameter.VAR_KEYWORD
+                               for parameter in inspect.signature(create_pipeline).parameters.values()):
+            available = ", ".join(f"{option}={default!r}" for option, default in options.items()) or "none"
+            raise ValueError(f"Pipeline {name} has no option {', '.join(unknown)}, its options are: {available}")
+        pipeline = create_pipeline(*args, **kwargs)
+        self.timings[name] = {"import": loaded - start, "build": time.perf_counter() - loaded}
+        return pipeline
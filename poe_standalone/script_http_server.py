@@ -6,36 +6,97 @@ import click
 import depthai as dai
 from loguru import logger
 from string import Template
+from textwrap import dedent
 try:
-    from poe_standalone.utils import getDeviceInfo
+    from poe_standalone.utils import getDeviceInfo, read_script_lib
+    from poe_standalone.script_tools import set_script
 except ImportError:
-    from utils import getDeviceInfo
+    from utils import getDeviceInfo, read_script_lib
+    from script_tools import set_script
 
 
-def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
+def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None, max_age_ms=200,
+                    qualities=(80, 50, 95), cache_size=8):
+    """
+    :param max_age_ms: how long a still is reused by later requests, 0 to capture one per request
+    :param qualities: JPEG qualities of the encoders, the first one is used when a request has no `q`
+    :param cache_size: how many parameter sets the stills are cached for
+    """
+    qualities = tuple(qualities)
+    if not qualities or len(set(qualities)) != len(qualities) or not all(
+            isinstance(quality, int) and 1 <= quality <= 100 for quality in qualities):
+        raise ValueError(f"qualities must be distinct integers from 1 to 100, got {qualities!r}")
     # Start defining a pipeline
     pipeline = dai.Pipeline()
 
     # Define a source - color camera
     cam = pipeline.create(dai.node.ColorCamera)
-    # VideoEncoder
-    jpeg = pipeline.create(dai.node.VideoEncoder)
-    jpeg.setDefaultProfilePreset(cam.getFps(), dai.VideoEncoderProperties.Profile.MJPEG)
+    width, height = cam.getStillSize()
+    # ImageManip, crops and scales each still as requested by the Script
+    manip = pipeline.create(dai.node.ImageManip)
+    manip.inputConfig.setWaitForMessage(True)
+    manip.setMaxOutputFrameSize(width * height * 3 // 2)
 
     # Script node
     script = pipeline.create(dai.node.Script)
     script.setProcessor(dai.ProcessorType.LEON_CSS)
-    scrpt_str = Template("""
-        from http.server import BaseHTTPRequestHandler
-        import socketserver
+
+    # VideoEncoders, one per quality bucket since the quality can't be changed while the pipeline runs
+    for quality in qualities:
+        jpeg = pipeline.create(dai.node.VideoEncoder)
+        jpeg.setDefaultProfilePreset(cam.getFps(), dai.VideoEncoderProperties.Profile.MJPEG)
+        jpeg.setQuality(quality)
+        script.outputs[f"raw{quality}"].link(jpeg.input)
+        jpeg.bitstream.link(script.inputs[f"jpeg{quality}"])
+
+    scrpt_str = Template(dedent("""
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        from socketserver import ThreadingMixIn
+        from urllib.parse import urlsplit, parse_qs
         import socket
         import fcntl
         import struct
+        ${_script_lib}
 
         PORT = ${_PORT}
+        FRAME_SIZE = (${_width}, ${_height})
+        QUALITIES = ${_qualities}
+        DEFAULT_QUALITY = ${_default_quality}
+        JPEG_RESPONSE = b"HTTP/1.0 200 OK\\r\\nContent-Type: image/jpeg\\r\\nContent-Length: %d\\r\\n\\r\\n"
         ctrl = CameraControl()
         ctrl.setCaptureStill(True)
 
+        # Normalize the /img query "w=..&h=..&q=..&crop=xmin,ymin,xmax,ymax" into a capture key.
+        # A missing w or h follows the aspect ratio of the crop, q snaps to the nearest encoder quality.
+        def snapshot_key(query):
+            params = {name: values[0] for name, values in parse_qs(query).items()}
+            crop = tuple(min(max(float(value), 0.0), 1.0) for value in params.get("crop", "0,0,1,1").split(","))
+            if len(crop) != 4 or crop[2] <= crop[0] or crop[3] <= crop[1]:
+                raise ValueError(f"Bad crop {params.get('crop')}")
+            crop_width = (crop[2] - crop[0]) * FRAME_SIZE[0]
+            crop_height = (crop[3] - crop[1]) * FRAME_SIZE[1]
+            w, h = float(params.get("w", 0)), float(params.get("h", 0))
+            if w and not h:
+                h = w * crop_height / crop_width
+            elif h and not w:
+                w = h * crop_width / crop_height
+            elif not w:
+                w, h = crop_width, crop_height
+            quality = int(params.get("q", DEFAULT_QUALITY))
+            quality = min(QUALITIES, key=lambda bucket: abs(bucket - quality))
+            return align(min(w, FRAME_SIZE[0])), align(min(h, FRAME_SIZE[1])), quality, crop
+
+        def capture(key):
+            width, height, quality, crop = key
+            node.io['manip_cfg'].send(crop_config(crop, (width, height), FRAME_SIZE))
+            node.io['out'].send(ctrl)
+            node.io[f'raw{quality}'].send(node.io['raw'].get())
+            return bytes(node.io[f'jpeg{quality}'].get().getData())
+
+        # Requests arriving together share one still, later ones reuse it for ${_max_age_ms} ms.
+        # The most recent parameter sets are cached separately.
+        stills = SingleFlight(capture, ${_max_age_ms}, size=${_cache_size})
+
         def get_ip_address(ifname):
             s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             return socket.inet_ntoa(fcntl.ioctl(
@@ -46,35 +107,52 @@ def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
 
         class HTTPHandler(BaseHTTPRequestHandler):
             def do_GET(self):
-                if self.path == '/':
+                url = urlsplit(self.path)
+                if url.path == '/':
                     self.send_response(200)
                     self.end_headers()
                     self.wfile.write(b'<h1>[DepthAI] Hello, world!</h1><p>Click <a href="img">here</a> for an image</p>')
-                elif self.path == '/img':
-                    node.io['out'].send(ctrl)
-                    jpegImage = node.io['jpeg'].get()
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'image/jpeg')
-                    self.send_header('Content-Length', str(len(jpegImage.getData())))
-                    self.end_headers()
-                    self.wfile.write(jpegImage.getData())
+                elif url.path == '/img':
+                    try:
+                        key = snapshot_key(url.query)
+                    except ValueError as e:
+                        self.send_response(400)
+                        self.end_headers()
+                        self.wfile.write(str(e).encode())
+                        return
+                    data = stills.get(key)
+                    send_framed(self.connection, (JPEG_RESPONSE % len(data), data))
                 else:
                     self.send_response(404)
                     self.end_headers()
                     self.wfile.write(b'Url not found...')
 
-        with socketserver.TCPServer(("", PORT), HTTPHandler) as httpd:
+        class ThreadingSimpleServer(ThreadingMixIn, HTTPServer):
+            pass
+
+        with ThreadingSimpleServer(("", PORT), HTTPHandler) as httpd:
             node.warn(f"Serving at {get_ip_address('re0')}:{PORT}")
             httpd.serve_forever()
-    """)
-    script.setScript(
-        scrpt_str.safe_substitute(_PORT=port)
+    """))
+    set_script(
+        script,
+        scrpt_str.safe_substitute(
+            _PORT=port,
+            _width=width,
+            _height=height,
+            _qualities=qualities,
+            _default_quality=qualities[0],
+            _max_age_ms=max_age_ms,
+            _cache_size=cache_size,
+            _script_lib=read_script_lib("framing", "manip", "snapshot"),
+        )
     )
 
     # Connections
-    cam.still.link(jpeg.input)
+    cam.still.link(manip.inputImage)
+    script.outputs["manip_cfg"].link(manip.inputConfig)
+    manip.out.link(script.inputs["raw"])
     script.outputs["out"].link(cam.inputControl)
-    jpeg.bitstream.link(script.inputs["jpeg"])
 
     return pipeline
 
@@ -0,0 +1,71 @@
+# coding=utf-8
+# Device-side code, injected into Script node templates by `utils.read_script_lib`.
+# Needs `framing` and `hub` to be injected before it.
+
+SSE_RESPONSE = (b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                b"Access-Control-Allow-Origin: *\r\n\r\n")
+JSON_RESPONSE = (b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n"
+                 b"Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n")
+NOT_FOUND_RESPONSE = b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+class EventServer:
+    """
+    Serves the JSON messages of a Hub to HTTP clients, on another port of the same selector.
+
+    - GET <path>: text/event-stream, one event per message, queued under `topic` with its `SendPolicy`.
+    - GET <path>/next: long-poll, answered with the next message, then closed.
+
+    Each message is serialized by the caller once, and formatted once for all the clients.
+
+    :param hub: the Hub whose selector and main loop serve the clients, `topic` must be one of its topics
+    :param port: HTTP port to listen on
+    :param path: url of the event stream, eg. "/detections"
+    :param topic: hub topic of the event stream
+    """
+
+    def __init__(self, hub, port, path, topic):
+        self.hub = hub
+        self.path = path
+        self.topic = topic
+        self.waiting = []
+        hub.listen(port, self.handle, topics=(topic,))
+        hub.on_close.append(self.forget)
+
+    def publish(self, payload, event=None):
+        """
+        :param payload: JSON bytes
+        :param event: optional SSE event name, default events are received by `EventSource.onmessage`
+        """
+        if self.hub.wanted(self.topic):
+            head = b"event: %s\ndata: " % bytes(event, encoding="ascii") if event else b"data: "
+            self.hub.publish(self.topic, (head, payload, b"\n\n"))
+        if self.waiting and event is None:
+            message = (JSON_RESPONSE % len(payload), payload)
+            waiting, self.waiting = self.waiting, []
+            for client in waiting:
+                if client.conn in self.hub.clients:
+                    self.hub.respond(client, message)
+
+    def forget(self, client):
+        """A long-poll client that disconnects before the next message no longer waits for it."""
+        if client in self.waiting:
+            self.waiting.remove(client)
+
+    def handle(self, client):
+        if b"\r\n\r\n" not in client.inbox:
+            if len(client.inbox) > 4096:
+                self.hub.close(client)
+            return
+        request = str(client.inbox.split(b"\r\n", 1)[0], encoding="ascii", errors="replace").split()
+        client.inbox = b""
+        path = request[1].split("?", 1)[0] if len(request) > 1 and request[0] == "GET" else None
+        if path == self.path:
+            self.hub.respond(client, (SSE_RESPONSE,))
+            client.topics.add(self.topic)
+        elif path == self.path + "/next":
+            client.closing = True
+            self.waiting.append(client)
+        else:
+            client.closing = True
+            self.hub.respond(client, (NOT_FOUND_RESPONSE,))
@@ -0,0 +1,71 @@
+# coding=utf-8
+# Device-side code, injected into Script node templates by `utils.read_script_lib`.
+# Framed messages are kept as a list of buffers, so header and payload go out in one vectored write
+# without copying the payload.
+import socket
+
+HAS_SENDMSG = hasattr(socket.socket, "sendmsg")
+
+
+def pack(tag, ts, payload):
+    """
+    Frame `payload` behind the 32 bytes ascii header understood by the poe_host clients.
+
+    :param tag: 6 characters message type, eg. "FRAME " or "DETECT"
+    :param ts: timedelta timestamp of the message, None for messages that aren't tied to a frame
+    :param payload: bytes-like payload
+    :return: the (header, payload) buffers of the message
+    """
+    seconds = ts.total_seconds() if ts is not None else 0.0
+    header = tag + str(seconds).center(18) + str(len(payload)).center(8)
+    return bytes(header, encoding="ascii"), payload
+
+
+def buffers_size(buffers):
+    return sum(len(buffer) for buffer in buffers)
+
+
+def advance(buffers, sent):
+    """Drop the first `sent` bytes from a list of memoryviews, return what is left to send."""
+    while buffers and sent >= len(buffers[0]):
+        sent -= len(buffers[0])
+        buffers = buffers[1:]
+    if buffers and sent:
+        buffers = [buffers[0][sent:]] + buffers[1:]
+    return buffers
+
+
+def send_buffers(sock, buffers):
+    """
+    Write as much of `buffers` as the socket takes, in one syscall.
+
+    :return: the number of bytes written, which may be less than the total on a non-blocking socket
+    """
+    if HAS_SENDMSG:
+        return sock.sendmsg(buffers)
+    return sock.send(b"".join(buffers))
+
+
+def send_framed(sock, buffers, cork=False):
+    """
+    Write all of `buffers` to a blocking socket, resuming after partial writes.
+
+    :param cork: hold the packets with TCP_CORK until the whole message is queued, where supported.
+        Only useful when `sendmsg` is missing and the buffers have to be written one by one.
+    """
+    buffers = [memoryview(buffer).cast("B") for buffer in buffers]
+    cork = cork and hasattr(socket, "TCP_CORK")
+    if cork:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 1)
+    try:
+        while buffers:
+            buffers = advance(buffers, send_buffers(sock, buffers) if HAS_SENDMSG else sock.send(buffers[0]))
+    finally:
+        if cork:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 0)
+
+
+def tune_socket(sock, nodelay=True):
+    """Disable Nagle's algorithm, small messages like detections are sent as soon as they are written."""
+    if nodelay:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
@@ -0,0 +1,290 @@
+# coding=utf-8
+# Device-side code, injected into Script node templates by `utils.read_script_lib`.
+# It runs inside the Script runtime on the LEON CSS and relies on its `node` global.
+# Needs `framing` to be injected before it.
+import selectors
+import socket
+import time
+from collections import deque
+
+DROP_OLDEST = "drop-oldest"
+DROP_TO_KEYFRAME = "drop-to-keyframe"
+DISCONNECT = "disconnect"
+
+
+class SendPolicy:
+    """
+    What a client's queue for one topic does when the client can't keep up.
+
+    - drop-oldest: discard the oldest queued messages to make room for the new one.
+    - drop-to-keyframe: discard the whole queue and skip messages until the next keyframe.
+    - disconnect: drop the oldest like drop-oldest, but close the client once it made no progress for `stall_ms`.
+
+    :param mode: one of DROP_OLDEST, DROP_TO_KEYFRAME, DISCONNECT
+    :param depth: maximum number of queued messages per client
+    :param max_bytes: maximum size of the queued messages per client, 0 for no limit
+    :param stall_ms: how long a client may make no progress before DISCONNECT closes it
+    """
+
+    def __init__(self, mode=DROP_OLDEST, depth=1, max_bytes=0, stall_ms=1000):
+        if mode not in (DROP_OLDEST, DROP_TO_KEYFRAME, DISCONNECT):
+            raise ValueError(f"Unknown send policy {mode}")
+        self.mode = mode
+        self.depth = max(1, depth)
+        self.max_bytes = max_bytes
+        self.stall_ms = stall_ms
+
+
+class HubClient:
+    """A subscribed connection, holding one bounded queue per topic."""
+
+    def __init__(self, conn, address, topics, subscribed, handle, log=True):
+        self.conn = conn
+        self.address = address
+        self.handle = handle
+        self.log = log
+        self.closing = False
+        # Protocol state of the listener's `handle`, eg. whether a WebSocket handshake was done
+        self.state = None
+        self.topics = set(subscribed)
+        self.queues = {topic: deque() for topic in topics}
+        self.queued_bytes = dict.fromkeys(topics, 0)
+        self.skipping = set()
+        self.inbox = b""
+        self.pending = []
+        self.writing = False
+        self.progress_at = time.monotonic()
+
+
+class Hub:
+    """
+    Publish/subscribe fan-out for the Script node.
+
+    The Script pulls every message from `node.io` once and publishes it here. Each client has its own
+    bounded queue per topic, governed by the topic's `SendPolicy`, so a slow client only loses its own
+    messages. All sockets are non-blocking and multiplexed by one selector driven from the Script main
+    loop, no thread is started per client and the loop never waits on a client.
+
+    :param port: TCP port to listen on
+    :param topics: topic names, in the order in which queued messages are flushed
+    :param policies: optional dict mapping topic name to `SendPolicy`, default is a latest-value slot
+    :param subscribed: topics new clients are subscribed to, default is all of them
+
+    More ports can be served by the same selector with `listen`, eg. for HTTP clients.
+    """
+
+    def __init__(self, port, topics, policies=None, subscribed=None):
+        self.topics = tuple(topics)
+        self.subscribed = tuple(topics if subscribed is None else subscribed)
+        self.policies = {topic: (policies or {}).get(topic) or SendPolicy() for topic in self.topics}
+        self.clients = {}
+        # Topics of other protocols or of replies to one client, the text commands can't subscribe to them
+        self.reserved = set()
+        self.commands = {"SUB": self._subscribe, "UNSUB": self._unsubscribe}
+        # Called with each client once it is closed, eg. to forget the requests it was waiting for
+        self.on_close = []
+        self.selector = selectors.DefaultSelector()
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(("", port))
+        self.server.listen()
+        self.server.setblocking(False)
+        self.servers = {}
+        self._register(self.server, self.handle, self.subscribed, True)
+
+    def listen(self, port, handle, subscribed=(), log=False, topics=()):
+        """
+        Accept clients on another port, their input is parsed by `handle(client)` instead of the text commands.
+
+        :param subscribed: topics these clients start subscribed to
+        :param log: whether connections and disconnections are logged, off for short-lived requests
+        :param topics: topics formatted for these clients only, eg. WebSocket frames, reserved from "SUB"
+        """
+        self.reserved.update(topics)
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(("", port))
+        server.listen()
+        server.setblocking(False)
+        self._register(server, handle, subscribed, log)
+
+    def publish(self, topic, message, keyframe=True):
+        """
+        :param message: buffers of one framed message, eg. from `pack`, shared by all clients
+        """
+        policy = self.policies[topic]
+        size = buffers_size(message)
+        for client in list(self.clients.values()):
+            if topic in client.topics:
+                self._enqueue(client, topic, policy, message, size, keyframe)
+
+    def wanted(self, topic):
+        """Whether any client is subscribed to `topic`, to skip pulling messages nobody reads."""
+        return any(topic in client.topics for client in self.clients.values())
+
+    def send(self, client, topic, message, keyframe=True):
+        """Queue a message for `client` only, whether it is subscribed to `topic` or not, eg. a reply."""
+        self._enqueue(client, topic, self.policies[topic], message, buffers_size(message), keyframe)
+
+    def respond(self, client, message):
+        """Queue a message for `client` ahead of all topics and never drop it, eg. protocol headers."""
+        client.pending = client.pending + [memoryview(buffer).cast("B") for buffer in message]
+        self._watch(client, True)
+
+    def poll(self, timeout=None):
+        for key, events in self.selector.select(timeout):
+            if key.fileobj in self.servers:
+                self._accept(key.fileobj)
+                continue
+            client = key.data
+            if events & selectors.EVENT_READ:
+                self._read(client)
+            if events & selectors.EVENT_WRITE and client.conn in self.clients:
+                self._write(client)
+
+    def handle(self, client):
+        """
+        Called when bytes from `client` were appended to `client.inbox`.
+
+        Runs one text command per line, "<COMMAND> [argument]", looked up in `self.commands`.
+        Handlers are called with the client and the argument, and raise ValueError on a bad argument.
+        """
+        for line in self.lines(client):
+            if not line:
+                continue
+            command, _, arg = line.partition(" ")
+            handler = self.commands.get(command.upper())
+            try:
+                if handler is None:
+                    raise ValueError(command)
+                handler(client, arg.strip())
+            except ValueError:
+                node.warn(f"Invalid command from {client.address}: {line!r}")
+
+    def lines(self, client):
+        """Consume the complete lines of `client.inbox`, for text commands."""
+        while b"\n" in client.inbox:
+            line, client.inbox = client.inbox.split(b"\n", 1)
+            yield str(line, encoding="ascii", errors="replace").strip()
+        if len(client.inbox) > 4096:
+            node.warn(f"Dropping unterminated command from {client.address}")
+            client.inbox = b""
+
+    def close(self, client):
+        if self.clients.pop(client.conn, None) is None:
+            return
+        self.selector.unregister(client.conn)
+        client.conn.close()
+        for callback in self.on_close:
+            callback(client)
+        if client.log:
+            node.warn(f"Client disconnected {client.address}")
+
+    def _subscribe(self, client, topic):
+        if topic not in self.topics or topic in self.reserved:
+            raise ValueError(topic)
+        client.topics.add(topic)
+
+    def _unsubscribe(self, client, topic):
+        client.topics.discard(topic)
+        if topic in client.queues:
+            client.queues[topic].clear()
+            client.queued_bytes[topic] = 0
+
+    def _enqueue(self, client, topic, policy, message, size, keyframe):
+        queue = client.queues[topic]
+        if not client.writing:
+            # An idle client starts its stall clock with the first message it has to take
+            client.progress_at = time.monotonic()
+        if topic in client.skipping:
+            if not keyframe:
+                return
+            client.skipping.discard(topic)
+        queue.append((message, size))
+        client.queued_bytes[topic] += size
+        while len(queue) > policy.depth or (
+                policy.max_bytes and len(queue) > 1 and client.queued_bytes[topic] > policy.max_bytes
+        ):
+            if policy.mode == DROP_TO_KEYFRAME:
+                queue.clear()
+                client.queued_bytes[topic] = 0
+                if keyframe:
+                    queue.append((message, size))
+                    client.queued_bytes[topic] = size
+                else:
+                    client.skipping.add(topic)
+                break
+            if policy.mode == DISCONNECT and (time.monotonic() - client.progress_at) * 1000 > policy.stall_ms:
+                node.warn(f"Client {client.address} stalled for more than {policy.stall_ms} ms")
+                self.close(client)
+                return
+            client.queued_bytes[topic] -= queue.popleft()[1]
+        self._watch(client, True)
+
+    def _register(self, server, handle, subscribed, log):
+        self.servers[server] = (handle, subscribed, log)
+        self.selector.register(server, selectors.EVENT_READ)
+
+    def _accept(self, server):
+        try:
+            conn, address = server.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        tune_socket(conn)
+        handle, subscribed, log = self.servers[server]
+        client = HubClient(conn, address, self.topics, subscribed, handle, log)
+        self.clients[conn] = client
+        self.selector.register(conn, selectors.EVENT_READ, client)
+        if log:
+            node.warn(f"Got connection from {address}")
+
+    def _watch(self, client, writing):
+        if client.writing != writing:
+            client.writing = writing
+            events = selectors.EVENT_READ | selectors.EVENT_WRITE if writing else selectors.EVENT_READ
+            self.selector.modify(client.conn, events, client)
+
+    def _read(self, client):
+        try:
+            data = client.conn.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.close(client)
+            return
+        client.inbox += data
+        client.handle(client)
+
+    def _next(self, client):
+        for topic in self.topics:
+            queue = client.queues[topic]
+            if queue:
+                message, size = queue.popleft()
+                client.queued_bytes[topic] -= size
+                return [memoryview(buffer).cast("B") for buffer in message]
+        return []
+
+    def _write(self, client):
+        if not client.pending:
+            client.pending = self._next(client)
+            if not client.pending:
+                if client.closing:
+                    # Everything queued for a client that asked to be closed was sent, eg. an HTTP response
+                    self.close(client)
+                    return
+                self._watch(client, False)
+                return
+        try:
+            # Header and payload in one syscall, a partial write resumes where it stopped on the next event
+            sent = send_buffers(client.conn, client.pending)
+        except BlockingIOError:
+            return
+        except OSError:
+            self.close(client)
+            return
+        if sent:
+            client.progress_at = time.monotonic()
+        client.pending = advance(client.pending, sent)
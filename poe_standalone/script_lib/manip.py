@@ -0,0 +1,32 @@
+# coding=utf-8
+# Device-side code, injected into Script node templates by `utils.read_script_lib`.
+# Builds ImageManipConfig messages for an ImageManip placed between the camera and a VideoEncoder.
+
+
+def align(value, step=16):
+    """Round down to the frame size granularity the VideoEncoder accepts."""
+    return max(step, int(value) // step * step)
+
+
+def crop_config(rect, size, frame_size):
+    """
+    Config cropping the normalized `rect` out of the frames and scaling it to `size`.
+
+    :param rect: (xmin, ymin, xmax, ymax), normalized to 0..1
+    :param size: (width, height) of the output, (0, 0) keeps the size of the cropped region
+    :param frame_size: (width, height) of the frames going into the ImageManip
+    :return: ImageManipConfig with NV12 output, ready for the encoder
+    """
+    xmin, ymin, xmax, ymax = [min(max(float(value), 0.0), 1.0) for value in rect]
+    if xmax <= xmin or ymax <= ymin:
+        raise ValueError(f"Empty crop {rect}")
+    width, height = int(size[0]), int(size[1])
+    if not width or not height:
+        width = (xmax - xmin) * frame_size[0]
+        height = (ymax - ymin) * frame_size[1]
+    cfg = ImageManipConfig()
+    cfg.setCropRect(xmin, ymin, xmax, ymax)
+    cfg.setResize(align(min(width, frame_size[0])), align(min(height, frame_size[1])))
+    cfg.setKeepAspectRatio(False)
+    cfg.setFrameType(ImgFrame.Type.NV12)
+    return cfg
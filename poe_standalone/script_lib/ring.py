@@ -0,0 +1,109 @@
+# coding=utf-8
+# Device-side code, injected into Script node templates by `utils.read_script_lib`.
+# `serve_snapshots` and `serve_ranges` need `framing` and `hub` to be injected as well.
+from collections import deque
+
+
+class FrameRing:
+    """
+    The last encoded frames, looked up by sequence number.
+
+    Frames are copied out of their message, holding on to the messages themselves would starve the
+    VideoEncoder's output pool.
+
+    :param size: number of frames to keep, 0 keeps none
+    :param max_bytes: memory budget of the kept frames, the oldest are dropped beyond it, 0 for no limit
+    """
+
+    def __init__(self, size, max_bytes=0):
+        self.frames = deque()
+        self.size = size
+        self.max_bytes = max_bytes
+        self.bytes = 0
+
+    def append(self, pck):
+        """Store an encoded frame message, return it as a (seq, ts, data) tuple."""
+        if not self.size:
+            return pck.getSequenceNum(), pck.getTimestamp(), pck.getData()
+        frame = (pck.getSequenceNum(), pck.getTimestamp(), bytes(pck.getData()))
+        self.frames.append(frame)
+        self.bytes += len(frame[2])
+        while len(self.frames) > self.size or (self.max_bytes and len(self.frames) > 1 and self.bytes > self.max_bytes):
+            self.bytes -= len(self.frames.popleft()[2])
+        return frame
+
+    def latest(self):
+        return self.frames[-1] if self.frames else None
+
+    def after(self, seq, count):
+        """The last `count` frames newer than `seq`, oldest first."""
+        frames = [frame for frame in self.frames if frame[0] > seq]
+        return frames[-count:] if count else []
+
+    def find(self, seq):
+        for frame in reversed(self.frames):
+            if frame[0] == seq:
+                return frame
+        return None
+
+    def between(self, start, end, by="seq"):
+        """
+        The frames whose sequence number, or timestamp in seconds, is between `start` and `end` included, oldest first.
+
+        Safe to call from another thread than the one appending, it works on a copy of the ring.
+        """
+        if by == "seq":
+            return [frame for frame in list(self.frames) if start <= frame[0] <= end]
+        if by == "ts":
+            return [frame for frame in list(self.frames) if start <= frame[1].total_seconds() <= end]
+        raise ValueError(f"Unknown range key {by}")
+
+
+def serve_snapshots(hub, ring, topic="reply"):
+    """
+    Register the "SNAP [latest|<seq>]" command on `hub`.
+
+    The client gets the matching frame from `ring` as a "SNAP  " message on `topic`,
+    or an empty "NOSNAP" message if the frame is no longer, or not yet, in the ring.
+    """
+
+    def snap(client, arg):
+        frame = ring.latest() if arg in ("", "latest") else ring.find(int(arg))
+        if frame is None:
+            hub.send(client, topic, pack("NOSNAP", None, b""))
+        else:
+            hub.send(client, topic, pack("SNAP  ", frame[1], frame[2]))
+
+    # A client only gets its own replies
+    hub.reserved.add(topic)
+    hub.commands["SNAP"] = snap
+
+
+def parse_range(arg):
+    """Parse "[seq|ts] <start> <end>" into (start, end, by), raises ValueError."""
+    args = arg.split()
+    by = args.pop(0) if args and args[0] in ("seq", "ts") else "seq"
+    if len(args) != 2:
+        raise ValueError(arg)
+    convert = int if by == "seq" else float
+    return convert(args[0]), convert(args[1]), by
+
+
+def serve_ranges(hub, ring):
+    """
+    Register the "RANGE [seq|ts] <start> <end>" command on `hub`, timestamps are in seconds like in the headers.
+
+    The client gets every frame of `ring` in the range as "RANGE " messages, oldest first, then an "ENDRNG"
+    message whose payload is the number of frames. The frames bypass the topic queues so none is dropped,
+    the byte budget of the ring bounds the reply.
+    """
+
+    def send_range(client, arg):
+        frames = ring.between(*parse_range(arg))
+        buffers = []
+        for seq, ts, data in frames:
+            buffers += pack("RANGE ", ts, data)
+        buffers += pack("ENDRNG", None, bytes(str(len(frames)), encoding="ascii"))
+        hub.respond(client, buffers)
+
+    hub.commands["RANGE"] = send_range
@@ -0,0 +1,51 @@
+# coding=utf-8
+# Device-side code, injected into Script node templates by `utils.read_script_lib`.
+# Rules come from `utils.parse_rules`, with label indices and all the defaults filled in.
+
+
+class RuleEngine:
+    """
+    Decides from the detections which frames are worth pushing.
+
+    Each rule watches one label, present when one of its detections reaches the rule's confidence:
+
+    - appear: fires on the detections where the label becomes present
+    - leave: fires on the detections where the label stops being present
+    - above: fires on every detections where the label is present
+
+    A firing rule opens a window of its `pre` frames before and `post` frames after the detections.
+
+    :param rules: list of {"label", "event", "confidence", "pre", "post"} dicts
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.present = [False] * len(rules)
+        self.post = 0
+
+    def update(self, dets):
+        """Evaluate the rules on new ImgDetections, return the rules that fired."""
+        best = {}
+        for detection in dets.detections:
+            best[detection.label] = max(best.get(detection.label, 0.0), detection.confidence)
+        fired = []
+        for i, rule in enumerate(self.rules):
+            present = best.get(rule["label"], 0.0) >= rule["confidence"]
+            event = rule["event"]
+            if (
+                    (event == "appear" and present and not self.present[i])
+                    or (event == "leave" and not present and self.present[i])
+                    or (event == "above" and present)
+            ):
+                fired.append(rule)
+                # The frame of the detections itself counts as the first one of the window
+                self.post = max(self.post, rule["post"] + 1)
+            self.present[i] = present
+        return fired
+
+    def take(self):
+        """Whether the next frame falls in a window, consumes one frame of it."""
+        if self.post > 0:
+            self.post -= 1
+            return True
+        return False
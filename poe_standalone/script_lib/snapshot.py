@@ -0,0 +1,80 @@
+# coding=utf-8
+# Device-side code, injected into Script node templates by `utils.read_script_lib`.
+import threading
+import time
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent requests for the same key into one fetch, and serves the result for a while.
+
+    Requests that arrive while a fetch for their key is in flight wait for it and share its result.
+    Requests that arrive later get the cached result while it is younger than `max_age_ms`.
+    Fetches never run concurrently, so two captures can't take each other's image.
+
+    :param fetch: function(key) -> value, called without holding the cache lock
+    :param max_age_ms: how long a result is served to requests that arrive after it
+    :param size: how many keys are cached
+    """
+
+    def __init__(self, fetch, max_age_ms, size=8):
+        self.fetch = fetch
+        self.max_age = max_age_ms / 1000
+        self.size = size
+        self.cache = {}
+        self.inflight = set()
+        self.cond = threading.Condition()
+        self.fetch_lock = threading.Lock()
+
+    def get(self, key=None):
+        arrived = time.monotonic()
+        with self.cond:
+            while True:
+                hit = self.cache.get(key)
+                # A result completed after the request arrived is as fresh as a new fetch would be
+                if hit is not None and (hit[0] >= arrived or time.monotonic() - hit[0] <= self.max_age):
+                    return hit[1]
+                if key not in self.inflight:
+                    self.inflight.add(key)
+                    break
+                self.cond.wait()
+        value = None
+        try:
+            with self.fetch_lock:
+                value = self.fetch(key)
+        finally:
+            with self.cond:
+                self.inflight.discard(key)
+                if value is not None:
+                    self.cache.pop(key, None)
+                    self.cache[key] = (time.monotonic(), value)
+                    while len(self.cache) > self.size:
+                        del self.cache[next(iter(self.cache))]
+                self.cond.notify_all()
+        return value
+
+
+class LatestValue:
+    """
+    Latest value published by one thread and read by any number of others, eg. the frames of an MJPEG stream.
+
+    Each reader passes the sequence number of the last value it got and waits for a newer one, so it gets every
+    value at most once and skips the values it was too slow for, without slowing down the others.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.value = None
+        self.seq = 0
+
+    def publish(self, value):
+        with self.cond:
+            self.value = value
+            self.seq += 1
+            self.cond.notify_all()
+
+    def wait(self, seq=0, timeout=None):
+        """:return: (seq, value) of a value newer than `seq`, or of the current one on timeout"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq != seq, timeout)
+            return self.seq, self.value
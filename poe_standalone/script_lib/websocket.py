@@ -0,0 +1,119 @@
+# coding=utf-8
+# Device-side code, injected into Script node templates by `utils.read_script_lib`.
+# Needs `framing` and `hub` to be injected before it.
+import base64
+import hashlib
+import struct
+
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WS_RESPONSE = (b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+               b"Sec-WebSocket-Accept: %s\r\n\r\n")
+BAD_REQUEST_RESPONSE = b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+def ws_header(opcode, length):
+    """Header of an unfragmented, unmasked frame, as sent by a server."""
+    if length < 126:
+        return bytes((0x80 | opcode, length))
+    if length < 1 << 16:
+        return struct.pack("!BBH", 0x80 | opcode, 126, length)
+    return struct.pack("!BBQ", 0x80 | opcode, 127, length)
+
+
+class WebSocketServer:
+    """
+    Minimal WebSocket server on another port of a Hub, for browsers.
+
+    After the handshake, clients are subscribed to `subscribed` and receive what is published with `publish`,
+    each topic queued with its `SendPolicy`. Incoming frames only answer pings and close requests.
+
+    :param hub: the Hub whose selector and main loop serve the clients
+    :param port: port to listen on
+    :param path: url of the endpoint, eg. "/ws"
+    :param subscribed: hub topics the clients get once upgraded
+    """
+
+    def __init__(self, hub, port, path, subscribed):
+        self.hub = hub
+        self.path = path
+        self.subscribed = tuple(subscribed)
+        hub.listen(port, self.handle, topics=self.subscribed)
+
+    def publish(self, topic, *messages, keyframe=True):
+        """
+        :param messages: (payload, binary) pairs, sent back to back and dropped together, eg. metadata and its frame
+        """
+        if not self.hub.wanted(topic):
+            return
+        buffers = []
+        for payload, binary in messages:
+            buffers += (ws_header(OP_BINARY if binary else OP_TEXT, len(payload)), payload)
+        self.hub.publish(topic, buffers, keyframe)
+
+    def handle(self, client):
+        if client.state is None:
+            self._handshake(client)
+            return
+        for opcode, payload in self._frames(client):
+            if opcode == OP_PING:
+                self.hub.respond(client, (ws_header(OP_PONG, len(payload)), payload))
+            elif opcode == OP_CLOSE:
+                client.topics.clear()
+                client.closing = True
+                self.hub.respond(client, (ws_header(OP_CLOSE, len(payload[:2])), payload[:2]))
+
+    def _handshake(self, client):
+        if b"\r\n\r\n" not in client.inbox:
+            if len(client.inbox) > 4096:
+                self.hub.close(client)
+            return
+        head, client.inbox = client.inbox.split(b"\r\n\r\n", 1)
+        lines = str(head, encoding="ascii", errors="replace").split("\r\n")
+        request = lines[0].split()
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if len(request) < 2 or request[0] != "GET" or request[1].split("?", 1)[0] != self.path or not key:
+            client.closing = True
+            self.hub.respond(client, (BAD_REQUEST_RESPONSE,))
+            return
+        accept = base64.b64encode(hashlib.sha1(bytes(key, encoding="ascii") + WS_GUID).digest())
+        self.hub.respond(client, (WS_RESPONSE % accept,))
+        client.state = "open"
+        client.topics.update(self.subscribed)
+        node.warn(f"WebSocket client {client.address}")
+
+    def _frames(self, client):
+        """Consume the complete frames of `client.inbox`, clients always mask their frames."""
+        data = client.inbox
+        while len(data) >= 2:
+            length = data[1] & 0x7F
+            offset = 2
+            if length == 126:
+                if len(data) < 4:
+                    break
+                length = struct.unpack("!H", data[2:4])[0]
+                offset = 4
+            elif length == 127:
+                if len(data) < 10:
+                    break
+                length = struct.unpack("!Q", data[2:10])[0]
+                offset = 10
+            if len(data) < offset + 4 + length:
+                break
+            mask = data[offset:offset + 4]
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(data[offset + 4:offset + 4 + length]))
+            opcode = data[0] & 0x0F
+            data = data[offset + 4 + length:]
+            yield opcode, payload
+        client.inbox = data
+        if len(client.inbox) > 1 << 16:
+            node.warn(f"Dropping oversized WebSocket frame from {client.address}")
+            self.hub.close(client)
@@ -0,0 +1,140 @@
+# coding=utf-8
+# Device-side code, injected into Script node templates by `utils.read_script_lib`.
+# Main loop of the yolo pipelines, needs `framing`, `hub`, `ring`, `rules`, `events` and `websocket` to be injected
+# before it.
+import fcntl
+import json
+import socket
+import struct
+
+
+def get_ip_address(ifname):
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    return socket.inet_ntoa(fcntl.ioctl(
+        s.fileno(),
+        -1071617759,  # SIOCGIFADDR
+        struct.pack('256s', ifname[:15].encode())
+    )[20:24])
+
+
+class DetectionServer:
+    """
+    Pulls the frames and the detections of the "frame" and "detection" inputs once, and pushes them to the TCP clients,
+    the HTTP detection endpoints and the WebSocket clients.
+
+    Clients switch streams with "SUB frame" / "UNSUB frame", fetch single frames with "SNAP [latest|<seq>]" and the
+    frames before an event with "RANGE [seq|ts] <start> <end>".
+
+    :param port: TCP port of the framed stream
+    :param labels: label names of the model, None to send the label indices
+    :param rules: rules from `utils.parse_rules`, when empty every frame is pushed, else only the windows around the
+        events
+    :param frame_policy: `SendPolicy` of the frames of the TCP clients
+    :param stream_frames: whether new TCP clients get the frames, or only the detections
+    :param frames: `FrameRing` of the recent frames
+    :param http_port: port of the `EventServer`, None to disable it
+    :param ws_port: port of the `WebSocketServer`, None to disable it
+    :param fields: optional function returning the extra fields of a detection, eg. its spatial coordinates
+    """
+
+    def __init__(self, port, labels, rules, frame_policy, stream_frames, frames, http_port=None, ws_port=None,
+                 fields=None):
+        self.port = port
+        self.labels = labels
+        self.fields = fields
+        # Detections are small and feed PLCs, keep a few of them per client whatever the frame policy is
+        policies = {
+            "reply": SendPolicy(DROP_OLDEST, depth=4),
+            "detection": SendPolicy(DROP_OLDEST, depth=8),
+            "frame": frame_policy,
+            "sse": SendPolicy(DROP_OLDEST, depth=8),
+            "ws-detection": SendPolicy(DROP_OLDEST, depth=8),
+            "ws-frame": SendPolicy(DROP_OLDEST, depth=1),
+        }
+        subscribed = ("detection", "frame") if stream_frames else ("detection",)
+        self.hub = Hub(port, ("reply", "detection", "frame", "sse", "ws-detection", "ws-frame"), policies, subscribed)
+        # Browsers and simple integrations read the detections over HTTP, served by the same loop
+        self.events = EventServer(self.hub, http_port, "/detections", "sse") if http_port else None
+        self.ws = WebSocketServer(self.hub, ws_port, "/ws", ("ws-detection", "ws-frame")) if ws_port else None
+        self.frames = frames
+        serve_snapshots(self.hub, frames)
+        serve_ranges(self.hub, frames)
+        self.rules = RuleEngine(rules) if rules else None
+        self.last_seq = -1
+
+    def label(self, label):
+        return self.labels[label] if self.labels else label
+
+    def encode_detections(self, dets):
+        bboxes = []
+        seq = dets.getSequenceNum()
+        for detection in dets.detections:
+            bbox = {"seq": seq,
+                    "label": self.label(detection.label),
+                    "confidence": detection.confidence,
+                    "xmin": detection.xmin,
+                    "ymin": detection.ymin,
+                    "xmax": detection.xmax,
+                    "ymax": detection.ymax,
+                    }
+            if self.fields is not None:
+                bbox.update(self.fields(detection))
+            bboxes.append(bbox)
+        # Serialized once, the same bytes go to the TCP clients and to the HTTP endpoints
+        return bytes(json.dumps(bboxes, separators=(",", ":")), encoding='ascii') if bboxes else None
+
+    def encode_events(self, fired, dets):
+        events = [{"seq": dets.getSequenceNum(), "label": self.label(rule["label"]), "event": rule["event"]}
+                  for rule in fired]
+        return bytes(json.dumps(events, separators=(",", ":")), encoding='ascii')
+
+    def publish_frame(self, seq, ts, data):
+        self.hub.publish("frame", pack("FRAME ", ts, data))
+        if self.ws is not None and self.hub.wanted("ws-frame"):
+            # The metadata and its JPEG are queued as one message, a slow client drops both
+            meta = b'{"type":"frame","seq":%d,"ts":%.6f}' % (seq, ts.total_seconds())
+            self.ws.publish("ws-frame", (meta, False), (data, True))
+        self.last_seq = seq
+
+    def publish_json(self, kind, ts, payload):
+        if self.ws is not None and self.hub.wanted("ws-detection"):
+            self.ws.publish("ws-detection",
+                            (b'{"type":"%s","ts":%.6f,"data":%s}' % (kind, ts.total_seconds(), payload), False))
+
+    def step(self, timeout=0.005):
+        """
+        Serve the clients for up to `timeout` seconds, then take the next detections and frame, if any.
+
+        The ring and the rules keep up while nobody is connected, a client connecting after an event still fetches the
+        frames before it, only the sends are skipped.
+        """
+        hub = self.hub
+        hub.poll(timeout)
+        dets = node.io["detection"].tryGet()
+        if dets is not None:
+            fired = self.rules.update(dets) if self.rules is not None else None
+            if fired and hub.clients:
+                event_str = self.encode_events(fired, dets)
+                hub.publish("detection", pack("EVENT ", dets.getTimestamp(), event_str))
+                if self.events is not None:
+                    self.events.publish(event_str, "rule")
+                self.publish_json(b"event", dets.getTimestamp(), event_str)
+                for frame in self.frames.after(self.last_seq, max(rule["pre"] for rule in fired)):
+                    self.publish_frame(*frame)
+            bbox_str = self.encode_detections(dets) if hub.clients else None
+            if bbox_str:
+                hub.publish("detection", pack("DETECT", dets.getTimestamp(), bbox_str))
+                if self.events is not None:
+                    self.events.publish(bbox_str)
+                self.publish_json(b"detections", dets.getTimestamp(), bbox_str)
+
+        pck = node.io["frame"].tryGet()
+        if pck is not None:
+            frame = self.frames.append(pck)
+            if (self.rules is None or self.rules.take()) and hub.clients:
+                self.publish_frame(*frame)
+
+    def run(self):
+        node.warn(f"DataTCPServer at {get_ip_address('re0')}:{self.port}")
+        while True:
+            self.step()
@@ -2,17 +2,24 @@
 # coding=utf-8
 import time
 from string import Template
+from textwrap import dedent
 
 import click
 import depthai as dai
 
 try:
-    from poe_standalone.utils import getDeviceInfo
+    from poe_standalone.utils import getDeviceInfo, read_script_lib
+    from poe_standalone.script_tools import set_script
 except ImportError:
-    from utils import getDeviceInfo
+    from utils import getDeviceInfo, read_script_lib
+    from script_tools import set_script
 
 
-def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
+def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None, max_fps=0, stall_ms=2000):
+    """
+    :param max_fps: frame rate cap of every viewer, 0 for the camera rate. Viewers can ask for less with "/img?fps=5"
+    :param stall_ms: how long a viewer may not take any data before it is disconnected
+    """
     # Start defining a pipeline
 
     pipeline = dai.Pipeline()
@@ -27,15 +34,33 @@ def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
     script = pipeline.create(dai.node.Script)
     script.setProcessor(dai.ProcessorType.LEON_CSS)
 
-    scrpt_str = Template("""
+    scrpt_str = Template(dedent("""
         import time
         import socket
         import fcntl
         import struct
+        import threading
         from socketserver import ThreadingMixIn
         from http.server import BaseHTTPRequestHandler, HTTPServer
-    
+        from urllib.parse import urlsplit, parse_qs
+        ${_script_lib}
+
         PORT = ${_PORT}
+        MAX_FPS = ${_max_fps}
+        STALL_S = ${_stall_ms} / 1000
+        INDEX = b'<h1>[DepthAI] Hello, world!</h1><p>Click <a href="img">here</a> for an image</p>'
+        # Boundary, part headers and payload of a frame go out in one vectored write
+        PART_HEADER = b"--jpgboundary\\r\\nContent-type: image/jpeg\\r\\nContent-length: %d\\r\\n\\r\\n"
+        PART_END = b"\\r\\n"
+
+        # One thread pulls the encoder output, every viewer reads the latest frame from there
+        frames = LatestValue()
+
+        def pump():
+            while True:
+                frames.publish(node.io['jpeg'].get().getData())
+
+        threading.Thread(target=pump, daemon=True).start()
     
         def get_ip_address(ifname):
             s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -49,47 +74,69 @@ def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
             pass
     
         class HTTPHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
             def do_GET(self):
-                if self.path == '/':
-                    self.send_response(200)
-                    self.end_headers()
-                    self.wfile.write(b'<h1>[DepthAI] Hello, world!</h1><p>Click <a href="img">here</a> for an image</p>')
-                elif self.path == '/img':
+                url = urlsplit(self.path)
+                if url.path == '/':
+                    self.reply(200, INDEX)
+                elif url.path == '/img':
                     try:
-                        self.send_response(200)
-                        self.send_header('Content-type', 'multipart/x-mixed-replace; boundary=--jpgboundary')
-                        self.end_headers()
-                        fpsCounter = 0
-                        timeCounter = time.time()
-                        while True:
-                            jpegImage = node.io['jpeg'].get()
-                            self.wfile.write("--jpgboundary".encode())
-                            self.wfile.write(bytes([13, 10]))
-                            self.send_header('Content-type', 'image/jpeg')
-                            self.send_header('Content-length', str(len(jpegImage.getData())))
-                            self.end_headers()
-                            self.wfile.write(jpegImage.getData())
-                            self.end_headers()
-    
-                            fpsCounter = fpsCounter + 1
-                            if time.time() - timeCounter > 1:
-                                node.warn(f'FPS: {fpsCounter}')
-                                fpsCounter = 0
-                                timeCounter = time.time()
-                    except Exception as ex:
-                        node.warn(str(ex))
+                        fps = float(parse_qs(url.query).get("fps", [MAX_FPS])[0])
+                    except ValueError:
+                        self.reply(400, b'Bad fps')
+                        return
+                    if MAX_FPS:
+                        fps = min(fps, MAX_FPS) if fps > 0 else MAX_FPS
+                    self.stream(1 / fps if fps > 0 else 0)
+                else:
+                    self.reply(404, b'Url not found...')
+
+            def reply(self, code, body):
+                # With a length, the connection stays open for the next request
+                self.send_response(code)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def stream(self, interval):
+                self.send_response(200)
+                self.send_header('Content-type', 'multipart/x-mixed-replace; boundary=--jpgboundary')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                self.close_connection = True
+                # A viewer that takes nothing for STALL_S fails the write like one that went away
+                self.connection.settimeout(STALL_S)
+                seq = 0
+                try:
+                    while True:
+                        seq, data = frames.wait(seq)
+                        sent_at = time.monotonic()
+                        send_framed(self.connection, (PART_HEADER % len(data), data, PART_END))
+                        if interval:
+                            time.sleep(max(0.0, interval - (time.monotonic() - sent_at)))
+                except OSError as ex:
+                    node.warn(f"Client disconnected {self.client_address}: {ex!r}")
     
         with ThreadingSimpleServer(("", PORT), HTTPHandler) as httpd:
             node.warn(f"Serving at {get_ip_address('re0')}:{PORT}")
             httpd.serve_forever()
-    """)
-    script.setScript(
-        scrpt_str.safe_substitute(_PORT=port)
+    """))
+    set_script(
+        script,
+        scrpt_str.safe_substitute(
+            _PORT=port,
+            _max_fps=max_fps,
+            _stall_ms=stall_ms,
+            _script_lib=read_script_lib("framing", "snapshot"),
+        )
     )
 
     # Connections
     cam.video.link(jpeg.input)
     jpeg.bitstream.link(script.inputs['jpeg'])
+    script.inputs['jpeg'].setBlocking(False)
+    script.inputs['jpeg'].setQueueSize(1)
     return pipeline
 
 
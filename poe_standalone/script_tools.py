@@ -0,0 +1,309 @@
+# coding=utf-8
+"""
+Build step of the Script node sources: validate them, then strip what the device doesn't need.
+
+A script only fails on the device after a flash and a reboot, so everything that can be checked on the host is:
+unresolved template placeholders, values substituted as the string "None", syntax and relative imports. Imports of
+modules the Script runtime isn't known to have only warn, set POE_STANDALONE_SCRIPT_MODULES=mod1,mod2 to silence them.
+
+`python -m poe_standalone.script_tools` reports the script sizes of every pipeline before and after.
+Set POE_STANDALONE_MINIFY=0 to flash the sources as written, eg. to match the line numbers of a device traceback.
+"""
+import ast
+import io
+import os
+import tokenize
+import warnings
+from string import Template
+from textwrap import dedent
+
+import click
+
+MINIFY_ENV = "POE_STANDALONE_MINIFY"
+# Comma separated modules to allow on top of ALLOWED_MODULES, eg. for a custom pipeline
+MODULES_ENV = "POE_STANDALONE_SCRIPT_MODULES"
+# Modules known to be in the Script node runtime on the LEON CSS, a package allows its submodules. The runtime may have
+# more, importing another module only warns
+ALLOWED_MODULES = frozenset((
+    "base64", "binascii", "bisect", "collections", "copy", "datetime", "enum", "errno", "fcntl", "functools",
+    "hashlib", "heapq", "http", "io", "itertools", "json", "math", "os", "queue", "random", "re", "select",
+    "selectors", "socket", "socketserver", "string", "struct", "sys", "threading", "time", "urllib",
+))
+
+# Reading a name or an attribute may run code, eg. a property or `node.io[...]`, only literals can be dropped
+_PURE_NODES = (ast.Constant, ast.Load, ast.Tuple, ast.List, ast.Set, ast.Dict, ast.BinOp, ast.UnaryOp, ast.operator,
+               ast.unaryop)
+
+
+def check_script(source, name="<script>"):
+    """
+    Compile `source` like the Script node would, which accepts an indented script.
+
+    :raises ValueError: on a syntax error, with the offending line
+    """
+    try:
+        compile(dedent(source), name, "exec")
+    except SyntaxError as ex:
+        raise ValueError(f"Script {name} doesn't compile, line {ex.lineno}: {ex.msg}\n{ex.text or ''}") from ex
+
+
+def placeholders(source):
+    """The `${name}` and `$name` placeholders `string.Template` would substitute in `source`, `$$` escapes excluded."""
+    for match in Template.pattern.finditer(source):
+        if match.group("named") or match.group("braced"):
+            yield match
+
+
+def _unknown(node, modules, allowed) -> list:
+    unknown = []
+    for module in modules:
+        parts = module.split(".")
+        if not any(".".join(parts[:i]) in allowed for i in range(1, len(parts) + 1)):
+            unknown.append(f"line {node.lineno}: module {module} isn't known to be in the Script runtime")
+    return unknown
+
+
+def validate_script(source, name="<script>", allowed_modules=()):
+    """
+    Check a Script node source, dedented as the device runs it, before it is built into a package.
+
+    Imports of modules that aren't allowed are reported with `warnings.warn`, the other problems are errors.
+
+    :param allowed_modules: modules allowed on top of `ALLOWED_MODULES` and POE_STANDALONE_SCRIPT_MODULES
+    :raises ValueError: listing the problems found
+    """
+    source = dedent(source)
+    problems = []
+    unknown = []
+    for match in placeholders(source):
+        line = source.count("\n", 0, match.start()) + 1
+        problems.append(f"line {line}: unresolved placeholder {match.group()}")
+    try:
+        compile(source, name, "exec")
+    except SyntaxError as ex:
+        problems.append(f"line {ex.lineno}: {ex.msg}: {(ex.text or '').strip()}")
+        raise ValueError("\n".join([f"Script {name} is invalid:"] + problems)) from ex
+    allowed = ALLOWED_MODULES.union(allowed_modules, filter(None, os.environ.get(MODULES_ENV, "").split(",")))
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Constant) and node.value == "None":
+            problems.append(f'line {node.lineno}: "None" string, a template value is probably missing')
+        elif isinstance(node, ast.Import):
+            unknown += _unknown(node, [alias.name for alias in node.names], allowed)
+        elif isinstance(node, ast.ImportFrom) and node.level:
+            problems.append(f"line {node.lineno}: relative import, a script isn't part of a package")
+        elif isinstance(node, ast.ImportFrom):
+            unknown += _unknown(node, [node.module], allowed)
+    if unknown:
+        warnings.warn("\n".join([f"Script {name} may not run:"] + unknown))
+    if problems:
+        raise ValueError("\n".join([f"Script {name} is invalid:"] + problems))
+
+
+def validate_pipeline(pipeline, allowed_modules=()):
+    """`validate_script` every Script node of `pipeline`, including those not set with `set_script`."""
+    import depthai as dai
+
+    for node in pipeline.getAllNodes():
+        if isinstance(node, dai.node.Script):
+            asset = node.getAssetManager().get("__script")
+            if asset is not None:
+                validate_script(bytes(asset.data).decode("utf-8"), node.getScriptName(), allowed_modules)
+
+
+def _whole_lines(lines, node):
+    """Whether `node` spans whole lines, only those can be dropped without touching another statement."""
+    before = lines[node.lineno - 1][:node.col_offset].strip()
+    after = lines[node.end_lineno - 1][node.end_col_offset:].strip()
+    return not before and (not after or after.startswith("#"))
+
+
+def _defined_name(node):
+    """Name bound by a top-level statement that can be dropped when the name is never read, else None."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and not node.decorator_list:
+        return node.name
+    if isinstance(node, ast.ClassDef) and not node.decorator_list:
+        return node.name
+    if (isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)
+            and all(isinstance(child, _PURE_NODES) for child in ast.walk(node.value))):
+        return node.targets[0].id
+    return None
+
+
+def _read_names(node) -> set:
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load):
+            names.add(child.id)
+        elif isinstance(child, ast.AugAssign) and isinstance(child.target, ast.Name):
+            # `n += 1` reads `n` as well
+            names.add(child.target.id)
+        elif isinstance(child, (ast.Global, ast.Nonlocal)):
+            names.update(child.names)
+    return names
+
+
+def unused_definitions(tree) -> list:
+    """
+    Top-level functions, classes and constants that nothing executed reads, even indirectly, eg. `ModbusClient` next to
+    the `ModbusServer` a script runs.
+    """
+    definitions = {}
+    pending = []
+    for node in tree.body:
+        name = _defined_name(node)
+        if name is None:
+            pending.append(node)
+        else:
+            definitions.setdefault(name, []).append(node)
+    used = set()
+    while pending:
+        names = set().union(*map(_read_names, pending)) - used
+        used |= names
+        pending = [node for name in names for node in definitions.get(name, ())]
+    return [node for name, nodes in definitions.items() if name not in used for node in nodes]
+
+
+def _is_string(node):
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+
+
+def _bare_strings(tree):
+    """Docstrings and other string statements, with the block they are in, a block of only strings first."""
+    for node in ast.walk(tree):
+        for field in ("body", "orelse", "finalbody"):
+            block = getattr(node, field, None)
+            if isinstance(block, list):
+                for statement in block:
+                    if _is_string(statement):
+                        yield node, block, statement
+
+
+def _drop_statements(source) -> str:
+    """Drop the docstrings, the other string statements and the unused top-level definitions, whole lines at a time."""
+    tree = ast.parse(source)
+    lines = source.splitlines()
+    dropped = set()
+    replaced = {}
+    for node in unused_definitions(tree):
+        if _whole_lines(lines, node):
+            dropped.update(range(node.lineno, node.end_lineno + 1))
+    for parent, block, string in _bare_strings(tree):
+        if string.lineno in dropped or not _whole_lines(lines, string):
+            continue
+        dropped.update(range(string.lineno, string.end_lineno + 1))
+        if string is block[0] and all(map(_is_string, block)) and not isinstance(parent, ast.Module):
+            # A block can't be empty
+            replaced[string.lineno] = " " * string.col_offset + "pass"
+    kept = [replaced.get(row, line) for row, line in enumerate(lines, 1) if row not in dropped or row in replaced]
+    return "\n".join(kept)
+
+
+def _compact(source) -> str:
+    """Drop the comments and blank lines, and indent each block with one space."""
+    lines = source.splitlines()
+    comments = {}
+    verbatim = set()
+    starts = {}
+    depth = 0
+    at_start = True
+    for token in tokenize.generate_tokens(io.StringIO(source).readline):
+        if token.type == tokenize.COMMENT:
+            comments[token.start[0]] = token.start[1]
+        elif token.type == tokenize.INDENT:
+            depth += 1
+        elif token.type == tokenize.DEDENT:
+            depth -= 1
+        elif token.type == tokenize.NEWLINE:
+            at_start = True
+        elif token.type not in (tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER) and at_start:
+            starts[token.start[0]] = depth
+            at_start = False
+        if token.start[0] != token.end[0] and token.type not in (tokenize.NL, tokenize.NEWLINE):
+            # Inside multi-line strings, whitespace and blank lines are part of the value
+            verbatim.update(range(token.start[0] + 1, token.end[0] + 1))
+    compacted = []
+    for row, line in enumerate(lines, 1):
+        if row in comments:
+            line = line[:comments[row]].rstrip()
+        if row in verbatim:
+            compacted.append(line)
+        elif line.strip():
+            compacted.append(" " * starts.get(row, 0) + line.strip())
+    return "\n".join(compacted) + "\n"
+
+
+def minify(source, name="<script>") -> str:
+    """
+    Strip the docstrings, comments, blank lines, indentation and unused top-level definitions of a script.
+
+    :raises ValueError: if `source` or its minified version doesn't compile
+    """
+    source = dedent(source)
+    check_script(source, name)
+    minified = _compact(_drop_statements(source))
+    check_script(minified, f"{name} (minified)")
+    return minified
+
+
+def set_script(script, source, name=None, allowed_modules=()):
+    """
+    `script.setScript(source)`, validated and minified unless POE_STANDALONE_MINIFY=0.
+
+    :param script: the dai.node.Script
+    :param name: name of the script in the errors and in the device logs
+    :param allowed_modules: see `validate_script`
+    """
+    name = name or script.getScriptName()
+    # The runtime accepts an indented script, dedenting keeps its line numbers
+    source = dedent(source)
+    # Validated as written, the errors point to the lines of the template
+    validate_script(source, name, allowed_modules)
+    # Read at each call, so that the size report can build the pipelines both ways
+    if os.environ.get(MINIFY_ENV, "1") != "0":
+        source = minify(source, name)
+    script.setScript(source, name)
+
+
+def script_sizes(pipeline) -> dict:
+    """:return: the size of each script asset of `pipeline`, by asset key"""
+    assets = pipeline.serializeToJson()["assets"]["map"]
+    return {key: asset["size"] for key, asset in assets.items() if key.endswith("/__script")}
+
+
+@click.command(help="Report the script sizes of every pipeline, as written and minified.")
+@click.option("-b", "--blob_path", type=click.Path(exists=True), default=None, help="YOLO Blob, for the yolo pipelines")
+@click.option("-c", "--config_path", type=click.Path(exists=True), default=None, help="YOLO Config, for the yolo pipelines")
+def cli(blob_path, config_path):
+    try:
+        from poe_standalone.standalone import pipelines
+    except ImportError:
+        from standalone import pipelines
+
+    minify_scripts = os.environ.get(MINIFY_ENV)
+    total = [0, 0]
+    for name in pipelines.names():
+        if "yolo" in name and not (blob_path and config_path):
+            click.echo(f"{name:<34} skipped, needs --blob_path and --config_path")
+            continue
+        sizes = []
+        try:
+            for os.environ[MINIFY_ENV] in ("0", "1"):
+                sizes.append(script_sizes(pipelines.build(name, 5000, blob_path, config_path, "127.0.0.1")))
+        except ValueError as ex:
+            click.echo(f"{name:<34} failed: {ex}")
+            continue
+        for key, before in sizes[0].items():
+            after = sizes[1][key]
+            total[0] += before
+            total[1] += after
+            click.echo(f"{name:<34} {key:<18} {before:>8} -> {after:>8} bytes ({after / before:6.1%})")
+    if minify_scripts is None:
+        del os.environ[MINIFY_ENV]
+    else:
+        os.environ[MINIFY_ENV] = minify_scripts
+    if total[0]:
+        click.echo(f"{'total':<53} {total[0]:>8} -> {total[1]:>8} bytes ({total[1] / total[0]:6.1%})")
+
+
+if __name__ == "__main__":
+    cli()
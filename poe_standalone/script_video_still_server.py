@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import time
+from string import Template
+from textwrap import dedent
+
+import click
+import depthai as dai
+
+try:
+    from poe_standalone.utils import getDeviceInfo, read_script_lib
+    from poe_standalone.script_tools import set_script
+except ImportError:
+    from utils import getDeviceInfo, read_script_lib
+    from script_tools import set_script
+
+RESOLUTIONS = {
+    "1080p": dai.ColorCameraProperties.SensorResolution.THE_1080_P,
+    "4k": dai.ColorCameraProperties.SensorResolution.THE_4_K,
+    "12mp": dai.ColorCameraProperties.SensorResolution.THE_12_MP,
+}
+
+
+def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None, control_port=5001,
+                    resolution="12mp", video_size=(1920, 1080), still_quality=95, max_age_ms=200, stall_ms=2000):
+    """
+    Live MJPEG video and full resolution stills from the same camera, each with its own encoder.
+
+    HTTP on `port`: "/video" streams the video, "/still" answers one still.
+    TCP on `control_port`: each "SNAP" line is answered with a "STILL " message, framed like the tcp_streaming_server.
+
+    :param control_port: TCP port of the still requests, None to disable it
+    :param resolution: sensor resolution of the stills, "1080p", "4k" or "12mp"
+    :param video_size: size of the video, cropped from the center of the sensor
+    :param still_quality: MJPEG quality of the stills
+    :param max_age_ms: how long a still is served to later requests before a new one is captured
+    :param stall_ms: how long a video viewer may not take any data before it is disconnected
+    """
+    # Start defining a pipeline
+    pipeline = dai.Pipeline()
+
+    # Define a source - color camera
+    cam = pipeline.create(dai.node.ColorCamera)
+    cam.setResolution(RESOLUTIONS[resolution])
+    cam.setVideoSize(*video_size)
+
+    # VideoEncoders, the stills don't go through the video encoder so they never hold the stream back
+    videoEnc = pipeline.create(dai.node.VideoEncoder)
+    videoEnc.setDefaultProfilePreset(cam.getFps(), dai.VideoEncoderProperties.Profile.MJPEG)
+    stillEnc = pipeline.create(dai.node.VideoEncoder)
+    stillEnc.setDefaultProfilePreset(1, dai.VideoEncoderProperties.Profile.MJPEG)
+    stillEnc.setQuality(still_quality)
+
+    # Script node
+    script = pipeline.create(dai.node.Script)
+    script.setProcessor(dai.ProcessorType.LEON_CSS)
+
+    scrpt_str = Template(dedent("""
+        import time
+        import socket
+        import fcntl
+        import struct
+        import threading
+        from socketserver import ThreadingMixIn, ThreadingTCPServer, StreamRequestHandler
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        ${_script_lib}
+
+        PORT = ${_PORT}
+        CONTROL_PORT = ${_control_port}
+        STALL_S = ${_stall_ms} / 1000
+        INDEX = b'<h1>[DepthAI] Hello, world!</h1><p><a href="video">Video</a> <a href="still">Still</a></p>'
+        JPEG_RESPONSE = b"HTTP/1.1 200 OK\\r\\nContent-Type: image/jpeg\\r\\nContent-Length: %d\\r\\n\\r\\n"
+        PART_HEADER = b"--jpgboundary\\r\\nContent-type: image/jpeg\\r\\nContent-length: %d\\r\\n\\r\\n"
+        PART_END = b"\\r\\n"
+        ctrl = CameraControl()
+        ctrl.setCaptureStill(True)
+
+        # One thread pulls the video encoder output, every viewer reads the latest frame from there
+        frames = LatestValue()
+
+        def pump():
+            while True:
+                frames.publish(node.io['video'].get().getData())
+
+        threading.Thread(target=pump, daemon=True).start()
+
+        def capture(key):
+            node.io['control'].send(ctrl)
+            still = node.io['still'].get()
+            return still.getTimestamp(), bytes(still.getData())
+
+        # Requests arriving together share one still, later ones reuse it for ${_max_age_ms} ms
+        stills = SingleFlight(capture, ${_max_age_ms}, size=1)
+
+        def get_ip_address(ifname):
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            return socket.inet_ntoa(fcntl.ioctl(
+                s.fileno(),
+                -1071617759,  # SIOCGIFADDR
+                struct.pack('256s', ifname[:15].encode())
+            )[20:24])
+
+        class ThreadingSimpleServer(ThreadingMixIn, HTTPServer):
+            pass
+
+        class HTTPHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path == '/':
+                    self.reply(200, INDEX)
+                elif self.path == '/still':
+                    ts, data = stills.get()
+                    send_framed(self.connection, (JPEG_RESPONSE % len(data), data))
+                elif self.path == '/video':
+                    self.stream()
+                else:
+                    self.reply(404, b'Url not found...')
+
+            def reply(self, code, body):
+                self.send_response(code)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def stream(self):
+                self.send_response(200)
+                self.send_header('Content-type', 'multipart/x-mixed-replace; boundary=--jpgboundary')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                self.close_connection = True
+                self.connection.settimeout(STALL_S)
+                seq = 0
+                try:
+                    while True:
+                        seq, data = frames.wait(seq)
+                        send_framed(self.connection, (PART_HEADER % len(data), data, PART_END))
+                except OSError as ex:
+                    node.warn(f"Client disconnected {self.client_address}: {ex!r}")
+
+        class ControlHandler(StreamRequestHandler):
+            def handle(self):
+                tune_socket(self.connection)
+                for line in self.rfile:
+                    if line.strip().upper() == b"SNAP":
+                        ts, data = stills.get()
+                        send_framed(self.connection, pack("STILL ", ts, data))
+                    elif line.strip():
+                        node.warn(f"Invalid command from {self.client_address}: {line!r}")
+
+        if CONTROL_PORT:
+            control = ThreadingTCPServer(("", CONTROL_PORT), ControlHandler)
+            threading.Thread(target=control.serve_forever, daemon=True).start()
+
+        with ThreadingSimpleServer(("", PORT), HTTPHandler) as httpd:
+            node.warn(f"Serving at {get_ip_address('re0')}:{PORT}, stills on TCP port {CONTROL_PORT}")
+            httpd.serve_forever()
+    """))
+    set_script(
+        script,
+        scrpt_str.safe_substitute(
+            _PORT=port,
+            _control_port=control_port,
+            _max_age_ms=max_age_ms,
+            _stall_ms=stall_ms,
+            _script_lib=read_script_lib("framing", "snapshot"),
+        )
+    )
+
+    # Connections
+    cam.video.link(videoEnc.input)
+    cam.still.link(stillEnc.input)
+    script.outputs['control'].link(cam.inputControl)
+    videoEnc.bitstream.link(script.inputs['video'])
+    script.inputs['video'].setBlocking(False)
+    script.inputs['video'].setQueueSize(1)
+    stillEnc.bitstream.link(script.inputs['still'])
+    return pipeline
+
+
+if __name__ == '__main__':
+    # Connect to device with pipeline
+    device_info = getDeviceInfo()
+    with dai.Device(create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None), device_info) as device:
+        click.echo(f"\t>>> Name: {device_info.name}")
+        click.echo(f"\t>>> MXID: {device.getMxId()}")
+        click.echo(f"\t>>> Cameras: {[c.name for c in device.getConnectedCameras()]}")
+        click.echo(f"\t>>> USB speed: {device.getUsbSpeed().name}")
+        while not device.isClosed():
+            time.sleep(1)
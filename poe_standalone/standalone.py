@@ -1,5 +1,6 @@
 # coding=utf-8
-import socket
+import json
+import shutil
 import time
 from functools import partial
 from ipaddress import IPv4Address
@@ -7,55 +8,83 @@ from pathlib import Path
 from urllib import request
 from urllib.error import URLError
 
-import depthai as dai
-import numpy as np
 # import click
 import rich_click as click
 from click_params import IPV4_ADDRESS
-from validators import ip_address
+from validators.ip_address import ipv4
 try:
-    from poe_standalone import script_http_server, script_mjpeg_server
-    from poe_standalone.tcp_streaming_client import tcp_streaming_client
-    from poe_standalone.tcp_streaming_server import (
-        tcp_streaming_server,
-        tcp_streaming_server_config_focus,
-    )
-    from poe_standalone.utils import getDeviceInfo, get_local_ip, lazy_import
-    from poe_standalone.yolo import yolo_decoding, yolo_stereo_decoding
-    from poe_standalone.modbus_tcp import modbus_server_test
+    from poe_standalone.dap_cache import DapCache, package_manifest
+    from poe_standalone.discovery import DEFAULT_TTL, DeviceCache, connect_info
+    from poe_standalone.fingerprint import clear_application, flash_package
+    from poe_standalone.fleet import PackageCache, print_summary, resolve_devices, run_fleet
+    from poe_standalone.registry import PipelineRegistry, file_source, pipeline_options
+    from poe_standalone.script_tools import validate_pipeline
+    from poe_standalone.utils import getDeviceInfo, get_local_ip
 except ImportError:
-    import script_http_server, script_mjpeg_server
-    from tcp_streaming_client import tcp_streaming_client
-    from tcp_streaming_server import (
-        tcp_streaming_server,
-        tcp_streaming_server_config_focus,
-    )
-    from utils import getDeviceInfo, get_local_ip, lazy_import
-    from yolo import yolo_decoding, yolo_stereo_decoding
-    from modbus_tcp import modbus_server_test
-
-
-create_pipelines = {
-    "script_http_server": script_http_server.create_pipeline,
-    "script_mjpeg_server": script_mjpeg_server.create_pipeline,
-    "tcp_streaming_server": tcp_streaming_server.create_pipeline,
-    "tcp_streaming_server_config_focus": tcp_streaming_server_config_focus.create_pipeline,
-    "tcp_streaming_client": tcp_streaming_client.create_pipeline,
-    "yolo_decoding": yolo_decoding.create_pipeline,
-    "yolo_stereo_decoding": yolo_stereo_decoding.create_pipeline,
-    "modbus_server_test": modbus_server_test,
-    "custom_pipeline": "",
-}
+    from dap_cache import DapCache, package_manifest
+    from discovery import DEFAULT_TTL, DeviceCache, connect_info
+    from fingerprint import clear_application, flash_package
+    from fleet import PackageCache, print_summary, resolve_devices, run_fleet
+    from registry import PipelineRegistry, file_source, pipeline_options
+    from script_tools import validate_pipeline
+    from utils import getDeviceInfo, get_local_ip
 
-click.option = partial(click.option, show_default=True)
 
-deviceInfos = [device_info for device_info in dai.Device.getAllAvailableDevices() if ip_address.ipv4(device_info.name)]
-deviceInfos.sort(key=lambda device_info: int(IPv4Address(device_info.name)))
-deviceIps = {deviceInfo.name: deviceInfo.getMxId() for deviceInfo in deviceInfos}
+# Built-in, plugin and POE_STANDALONE_PIPELINES pipelines, only imported once selected. "custom_pipeline" runs the
+# file of --custom_pipeline
+pipelines = PipelineRegistry()
+CUSTOM_PIPELINE = "custom_pipeline"
 
-deviceInfos = {deviceInfo.getMxId(): deviceInfo for deviceInfo in deviceInfos}
+click.option = partial(click.option, show_default=True)
 
 
+def load_pipeline(name):
+    """Import the `create_pipeline` function registered as `name` in `pipelines`."""
+    return pipelines.load(name)
+
+
+def get_device_info(device=None, cache=None, refresh=True) -> "dai.DeviceInfo":
+    """
+    Find the device whose IP or MXID is `device`, or let the user choose one.
+
+    An IP is connected to directly, an MXID through the IP the discovery cache knows it at. Devices are only discovered
+    here, by the commands that talk to a device: to choose one, for an MXID missing from the cache, and in the
+    background otherwise, so that the cache stays fresh while the command runs.
+
+    :param refresh: whether to discover in the background, off for the commands that connect to the bootloader, an
+        XLink search running alongside their connection could make it fail
+    """
+    cache = cache or DeviceCache()
+    if not device:
+        return getDeviceInfo(deviceInfos=cache.discover())
+    if ipv4(device):
+        if refresh:
+            cache.discover_in_background()
+        return connect_info(device)
+    entry = cache.find(device)
+    if entry is not None:
+        if refresh:
+            cache.discover_in_background()
+        return connect_info(entry["ip"])
+    for device_info in cache.discover():
+        if device_info.getMxId() == device:
+            return device_info
+    raise click.BadParameter(f"No OAK POE device found with the MXID {device}", param_hint="--device_ip")
+
+
+def parse_pipeline_options(ctx, param, values) -> dict:
+    """NAME=VALUE pairs of the --option option, a VALUE is JSON if it parses as JSON, else a string."""
+    options = {}
+    for value in values:
+        name, sep, raw = value.partition("=")
+        if not sep or not name.isidentifier():
+            raise click.BadParameter(f"Expected NAME=VALUE, got {value!r}", ctx, param)
+        try:
+            options[name] = json.loads(raw)
+        except ValueError:
+            options[name] = raw
+    return options
+
 
 @click.group(
     context_settings=dict(
@@ -70,9 +99,17 @@ deviceInfos = {deviceInfo.getMxId(): deviceInfo for deviceInfo in deviceInfos}
     "--device_ip",
     prompt=True,
     prompt_required=False,
-    type=click.Choice(choices=deviceIps, case_sensitive=False),
+    type=click.STRING,
     default=None,
-    help="The IP of the OAK device you want to connect to. The default is to list all for you to choose from.",
+    help="The IP or MXID of the OAK device you want to connect to. The default is to list all for you to choose from.",
+)
+@click.option(
+    "-cache_ttl",
+    "--cache_ttl",
+    type=click.IntRange(0),
+    default=DEFAULT_TTL,
+    help="Seconds a device found by discovery is remembered, to connect to its MXID without discovering it again. "
+         "0 always discovers.",
 )
 @click.option(
     "-host_ip",
@@ -80,15 +117,16 @@ deviceInfos = {deviceInfo.getMxId(): deviceInfo for deviceInfo in deviceInfos}
     prompt=True,
     prompt_required=False,
     # type=click.STRING,
-    default=get_local_ip(),
-    help="The IP of the Host pc you want to connect to.",
+    default=None,
+    help="The IP of the Host pc you want to connect to. The default is the local IP on the device subnet, "
+         "looked up when needed.",
 )
 @click.option(
     "-P",
     "--pipeline",
     prompt=True,
     prompt_required=False,
-    type=click.Choice(choices=create_pipelines, case_sensitive=False),
+    type=click.Choice(choices=pipelines.names() + [CUSTOM_PIPELINE], case_sensitive=False),
     default="script_http_server",
     help="Pipeline you want to start. ",
 )
@@ -99,7 +137,7 @@ deviceInfos = {deviceInfo.getMxId(): deviceInfo for deviceInfo in deviceInfos}
     prompt_required=False,
     default=None,
     type=click.Path(exists=True, path_type=Path),
-    help="The custom pipeline you want to start.",
+    help="The custom pipeline you want to start, with --pipeline custom_pipeline.",
 )
 @click.option(
     "-p",
@@ -126,13 +164,25 @@ deviceInfos = {deviceInfo.getMxId(): deviceInfo for deviceInfo in deviceInfos}
     prompt_required=False,
     type=click.Path(exists=True, path_type=Path),
     default=None,
-    help="YOLO Config path to use",
+    help="YOLO Config path to use, or the services json of multi_protocol_server",
+)
+@click.option(
+    "-o",
+    "--option",
+    "options",
+    multiple=True,
+    metavar="NAME=VALUE",
+    callback=parse_pipeline_options,
+    show_default=False,
+    help="Option of the pipeline, can be repeated, eg. -o send_policy=disconnect -o stall_ms=500. "
+         "Values are parsed as JSON, else kept as strings. `pipelines --build` lists the options of each pipeline.",
 )
 @click.pass_context
-def cli(ctx, device_ip, host_ip, pipeline, custom_pipeline, port, blob_path, config_path):
+def cli(ctx, device_ip, cache_ttl, host_ip, pipeline, custom_pipeline, port, blob_path, config_path, options):
     click.echo(click.get_current_context().params)
     ctx.ensure_object(dict)
-    ctx.obj["device_id"] = deviceIps.get(device_ip)
+    ctx.obj["device_ip"] = device_ip
+    ctx.obj["device_cache"] = DeviceCache(ttl=cache_ttl)
     if "yolo" in pipeline:
         if blob_path is None:
             blob_path = click.prompt(
@@ -144,26 +194,66 @@ def cli(ctx, device_ip, host_ip, pipeline, custom_pipeline, port, blob_path, con
                 "Prompt the yolo config json path",
                 type=click.Path(exists=True, path_type=Path),
             )
+    if pipeline == CUSTOM_PIPELINE:
+        if custom_pipeline is None:
+            custom_pipeline = click.prompt(
+                "Prompt the custom pipeline path",
+                type=click.Path(exists=True, path_type=Path),
+            )
+        pipeline = pipelines.register(file_source(custom_pipeline), replace=True).name
+    ctx.obj["pipeline"] = pipeline
+    ctx.obj["host_ip"] = host_ip
     ctx.obj["port"] = port
     ctx.obj["blob_path"] = blob_path
     ctx.obj["config_path"] = config_path
-    if pipeline == "custom_pipeline":
-        custom_pipeline = lazy_import("create_pipeline", custom_pipeline)
-        ctx.obj["create_pipeline"] = custom_pipeline.create_pipeline(
-            port, blob_path, config_path, host_ip
-        )
-    else:
-        ctx.obj["create_pipeline"] = create_pipelines.get(pipeline)(
-            port, blob_path, config_path, host_ip
-        )
+    ctx.obj["options"] = options
+    # Without a device IP, eg. for an offline build, the host IP isn't guessed from the build machine
+    ctx.obj["target_ip"] = device_ip if device_ip and ipv4(device_ip) else None
+    ctx.obj["create_pipeline"] = partial(build_pipeline, pipeline, port, blob_path, config_path, host_ip,
+                                         device_ip=ctx.obj["target_ip"], options=options)
     if ctx.invoked_subcommand is None:
         ctx.invoke(host_run)
 
 
+def resolve_host_ip(host_ip, device_ip=None):
+    """
+    :param host_ip: the --host_ip option
+    :param device_ip: IP of the target device, to choose the default `host_ip` on its subnet
+    :return: `host_ip`, else the local IP on the subnet of `device_ip`, else None: a package built without a device
+        doesn't embed an IP of the build machine, the pipelines that need one ask for --host_ip
+    """
+    if host_ip is None and device_ip is not None:
+        host_ip = get_local_ip(device_ip)
+    return host_ip
+
+
+def build_pipeline(pipeline, port, blob_path, config_path, host_ip, device_ip=None, options=None):
+    """
+    Called by the commands that need the pipeline, the others don't pay for importing and building it.
+
+    :param pipeline: name of the pipeline in `pipelines`
+    :param host_ip: see `resolve_host_ip`
+    :param device_ip: see `resolve_host_ip`
+    :param options: keyword arguments of its `create_pipeline`, from --option
+    """
+    try:
+        built = pipelines.build(pipeline, port, blob_path, config_path, resolve_host_ip(host_ip, device_ip),
+                                **(options or {}))
+        # A script that can't run only fails on the device, after flashing and rebooting
+        validate_pipeline(built)
+    except ValueError as ex:
+        raise click.ClickException(str(ex))
+    timing = pipelines.timings[pipeline]
+    click.echo(f"Pipeline {pipeline} imported in {timing['import'] * 1000:.0f} ms, "
+               f"built in {timing['build'] * 1000:.0f} ms")
+    return built
+
+
+# Names of the dai.DeviceBootloader.Type values, depthai is only imported by the commands that talk to a device
 blTypes = {
-    "auto": dai.DeviceBootloader.Type.AUTO,
-    "usb": dai.DeviceBootloader.Type.USB,
-    "net": dai.DeviceBootloader.Type.NETWORK,
+    "auto": "AUTO",
+    "usb": "USB",
+    "net": "NETWORK",
 }
 
 
@@ -176,13 +266,13 @@ blTypes = {
 @click.argument("bl_type", type=click.Choice(blTypes), default="auto")
 @click.pass_context
 def flash_bootloader(ctx, bl_type):
-    blType = blTypes.get(bl_type)
-    if ctx.obj["device_id"]:
-        device_info = deviceInfos[ctx.obj["device_id"]]
-    else:
-        device_info = getDeviceInfo()
+    import depthai as dai
+
+    blType = getattr(dai.DeviceBootloader.Type, blTypes[bl_type])
+    device_info = get_device_info(ctx.obj["device_ip"], ctx.obj["device_cache"], refresh=False)
 
-    hasBootloader = device_info.state == dai.XLinkDeviceState.X_LINK_BOOTLOADER
+    # A device connected to directly has an unknown state, assume it runs a bootloader to keep the warnings
+    hasBootloader = device_info.state in (dai.XLinkDeviceState.X_LINK_BOOTLOADER, dai.XLinkDeviceState.X_LINK_ANY_STATE)
     if hasBootloader:
         if not click.confirm(
                 "Warning! Flashing bootloader can potentially soft brick your device and should be done with caution.\n"
@@ -240,12 +330,11 @@ def flash_bootloader(ctx, bl_type):
 )
 @click.pass_context
 def clear_pipeline(ctx):
-    if ctx.obj["device_id"]:
-        device_info = deviceInfos[ctx.obj["device_id"]]
-    else:
-        device_info = getDeviceInfo()
+    import depthai as dai
+
+    device_info = get_device_info(ctx.obj["device_ip"], ctx.obj["device_cache"], refresh=False)
     bootloader = dai.DeviceBootloader(device_info)
-    click.echo(f"{bootloader.flashClear()}")
+    click.echo(f"{clear_application(bootloader)}")
 
 
 @cli.command(
@@ -254,12 +343,11 @@ def clear_pipeline(ctx):
 )
 @click.pass_context
 def host_run(ctx):
+    import depthai as dai
+
     # Connect to device with pipeline
-    if ctx.obj["device_id"]:
-        device_info = deviceInfos[ctx.obj["device_id"]]
-    else:
-        device_info = getDeviceInfo()
-    with dai.Device(ctx.obj["create_pipeline"], device_info) as device:
+    device_info = get_device_info(ctx.obj["device_ip"], ctx.obj["device_cache"])
+    with dai.Device(ctx.obj["create_pipeline"](device_ip=device_info.name), device_info) as device:
         eeprom_data = device.readCalibration2().getEepromData()
         click.echo(f"\t>>> Name: {device_info.name}")
         click.echo(f"\t>>> MXID: {device.getMxId()}")
@@ -291,12 +379,18 @@ def host_run(ctx):
     type=click.Path(),
     help="Depthai Application Package Path",
 )
+@click.option(
+    "-f",
+    "--force",
+    is_flag=True,
+    default=False,
+    help="Flash even if the device already runs the same package",
+)
 @click.pass_context
-def flash_pipeline(ctx, dap):
-    if ctx.obj["device_id"]:
-        device_info = deviceInfos[ctx.obj["device_id"]]
-    else:
-        device_info = getDeviceInfo()
+def flash_pipeline(ctx, dap, force):
+    import depthai as dai
+
+    device_info = get_device_info(ctx.obj["device_ip"], ctx.obj["device_cache"], refresh=False)
     bootloader = dai.DeviceBootloader(device_info)
     # bar = click.progressbar(length=10, label="Flashing progress: ")
     # progress = lambda p: bar.update(p)
@@ -304,12 +398,16 @@ def flash_pipeline(ctx, dap):
     progress = lambda p: click.echo(f"\rFlashing progress: {p:.2%}", nl=False)
 
     if dap:
-        bootloader.flashDepthaiApplicationPackage(
-            progress, np.fromfile(dap, dtype="uint8")
-        )
+        import numpy as np
+
+        package = np.fromfile(dap, dtype="uint8")
     else:
-        bootloader.flash(progress, ctx.obj["create_pipeline"], compress=True)
+        # The package of an identical pipeline is reused instead of compressed again
+        digest, package = DapCache().load(ctx.obj["create_pipeline"](device_ip=device_info.name))
+    # Skipped when the fingerprint stored on the device matches the package
+    success, message = flash_package(bootloader, package, progress, force)
     click.echo()
+    click.echo(message if success else f"Flashing failed: {message}")
 
 
 @cli.command(
@@ -320,14 +418,183 @@ def flash_pipeline(ctx, dap):
 @click.argument("dap_name", default=f"pipeline_{time.strftime('%Y%m%d_%H%M')}.dap")
 @click.pass_context
 def save_pipeline(ctx, dap_name):
-    if ctx.obj["device_id"]:
-        device_info = deviceInfos[ctx.obj["device_id"]]
+    ctx.invoke(build, dap_name=dap_name, manifest=False)
+
+
+@cli.command(
+    "build",
+    short_help="Build the application package offline, with a manifest",
+    help="Build the application package of the pipeline and a JSON manifest of its assets and sizes, without any "
+         "device or discovery, eg. on a build server. Flash it with flash_pipeline --dap or fleet flash_pipeline --dap.",
+)
+@click.argument("dap_name", default=f"pipeline_{time.strftime('%Y%m%d_%H%M')}.dap")
+@click.option("--manifest/--no_manifest", default=True, help="Write the manifest next to the package, as <dap_name>.json")
+@click.pass_context
+def build(ctx, dap_name, manifest):
+    # Built on the host without a device, or copied from the cache when the pipeline didn't change
+    pipeline = ctx.obj["create_pipeline"]()
+    digest, path = DapCache().get(pipeline)
+    shutil.copyfile(path, dap_name)
+    click.echo(f"Saved {dap_name} ({digest[:12]})")
+    if manifest:
+        manifest_path = Path(f"{dap_name}.json")
+        content = package_manifest(pipeline, Path(dap_name), digest)
+        content.update(
+            pipeline=ctx.obj["pipeline"],
+            port=ctx.obj["port"],
+            blob_path=ctx.obj["blob_path"] and str(ctx.obj["blob_path"]),
+            config_path=ctx.obj["config_path"] and str(ctx.obj["config_path"]),
+            options=ctx.obj["options"],
+            # The IP the pipeline was built with, as build_pipeline resolved it
+            host_ip=resolve_host_ip(ctx.obj["host_ip"], ctx.obj["target_ip"]),
+            built_at=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        )
+        manifest_path.write_text(json.dumps(content, indent=2), encoding="utf-8")
+        click.echo(f"Saved {manifest_path}: {content['size']} bytes, {len(content['assets'])} assets")
+
+
+@cli.command(
+    "devices",
+    short_help="List the OAK POE devices",
+    help="List the devices of the discovery cache, they are discovered again when none is fresh or with --refresh.",
+)
+@click.option("-r", "--refresh", is_flag=True, default=False, help="Discover the devices even if the cache is fresh")
+@click.pass_context
+def devices(ctx, refresh):
+    cache = ctx.obj["device_cache"]
+    entries = [] if refresh else cache.fresh()
+    if not entries:
+        discovered = {device_info.getMxId() for device_info in cache.discover()}
+        entries = [entry for mxid, entry in cache.load().items() if mxid in discovered]
+    if not entries:
+        raise click.ClickException("No OAK POE device found")
+    now = time.time()
+    for entry in sorted(entries, key=lambda entry: int(IPv4Address(entry["ip"]))):
+        click.echo(f"{entry['ip']:<15} {entry['mxid']} [{entry['state']}] seen {now - entry['last_seen']:.0f}s ago")
+
+
+@cli.command(
+    "pipelines",
+    short_help="List the pipelines",
+    help="List the built-in, plugin and POE_STANDALONE_PIPELINES pipelines. With --build, build each one and report "
+         "how long importing and building it took, without a device.",
+)
+@click.option("-B", "--build", "build_all", is_flag=True, default=False, help="Build every pipeline and time it")
+@click.pass_context
+def list_pipelines(ctx, build_all):
+    host_ip = ctx.obj["host_ip"] or get_local_ip() or "127.0.0.1"
+    for name, source in pipelines.sources.items():
+        line = f"{name:<34} {source.kind:<8} {source.origin}"
+        if not build_all:
+            click.echo(line)
+            continue
+        if "yolo" in name and not (ctx.obj["blob_path"] and ctx.obj["config_path"]):
+            click.echo(f"{line}\n    skipped, needs --blob_path and --config_path")
+            continue
+        try:
+            validate_pipeline(pipelines.build(name, ctx.obj["port"], ctx.obj["blob_path"], ctx.obj["config_path"],
+                                              host_ip))
+        except ValueError as ex:
+            click.echo(f"{line}\n    failed: {ex}")
+            continue
+        timing = pipelines.timings[name]
+        click.echo(f"{line}\n    import {timing['import'] * 1000:8.1f} ms   build {timing['build'] * 1000:8.1f} ms")
+        options = pipeline_options(pipelines.load(name))
+        if options:
+            click.echo(f"    options: {', '.join(f'{option}={default!r}' for option, default in options.items())}")
+
+
+@cli.group(
+    "fleet",
+    short_help="Flash or clear many devices at once",
+    help="Flash the pipeline or the bootloader, or clear the pipeline, on many devices concurrently. "
+         "DEVICES are IPs, MXIDs, or \"all\" for every discovered device.",
+)
+@click.option("-j", "--workers", type=click.IntRange(1), default=8, help="Devices handled at once")
+@click.option("-r", "--retries", type=click.IntRange(0), default=2, help="Retries of a device that failed")
+@click.pass_context
+def fleet(ctx, workers, retries):
+    ctx.obj["fleet"] = dict(workers=workers, retries=retries)
+
+
+def run_fleet_command(ctx, targets, operation):
+    try:
+        devices = resolve_devices(targets, ctx.obj["device_cache"])
+    except ValueError as ex:
+        raise click.BadParameter(str(ex), param_hint="DEVICES")
+    if not devices:
+        raise click.ClickException("No OAK POE device found")
+    results = run_fleet(devices, operation, **ctx.obj["fleet"])
+    print_summary(results)
+    failed = [result.device for result in results if not result.ok]
+    if failed:
+        raise click.ClickException(f"{len(failed)} of {len(results)} devices failed: {', '.join(failed)}")
+
+
+@fleet.command("flash_pipeline", short_help="Flash the pipeline to many devices")
+@click.argument("targets", metavar="DEVICES", nargs=-1, required=True)
+@click.option("-d", "--dap", default=None, type=click.Path(exists=True), help="Depthai Application Package Path")
+@click.option("-f", "--force", is_flag=True, default=False, help="Flash even the devices already running the package")
+@click.pass_context
+def fleet_flash_pipeline(ctx, targets, dap, force):
+    import depthai as dai
+
+    if dap:
+        import numpy as np
+
+        package = np.fromfile(dap, dtype="uint8")
+        get_package = lambda device_ip: package
     else:
-        device_info = getDeviceInfo()
-    bootloader = dai.DeviceBootloader(device_info)
-    bootloader.saveDepthaiApplicationPackage(
-        dap_name, ctx.obj["create_pipeline"], compress=True
-    )
+        # Built once per host IP, the devices of a subnet share the package
+        get_package = PackageCache(ctx.obj["create_pipeline"], ctx.obj["host_ip"]).get
+
+    def flash(device_info, progress):
+        package = get_package(device_info.name)
+        with dai.DeviceBootloader(device_info) as bootloader:
+            return flash_package(bootloader, package, progress, force)
+
+    run_fleet_command(ctx, targets, flash)
+
+
+@fleet.command("flash_bootloader", short_help="Flash the bootloader to many devices")
+@click.argument("targets", metavar="DEVICES", nargs=-1, required=True)
+@click.option("-t", "--bl_type", type=click.Choice(blTypes), default="auto", help="Bootloader type")
+@click.option("-y", "--yes", is_flag=True, default=False, help="Don't ask for confirmation")
+@click.pass_context
+def fleet_flash_bootloader(ctx, targets, bl_type, yes):
+    import depthai as dai
+
+    if not yes and not click.confirm(
+            "Warning! Flashing bootloader can potentially soft brick your devices and should be done with caution.\n"
+            "Do not unplug your devices while the bootloader is flashing.\n"
+            "Type 'y' and press enter to proceed, otherwise exits: "
+    ):
+        click.echo("Prompt declined, exiting...")
+        exit(-1)
+
+    def flash(device_info, progress):
+        with dai.DeviceBootloader(device_info, allowFlashingBootloader=True) as bootloader:
+            blType = getattr(dai.DeviceBootloader.Type, blTypes[bl_type])
+            if blType == dai.DeviceBootloader.Type.AUTO:
+                blType = bootloader.getType()
+            return bootloader.flashBootloader(dai.DeviceBootloader.Memory.FLASH, blType, progress)
+
+    run_fleet_command(ctx, targets, flash)
+
+
+@fleet.command("clear_pipeline", short_help="Clear the flashed app on many devices")
+@click.argument("targets", metavar="DEVICES", nargs=-1, required=True)
+@click.pass_context
+def fleet_clear_pipeline(ctx, targets):
+    import depthai as dai
+
+    def clear(device_info, progress):
+        with dai.DeviceBootloader(device_info) as bootloader:
+            result = clear_application(bootloader)
+        progress(1.0)
+        return result
+
+    run_fleet_command(ctx, targets, clear)
 
 
 @cli.command(
@@ -339,10 +606,9 @@ def save_pipeline(ctx, dap_name):
 )
 @click.pass_context
 def set_ip(ctx):
-    if ctx.obj["device_id"]:
-        device_info = deviceInfos[ctx.obj["device_id"]]
-    else:
-        device_info = getDeviceInfo()
+    import depthai as dai
+
+    device_info = get_device_info(ctx.obj["device_ip"], ctx.obj["device_cache"], refresh=False)
     click.echo(f"Found device with name: {device_info.name}")
     click.echo("-------------------------------------")
     click.echo('"1" to set a static IPv4 address')
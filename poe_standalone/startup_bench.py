@@ -0,0 +1,66 @@
+# coding=utf-8
+"""
+Startup benchmark of the poe_standalone CLI: `python -m poe_standalone.startup_bench`.
+
+Every case runs in a fresh interpreter, the best of `--repeat` runs is compared to `--budget_ms`.
+It also fails when importing the CLI imports depthai, which is slow to import, or a pipeline module,
+built-in or plugin, which is what made `poe_standalone -h` take seconds. The tests run the same check.
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+import click
+
+CASES = {
+    "import poe_standalone": ["-c", "import poe_standalone"],
+    "import poe_standalone.utils": ["-c", "import poe_standalone.utils"],
+    "import poe_standalone.standalone": ["-c", "import poe_standalone.standalone"],
+    "poe_standalone -h": ["-m", "poe_standalone.standalone", "-h"],
+}
+
+# Run in the child interpreter: neither depthai, so no device discovery either, nor any pipeline may be imported by
+# the CLI import
+LAZINESS_CHECK = """
+import sys
+
+from poe_standalone import standalone
+
+if "depthai" in sys.modules:
+    raise SystemExit("depthai is imported with poe_standalone.standalone")
+modules = {source.module_name for source in standalone.pipelines.sources.values()}
+loaded = sorted(modules & set(sys.modules))
+if loaded:
+    raise SystemExit(f"Pipelines imported with poe_standalone.standalone: {loaded}")
+"""
+
+
+def run(args):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *args], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode:
+        raise click.ClickException(f"`python {' '.join(args)}` failed:\n{result.stderr}")
+    return elapsed
+
+
+@click.command(help="Measure how long the poe_standalone CLI takes to start, and fail over the budget.")
+@click.option("-n", "--repeat", type=click.IntRange(1), default=5, show_default=True, help="Runs per case")
+@click.option("-b", "--budget_ms", type=click.FLOAT, default=1500, show_default=True, help="Budget of each case")
+def cli(repeat, budget_ms):
+    run(["-c", LAZINESS_CHECK])
+    click.echo("Laziness check passed: no depthai import, no pipeline import")
+    over = []
+    for name, args in CASES.items():
+        times = [run(args) * 1000 for _ in range(repeat)]
+        best = min(times)
+        click.echo(f"{name:<36} best {best:8.1f} ms   median {statistics.median(times):8.1f} ms")
+        if best > budget_ms:
+            over.append(name)
+    if over:
+        raise click.ClickException(f"Over the {budget_ms:.0f} ms budget: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,17 +1,22 @@
 # coding=utf-8
 import time
 from string import Template
+from textwrap import dedent
 
 import click
 import depthai as dai
 
 try:
-    from poe_standalone.utils import getDeviceInfo
+    from poe_standalone.utils import getDeviceInfo, get_local_ip, read_script_lib
+    from poe_standalone.script_tools import set_script
 except ImportError:
-    from utils import getDeviceInfo
+    from utils import getDeviceInfo, get_local_ip, read_script_lib
+    from script_tools import set_script
 
 
 def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
+    if not host_ip:
+        raise ValueError("tcp_streaming_client needs the host IP the device connects to, pass --host_ip or --device_ip")
     pipeline = dai.Pipeline()
 
     camRgb = pipeline.createColorCamera()
@@ -25,24 +30,23 @@ def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
     script.setProcessor(dai.ProcessorType.LEON_CSS)
     videoEnc.bitstream.link(script.inputs["frame"])
 
-    scrpt_str = Template(f"""
+    scrpt_str = Template(dedent("""
     # Enter your own IP!
-    HOST_IP = ${_host_ip}
+    HOST_IP = "${_host_ip}"
     import socket
     import time
+    ${_script_lib}
+
     sock = socket.socket()
     sock.connect((HOST_IP, ${_PORT}))
+    tune_socket(sock)
     while True:
         pck = node.io["frame"].get()
-        data = pck.getData()
-        ts = pck.getTimestamp()
-        header = f"ABCDE " + str(ts.total_seconds()).ljust(18) + str(len(data)).ljust(8)
-        # node.warn(f'>{header}<')
-        sock.send(bytes(header, encoding='ascii'))
-        sock.send(data)
-    """)
-    script.setScript(
-        scrpt_str.safe_substitute(_PORT=port, _host_ip=host_ip)
+        send_framed(sock, pack("ABCDE ", pck.getTimestamp(), pck.getData()))
+    """))
+    set_script(
+        script,
+        scrpt_str.safe_substitute(_PORT=port, _host_ip=host_ip, _script_lib=read_script_lib("framing"))
     )
     return pipeline
 
@@ -50,7 +54,8 @@ def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
 if __name__ == "__main__":
     # Connect to device with pipeline
     device_info = getDeviceInfo()
-    with dai.Device(create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None), device_info) as device:
+    host_ip = get_local_ip(device_info.name)
+    with dai.Device(create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=host_ip), device_info) as device:
         click.echo(f"\t>>> Name: {device_info.name}")
         click.echo(f"\t>>> MXID: {device.getMxId()}")
         click.echo(f"\t>>> Cameras: {[c.name for c in device.getConnectedCameras()]}")
@@ -1,17 +1,22 @@
 # coding=utf-8
 import time
 from string import Template
+from textwrap import dedent
 
 import click
 import depthai as dai
 
 try:
-    from poe_standalone.utils import getDeviceInfo
+    from poe_standalone.utils import check_send_policy, getDeviceInfo, read_script_lib
+    from poe_standalone.script_tools import set_script
 except ImportError:
-    from utils import getDeviceInfo
+    from utils import check_send_policy, getDeviceInfo, read_script_lib
+    from script_tools import set_script
 
 
-def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
+def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None, send_policy="drop-oldest", stall_ms=1000,
+                    queue_depth=2):
+    check_send_policy(send_policy, queue_depth)
     # Start defining a pipeline
     pipeline = dai.Pipeline()
 
@@ -28,30 +33,30 @@ def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
     videoEnc.bitstream.link(script.inputs['frame'])
     script.inputs['frame'].setBlocking(False)
     script.inputs['frame'].setQueueSize(1)
-    scrpt_str = Template("""
+    scrpt_str = Template(dedent("""
     import socket
     import time
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind(("0.0.0.0", ${_PORT}))
-    server.listen()
+    ${_script_lib}
+
+    hub = Hub(${_PORT}, ("frame",), {"frame": SendPolicy("${_send_policy}", depth=${_queue_depth}, stall_ms=${_stall_ms})})
     node.warn("Server up port: ${_PORT}")
     while True:
-        conn, client = server.accept()
-        node.warn(f"Connected to client IP: {client}")
-        try:
-            while True:
-                pck = node.io["frame"].get()
-                data = pck.getData()
-                ts = pck.getTimestamp()
-                header = f"ABCDE " + str(ts.total_seconds()).center(18) + str(len(data)).center(8)
-                # node.warn(f'>{header}<')
-                conn.send(bytes(header, encoding='ascii'))
-                conn.send(data)
-        except Exception as e:
-            node.warn("Client disconnected")
-    """)
-    script.setScript(
-        scrpt_str.safe_substitute(_PORT=port)
+        hub.poll(0.005 if hub.clients else None)
+        if not hub.clients:
+            continue
+        pck = node.io["frame"].tryGet()
+        if pck is not None:
+            hub.publish("frame", pack("ABCDE ", pck.getTimestamp(), pck.getData()))
+    """))
+    set_script(
+        script,
+        scrpt_str.safe_substitute(
+            _PORT=port,
+            _send_policy=send_policy,
+            _stall_ms=stall_ms,
+            _queue_depth=queue_depth,
+            _script_lib=read_script_lib("framing", "hub"),
+        )
     )
     return pipeline
 
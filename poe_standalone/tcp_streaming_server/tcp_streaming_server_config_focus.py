@@ -1,26 +1,38 @@
 # coding=utf-8
 import time
 from string import Template
+from textwrap import dedent
 
 import click
 import depthai as dai
 
 try:
-    from poe_standalone.utils import getDeviceInfo
+    from poe_standalone.utils import check_send_policy, getDeviceInfo, read_script_lib
+    from poe_standalone.script_tools import set_script
 except ImportError:
-    from utils import getDeviceInfo
+    from utils import check_send_policy, getDeviceInfo, read_script_lib
+    from script_tools import set_script
 
 
-def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
+def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None, send_policy="drop-oldest", stall_ms=1000,
+                    queue_depth=2):
+    check_send_policy(send_policy, queue_depth)
     # Start defining a pipeline
     pipeline = dai.Pipeline()
 
     camRgb = pipeline.createColorCamera()
     camRgb.setIspScale(2, 3)
 
+    # Crops and scales the video on request of the host, passes full frames through until then
+    width, height = camRgb.getIspSize()
+    manip = pipeline.create(dai.node.ImageManip)
+    manip.initialConfig.setFrameType(dai.ImgFrame.Type.NV12)
+    manip.setMaxOutputFrameSize(width * height * 3 // 2)
+    camRgb.video.link(manip.inputImage)
+
     videoEnc = pipeline.create(dai.node.VideoEncoder)
     videoEnc.setDefaultProfilePreset(30, dai.VideoEncoderProperties.Profile.MJPEG)
-    camRgb.video.link(videoEnc.input)
+    manip.out.link(videoEnc.input)
 
     script = pipeline.create(dai.node.Script)
     script.setProcessor(dai.ProcessorType.LEON_CSS)
@@ -30,45 +42,54 @@ def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
     script.inputs['frame'].setQueueSize(1)
 
     script.outputs['control'].link(camRgb.inputControl)
-    scrpt_str = Template("""
+    script.outputs['manip_cfg'].link(manip.inputConfig)
+    scrpt_str = Template(dedent("""
     import socket
     import time
-    import threading
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind(("0.0.0.0", ${_PORT}))
-    server.listen()
-    node.warn("Server up port: ${_PORT}")
-    def send_frame_thread(conn):
-        try:
-            while True:
-                pck = node.io["frame"].get()
-                data = pck.getData()
-                ts = pck.getTimestamp()
-                header = f"ABCDE " + str(ts.total_seconds()).center(18) + str(len(data)).center(8)
-                # node.warn(f'>{header}<')
-                conn.send(bytes(header, encoding='ascii'))
-                conn.send(data)
-        except Exception as e:
-            node.warn("Client disconnected")
-    def receive_msgs_thread(conn):
-        try:
-            while True:
-                data = conn.recv(32)
-                txt = str(data, encoding="ascii")
+    ${_script_lib}
+
+    FRAME_SIZE = (${_width}, ${_height})
+
+    class ControlHub(Hub):
+        def handle(self, client):
+            # The host sends 32 bytes ascii records, either "<lens position>,"
+            # or "ROI,<xmin>,<ymin>,<xmax>,<ymax>[,<width>,<height>]" with normalized coordinates
+            while len(client.inbox) >= 32:
+                txt = str(client.inbox[:32], encoding="ascii")
+                client.inbox = client.inbox[32:]
                 vals = txt.split(',')
-                ctrl = CameraControl(100)
-                ctrl.setManualFocus(int(vals[0]))
-                node.io['control'].send(ctrl)
-        except Exception as e:
-            node.warn("Client disconnected")
+                try:
+                    if vals[0].strip() == "ROI":
+                        size = (vals[5], vals[6]) if len(vals) > 6 else (0, 0)
+                        node.io['manip_cfg'].send(crop_config(vals[1:5], size, FRAME_SIZE))
+                    else:
+                        ctrl = CameraControl(100)
+                        ctrl.setManualFocus(int(vals[0]))
+                        node.io['control'].send(ctrl)
+                except ValueError:
+                    node.warn(f"Invalid command from {client.address}: {txt!r}")
+
+    hub = ControlHub(${_PORT}, ("frame",), {"frame": SendPolicy("${_send_policy}", depth=${_queue_depth}, stall_ms=${_stall_ms})})
+    node.warn("Server up port: ${_PORT}")
     while True:
-        conn, client = server.accept()
-        node.warn(f"Connected to client IP: {client}")
-        threading.Thread(target=send_frame_thread, args=(conn,)).start()
-        threading.Thread(target=receive_msgs_thread, args=(conn,)).start()
-    """)
-    script.setScript(
-        scrpt_str.safe_substitute(_PORT=port)
+        hub.poll(0.005 if hub.clients else None)
+        if not hub.clients:
+            continue
+        pck = node.io["frame"].tryGet()
+        if pck is not None:
+            hub.publish("frame", pack("ABCDE ", pck.getTimestamp(), pck.getData()))
+    """))
+    set_script(
+        script,
+        scrpt_str.safe_substitute(
+            _PORT=port,
+            _send_policy=send_policy,
+            _stall_ms=stall_ms,
+            _queue_depth=queue_depth,
+            _width=width,
+            _height=height,
+            _script_lib=read_script_lib("framing", "hub", "manip"),
+        )
     )
     return pipeline
 
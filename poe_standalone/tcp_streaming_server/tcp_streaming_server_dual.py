@@ -0,0 +1,101 @@
+# coding=utf-8
+import time
+from string import Template
+from textwrap import dedent
+
+import click
+import depthai as dai
+
+try:
+    from poe_standalone.utils import check_send_policy, getDeviceInfo, read_script_lib
+    from poe_standalone.script_tools import set_script
+except ImportError:
+    from utils import check_send_policy, getDeviceInfo, read_script_lib
+    from script_tools import set_script
+
+
+def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None, send_policy="drop-oldest", stall_ms=1000,
+                    preview_size=(640, 360), preview_quality=50, queue_depth=2):
+    """
+    Like tcp_streaming_server, with a second, small and low quality MJPEG stream.
+
+    Clients get the preview stream ("THUMB " messages) when they connect, and switch to the full resolution
+    stream ("FULL  " messages) with the "SUB full" / "UNSUB preview" commands only when they need it.
+
+    :param preview_size: (width, height) of the preview stream
+    :param preview_quality: MJPEG quality of the preview stream, 0-100
+    :param queue_depth: frames queued per client and stream before the send policy applies
+    """
+    check_send_policy(send_policy, queue_depth)
+    # Start defining a pipeline
+    pipeline = dai.Pipeline()
+
+    camRgb = pipeline.createColorCamera()
+    camRgb.setResolution(dai.ColorCameraProperties.SensorResolution.THE_1080_P)
+
+    fullEnc = pipeline.create(dai.node.VideoEncoder)
+    fullEnc.setDefaultProfilePreset(30, dai.VideoEncoderProperties.Profile.MJPEG)
+    camRgb.video.link(fullEnc.input)
+
+    previewManip = pipeline.create(dai.node.ImageManip)
+    previewManip.initialConfig.setResize(*preview_size)
+    previewManip.initialConfig.setFrameType(dai.ImgFrame.Type.NV12)
+    previewManip.setMaxOutputFrameSize(preview_size[0] * preview_size[1] * 3 // 2)
+    camRgb.video.link(previewManip.inputImage)
+
+    previewEnc = pipeline.create(dai.node.VideoEncoder)
+    previewEnc.setDefaultProfilePreset(30, dai.VideoEncoderProperties.Profile.MJPEG)
+    previewEnc.setQuality(preview_quality)
+    previewManip.out.link(previewEnc.input)
+
+    script = pipeline.create(dai.node.Script)
+    script.setProcessor(dai.ProcessorType.LEON_CSS)
+
+    for name, encoder in (("preview", previewEnc), ("full", fullEnc)):
+        encoder.bitstream.link(script.inputs[name])
+        script.inputs[name].setBlocking(False)
+        script.inputs[name].setQueueSize(1)
+
+    scrpt_str = Template(dedent("""
+    import socket
+    import time
+    ${_script_lib}
+
+    policy = SendPolicy("${_send_policy}", depth=${_queue_depth}, stall_ms=${_stall_ms})
+    hub = Hub(${_PORT}, ("preview", "full"), {"preview": policy, "full": policy}, subscribed=("preview",))
+    node.warn("Server up port: ${_PORT}")
+    while True:
+        hub.poll(0.005 if hub.clients else None)
+        # The full resolution frames are only pulled, and sent, while someone watches them
+        for topic, tag in (("preview", "THUMB "), ("full", "FULL  ")):
+            if hub.wanted(topic):
+                pck = node.io[topic].tryGet()
+                if pck is not None:
+                    hub.publish(topic, pack(tag, pck.getTimestamp(), pck.getData()))
+    """))
+    set_script(
+        script,
+        scrpt_str.safe_substitute(
+            _PORT=port,
+            _send_policy=send_policy,
+            _stall_ms=stall_ms,
+            _queue_depth=queue_depth,
+            _script_lib=read_script_lib("framing", "hub"),
+        )
+    )
+    return pipeline
+
+
+if __name__ == '__main__':
+    # Connect to device with pipeline
+    device_info = getDeviceInfo()
+    with dai.Device(create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None), device_info) as device:
+        click.echo(f"\t>>> Name: {device_info.name}")
+        click.echo(f"\t>>> MXID: {device.getMxId()}")
+        click.echo(f"\t>>> Cameras: {[c.name for c in device.getConnectedCameras()]}")
+        click.echo(f"\t>>> USB speed: {device.getUsbSpeed().name}")
+
+        with open("ip.txt", "w") as f:
+            f.write(device_info.name)
+        while not device.isClosed():
+            time.sleep(1)
@@ -1,20 +1,146 @@
 # coding=utf-8
 
 import importlib.util
+import os
 import socket
+import struct
 import sys
-from ipaddress import IPv4Address
+from ipaddress import IPv4Address, IPv4Interface, IPv4Network
+from pathlib import Path
 
-import depthai as dai
 from validators.ip_address import ipv4
 
 
-def get_local_ip() -> str:
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.connect(("8.8.8.8", 80))
-    local_ip = s.getsockname()[0]
-    s.close()
-    return local_ip
+# Caches shared by every invocation of the CLI, eg. the discovered devices and the built application packages
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "poe_standalone"
+
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891B
+# Host IPs already chosen in this process, by the subnet of the interface that reaches the devices in it
+_host_ips = {}
+
+
+def local_interfaces() -> list:
+    """
+    The IPv4 addresses and subnets of the local interfaces, loopback excluded.
+
+    Listed with psutil when installed, else with ioctl on Linux, else none: `get_local_ip` then asks the routing table.
+
+    :return: list of IPv4Interface
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    interfaces = []
+    if psutil is not None:
+        for addresses in psutil.net_if_addrs().values():
+            interfaces += [IPv4Interface(f"{address.address}/{address.netmask}") for address in addresses
+                           if address.family == socket.AF_INET and address.netmask]
+    elif sys.platform.startswith("linux"):
+        import fcntl
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            for _, name in socket.if_nameindex():
+                request = struct.pack("256s", name[:15].encode())
+                try:
+                    address = socket.inet_ntoa(fcntl.ioctl(s.fileno(), SIOCGIFADDR, request)[20:24])
+                    netmask = socket.inet_ntoa(fcntl.ioctl(s.fileno(), SIOCGIFNETMASK, request)[20:24])
+                except OSError:  # No IPv4 address
+                    continue
+                interfaces.append(IPv4Interface(f"{address}/{netmask}"))
+    return [interface for interface in interfaces if not interface.ip.is_loopback]
+
+
+def get_local_ip(device_ip=None):
+    """
+    The IP of this host on the way to the device at `device_ip`, eg. for a pipeline that connects back to the host.
+
+    The interface whose subnet contains the device is chosen, else the source address the routing table gives a UDP
+    socket "connected" to the device, which sends nothing. No other address is ever contacted, it works offline.
+    Results are cached by the subnet of the chosen interface, eg. for the devices of a fleet, for this process only:
+    the host IP is baked into the flashed pipelines, and one kept across runs could be stale after a DHCP lease or a
+    network change, while choosing it again only lists the local interfaces.
+
+    :param device_ip: IP of the device, without it the only interface is chosen
+    :return: the host IP, or None if there is no device and several interfaces
+    """
+    if device_ip is None:
+        interfaces = local_interfaces()
+        return str(interfaces[0].ip) if len(interfaces) == 1 else None
+    device = IPv4Address(device_ip)
+    for network, host_ip in _host_ips.items():
+        if device in network:
+            return host_ip
+    interfaces = [interface for interface in local_interfaces() if device in interface.network]
+    if interfaces:
+        interface = max(interfaces, key=lambda interface: interface.network.prefixlen)
+        _host_ips[interface.network] = str(interface.ip)
+        return str(interface.ip)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.connect((device_ip, 9))
+        host_ip = s.getsockname()[0]
+    _host_ips[IPv4Network(device_ip)] = host_ip
+    return host_ip
+
+
+def read_script_lib(*names) -> str:
+    """
+    Read device-side helpers from `script_lib`, to be injected into a Script node template.
+
+    :param names: module names in `script_lib`, without the `.py` suffix
+    :return: the sources, joined in the given order
+    """
+    script_lib = Path(__file__).parent / "script_lib"
+    return "\n".join((script_lib / f"{name}.py").read_text(encoding="utf-8") for name in names)
+
+
+RULE_EVENTS = ("appear", "leave", "above")
+# Modes of `SendPolicy` in script_lib/hub.py
+SEND_POLICIES = ("drop-oldest", "drop-to-keyframe", "disconnect")
+
+
+def check_send_policy(send_policy, queue_depth=1):
+    """
+    Check the send policy options of a pipeline on the host, the Script node would only fail on the device.
+
+    :raises ValueError: for an unknown `send_policy` or a `queue_depth` below 1
+    """
+    if send_policy not in SEND_POLICIES:
+        raise ValueError(f"Unknown send_policy {send_policy!r}, expected one of {', '.join(SEND_POLICIES)}")
+    if not isinstance(queue_depth, int) or queue_depth < 1:
+        raise ValueError(f"queue_depth must be a positive integer, got {queue_depth!r}")
+
+
+def parse_rules(rules, labels=None, confidence=0.0) -> list:
+    """
+    Validate the frame push rules of a model config, and resolve them for the Script node.
+
+    A rule looks like `{"label": "person", "event": "appear", "confidence": 0.6, "pre": 15, "post": 30}`,
+    only `label` and `event` are required.
+
+    :param rules: the `mappings.rules` list of the model config
+    :param labels: the `mappings.labels` list, to resolve labels given by name
+    :param confidence: default confidence, usually the confidence threshold of the network
+    :return: rules with integer labels and all the keys filled in
+    """
+    parsed = []
+    for rule in rules or []:
+        label = rule["label"]
+        if isinstance(label, str):
+            if not labels or label not in labels:
+                raise ValueError(f"Rule {rule} refers to the unknown label {label!r}")
+            label = labels.index(label)
+        if rule["event"] not in RULE_EVENTS:
+            raise ValueError(f"Rule {rule} has an unknown event, expected one of {RULE_EVENTS}")
+        parsed.append({
+            "label": int(label),
+            "event": rule["event"],
+            "confidence": float(rule.get("confidence", confidence or 0.0)),
+            "pre": int(rule.get("pre", 0)),
+            "post": int(rule.get("post", 0)),
+        })
+    return parsed
 
 
 def lazy_import(name, path=None):
@@ -27,18 +153,22 @@ def lazy_import(name, path=None):
     return module
 
 
-def getDeviceInfo(deviceId=None, debug=False) -> dai.DeviceInfo:
+def getDeviceInfo(deviceId=None, debug=False, deviceInfos=None) -> "dai.DeviceInfo":
     """
     Find a correct :obj:`depthai.DeviceInfo` object, either matching provided :code:`deviceId` or selected by the user (if multiple devices available)
     Useful for almost every app where there is a possibility of multiple devices being connected simultaneously
     Args:
         deviceId (str, optional): Specifies device MX ID, for which the device info will be collected
+        deviceInfos (list, optional): Devices already discovered, eg. by :obj:`discovery.DeviceCache`, to choose from
     Returns:
         depthai.DeviceInfo: Object representing selected device info
     Raises:
         RuntimeError: if no DepthAI device was found or, if :code:`deviceId` was specified, no device with matching MX ID was found
         ValueError: if value supplied by the user when choosing the DepthAI device was incorrect
     """
+    # Imported here, depthai takes long to import and the CLI only needs it to talk to a device
+    import depthai as dai
+
     # deviceInfos = []
 
     if deviceId:
@@ -52,7 +182,9 @@ def getDeviceInfo(deviceId=None, debug=False) -> dai.DeviceInfo:
         else:
             print(f"Warning! No DepthAI device found with id matching {deviceId} !")
 
-    if debug:
+    if deviceInfos is not None:
+        pass
+    elif debug:
         deviceInfos = dai.XLinkConnection.getAllConnectedDevices()
     else:
         deviceInfos = dai.Device.getAllAvailableDevices()
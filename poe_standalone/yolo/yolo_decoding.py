@@ -7,11 +7,14 @@ import click
 import depthai as dai
 
 try:
-    from poe_standalone.utils import getDeviceInfo
+    from poe_standalone.utils import check_send_policy, getDeviceInfo, parse_rules, read_script_lib
+    from poe_standalone.script_tools import set_script
 except ImportError:
-    from utils import getDeviceInfo
+    from utils import check_send_policy, getDeviceInfo, parse_rules, read_script_lib
+    from script_tools import set_script
 
 from string import Template
+from textwrap import dedent
 
 def readConfig(path) -> dict:
     """
@@ -36,6 +39,7 @@ def readConfig(path) -> dict:
         labels = config.get("mappings", {}).get("labels", None)
         if labels:
             metadata["labels"] = labels
+        metadata["rules"] = config.get("mappings", {}).get("rules", [])
         if "input_size" in nnConfig:
             inputSize = tuple(map(int, nnConfig.get("input_size").split("x")))
             metadata["inputSize"] = inputSize
@@ -47,7 +51,9 @@ def readConfig(path) -> dict:
 
     return metadata
 
-def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
+def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None, send_policy="drop-oldest", stall_ms=1000,
+                    stream_frames=True, frame_history=60, frame_history_bytes=4 * 1024 * 1024, http_port=8080,
+                    ws_port=8081, queue_depth=2):
     """
     It creates a pipeline that takes a video stream from the camera, runs it through the neural network, and then sends the
     video stream and the neural network output to a script node. The script node then sends the video stream and the neural
@@ -55,10 +61,27 @@ def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
 
     :param blob_path: The path to the blob file
     :param config_path: Path to the configuration file
+    :param send_policy: What the frame queue of a slow client does, "drop-oldest", "drop-to-keyframe" or "disconnect"
+    :param stall_ms: How long a client may stall before the "disconnect" policy closes it
+    :param stream_frames: Whether new clients get the video stream, or only the detections and snapshots on request
+    :param frame_history: How many recent frames the script keeps for "SNAP <seq>" and "RANGE" requests
+    :param frame_history_bytes: Memory budget of the kept frames, the oldest are dropped beyond it, 0 for no limit
+    :param http_port: Port of the HTTP detection endpoints, "/detections" (server-sent events) and
+        "/detections/next" (long-poll), None to disable them
+    :param ws_port: Port of the WebSocket endpoint "/ws", binary JPEG frames each preceded by a small JSON text
+        message, and the detections as JSON text messages, None to disable it
+    :param queue_depth: Frames queued per client before the send policy applies, at least the `pre` frames of the rules
     :return: A pipeline object
+
+    When the model config has `mappings.rules`, frames are only pushed around the detections that fire a rule,
+    see `parse_rules`.
     """
 
+    check_send_policy(send_policy, queue_depth)
     nn_config = readConfig(config_path)
+    rules = parse_rules(nn_config["rules"], nn_config.get("labels"), nn_config["confidence_threshold"])
+    # Room for the frames before an event, in the ring and in the client queues they are flushed to
+    pre = max([rule["pre"] for rule in rules] or [0])
     # Start defining a pipeline
     pipeline = dai.Pipeline()
 
@@ -98,71 +121,39 @@ def create_pipeline(port=5000, blob_path=None, config_path=None, host_ip=None):
     script.inputs['detection'].setBlocking(False)
     script.inputs['detection'].setQueueSize(1)
 
-    script_str = Template("""
-        # coding=utf-8
-        import fcntl
-        import json
-        import socket
-        import struct
-        from socketserver import StreamRequestHandler, ThreadingTCPServer
-        
-        
-        def get_ip_address(ifname):
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            return socket.inet_ntoa(fcntl.ioctl(
-                s.fileno(),
-                -1071617759,  # SIOCGIFADDR
-                struct.pack('256s', ifname[:15].encode())
-            )[20:24])
-        
-        
-        labelMap = ${_labelMap}
-        PORT = ${_PORT}
-        
-        
-        class DataHandler(StreamRequestHandler):
-            def handle(self):
-                node.warn(f'Got connection from {self.client_address}')
-        
-                while True:
-                    bboxes = []
-                    dets = node.io["detection"].get()
-                    ts = dets.getTimestamp()
-                    detections = dets.detections
-                    for detection in detections:
-                        bbox = {"label": labelMap[detection.label] if labelMap else detection.label,
-                                "confidence": detection.confidence,
-                                "xmin": detection.xmin,
-                                "ymin": detection.ymin,
-                                "xmax": detection.xmax,
-                                "ymax": detection.ymax,
-                                "x": detection.spatialCoordinates.x,
-                                "y": detection.spatialCoordinates.y,
-                                "z": detection.spatialCoordinates.z,
-                                }
-                        bboxes.append(bbox)
-        
-                    if bboxes:
-                        bbox_str = json.dumps(bboxes)
-                        header = f"DETECT" + str(ts.total_seconds()).center(18) + str(len(bbox_str)).center(8)
-                        self.wfile.write(bytes(header, encoding='ascii'))
-                        self.wfile.write(bytes(bbox_str, encoding='ascii'))
-        
-                    pck = node.io["frame"].get()
-                    data = pck.getData()
-                    ts = pck.getTimestamp()
-                    header = f"FRAME " + str(ts.total_seconds()).center(18) + str(len(data)).center(8)
-                    # node.warn(f'>{header}<')
-                    self.wfile.write(bytes(header, encoding='ascii'))
-                    self.wfile.write(data)
-        
-        
-        with ThreadingTCPServer(('', PORT), DataHandler) as DataTCPServer:
-            node.warn(f"DataTCPServer at {get_ip_address('re0')}:{PORT}")
-            DataTCPServer.serve_forever()
-        """)
-
-    script.setScript(script_str.safe_substitute(_PORT=port, _labelMap=nn_config.get("labels")))
+    script_str = Template(dedent("""
+        ${_script_lib}
+
+        DetectionServer(
+            port=${_PORT},
+            labels=${_labelMap},
+            rules=${_rules},
+            frame_policy=SendPolicy("${_send_policy}", depth=${_frame_depth}, stall_ms=${_stall_ms}),
+            stream_frames=${_stream_frames},
+            frames=FrameRing(${_frame_history}, ${_frame_history_bytes}),
+            http_port=${_http_port},
+            ws_port=${_ws_port},
+            fields=None,
+        ).run()
+        """))
+
+    set_script(
+        script,
+        script_str.safe_substitute(
+            _PORT=port,
+            _http_port=http_port,
+            _ws_port=ws_port,
+            _labelMap=nn_config.get("labels"),
+            _send_policy=send_policy,
+            _stall_ms=stall_ms,
+            _stream_frames=bool(stream_frames),
+            _frame_history=max(frame_history, pre + 1) if rules else frame_history,
+            _frame_history_bytes=frame_history_bytes,
+            _frame_depth=max(queue_depth, pre + 2),
+            _rules=rules,
+            _script_lib=read_script_lib("framing", "hub", "ring", "rules", "events", "websocket", "yolo_loop"),
+        )
+    )
     return pipeline
 
 
@@ -0,0 +1,28 @@
+# coding=utf-8
+from types import SimpleNamespace
+
+import pytest
+
+from poe_standalone.utils import read_script_lib
+
+
+class Node:
+    """The `node` global of the Script runtime, which the script_lib code only logs with."""
+
+    def __init__(self):
+        self.warnings = []
+
+    def warn(self, message):
+        self.warnings.append(message)
+
+
+@pytest.fixture
+def script_lib():
+    """Run script_lib modules as a template injects them, the globals they define are attributes of the result."""
+
+    def load(*names):
+        namespace = {"node": Node()}
+        exec(compile(read_script_lib(*names), "<script_lib>", "exec"), namespace)
+        return SimpleNamespace(**namespace)
+
+    return load
@@ -0,0 +1,62 @@
+# coding=utf-8
+import os
+
+import depthai as dai
+import pytest
+
+from poe_standalone.dap_cache import DapCache, pipeline_digest
+
+
+def script_pipeline(source):
+    pipeline = dai.Pipeline()
+    pipeline.create(dai.node.Script).setScript(source)
+    return pipeline
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """The packages written, building a real one takes seconds."""
+    saved = []
+
+    def save(path, pipeline, compress=True):
+        saved.append(path)
+        with open(path, "wb") as f:
+            f.write(pipeline_digest(pipeline, compress).encode())
+
+    monkeypatch.setattr(dai.DeviceBootloader, "saveDepthaiApplicationPackage", staticmethod(save))
+    return saved
+
+
+def test_digest_depends_on_the_assets_and_compression():
+    digest = pipeline_digest(script_pipeline("x = 1"))
+    assert digest == pipeline_digest(script_pipeline("x = 1"))
+    assert digest != pipeline_digest(script_pipeline("x = 2"))
+    assert digest != pipeline_digest(script_pipeline("x = 1"), compress=False)
+
+
+def test_a_package_is_built_once(tmp_path, saved):
+    cache = DapCache(tmp_path, max_packages=4)
+    digest, path = cache.get(script_pipeline("x = 1"))
+    assert path == tmp_path / f"{digest}.dap"
+    assert cache.get(script_pipeline("x = 1")) == (digest, path)
+    assert len(saved) == 1
+    # Written aside then renamed
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_load_reads_the_package(tmp_path, saved):
+    digest, package = DapCache(tmp_path).load(script_pipeline("x = 1"))
+    assert package.dtype == "uint8"
+    assert package.tobytes() == digest.encode()
+
+
+def test_the_least_recently_used_packages_are_pruned(tmp_path, saved):
+    cache = DapCache(tmp_path, max_packages=2)
+    _, first = cache.get(script_pipeline("x = 1"))
+    _, second = cache.get(script_pipeline("x = 2"))
+    os.utime(first, (1, 1))
+    os.utime(second, (2, 2))
+    # A hit makes the first one the most recently used
+    cache.get(script_pipeline("x = 1"))
+    _, third = cache.get(script_pipeline("x = 3"))
+    assert sorted(tmp_path.glob("*.dap")) == sorted([first, third])
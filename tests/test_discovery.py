@@ -0,0 +1,66 @@
+# coding=utf-8
+import time
+
+import pytest
+
+from poe_standalone.discovery import DeviceCache
+from poe_standalone.standalone import get_device_info
+
+
+class RecordingCache(DeviceCache):
+    """A cache whose background discoveries are counted instead of run."""
+
+    refreshes = 0
+
+    def discover_in_background(self):
+        self.refreshes += 1
+
+
+def entry(mxid, ip, age=0):
+    return {"mxid": mxid, "ip": ip, "state": "X_LINK_BOOTLOADER", "last_seen": time.time() - age}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = RecordingCache(tmp_path / "devices.json", ttl=60)
+    cache.save({
+        "MXID_B": entry("MXID_B", "192.168.1.20"),
+        "MXID_A": entry("MXID_A", "192.168.1.3"),
+        "MXID_OLD": entry("MXID_OLD", "192.168.1.9", age=120),
+    })
+    return cache
+
+
+def test_fresh_entries_are_sorted_by_ip(cache):
+    assert [entry["mxid"] for entry in cache.fresh()] == ["MXID_A", "MXID_B"]
+
+
+def test_find_by_ip_or_mxid_within_the_ttl(cache):
+    assert cache.find("192.168.1.20")["mxid"] == "MXID_B"
+    assert cache.find("MXID_A")["ip"] == "192.168.1.3"
+    assert cache.find("MXID_OLD") is None
+    cache.ttl = 0
+    assert cache.find("MXID_A") is None
+
+
+def test_a_broken_cache_file_is_empty(tmp_path):
+    path = tmp_path / "devices.json"
+    path.write_text("{", encoding="utf-8")
+    assert DeviceCache(path).load() == {}
+    assert DeviceCache(tmp_path / "missing.json").load() == {}
+
+
+@pytest.mark.parametrize("device, ip", [
+    ("MXID_A", "192.168.1.3"),
+    ("192.168.1.3", "192.168.1.3"),
+    ("192.168.1.50", "192.168.1.50"),
+])
+def test_known_devices_are_refreshed_in_the_background(cache, device, ip):
+    assert get_device_info(device, cache).name == ip
+    assert cache.refreshes == 1
+
+
+def test_bootloader_commands_dont_refresh_in_the_background(cache):
+    assert get_device_info("MXID_A", cache, refresh=False).name == "192.168.1.3"
+    assert get_device_info("192.168.1.50", cache, refresh=False).name == "192.168.1.50"
+    assert cache.refreshes == 0
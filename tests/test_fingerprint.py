@@ -0,0 +1,55 @@
+# coding=utf-8
+from types import SimpleNamespace
+
+from poe_standalone.fingerprint import CONFIG_KEY, clear_application, flash_package, package_fingerprint
+
+PACKAGE = b"package"
+
+
+class Bootloader:
+    """The DeviceBootloader methods the fingerprint uses, `config` None when it can't be read."""
+
+    def __init__(self, config):
+        self.config = config
+        self.flashed = []
+
+    def readConfigData(self):
+        if self.config is None:
+            raise RuntimeError("Couldn't read the config")
+        return dict(self.config)
+
+    def flashConfigData(self, config):
+        self.flashed.append(("config", config))
+        self.config = config
+        return True, ""
+
+    def readApplicationInfo(self, memory):
+        return SimpleNamespace(hasApplication=True)
+
+    def flashDepthaiApplicationPackage(self, progress, package):
+        self.flashed.append(("package", package))
+        progress(1.0)
+        return True, ""
+
+    def flashClear(self):
+        self.flashed.append(("clear", None))
+        return True, ""
+
+
+def test_the_fingerprint_is_kept_next_to_the_network_settings():
+    bootloader = Bootloader({"network": {"staticIpv4": "192.168.1.20"}})
+    success, message = flash_package(bootloader, PACKAGE, lambda p: None)
+    assert success and message.startswith("flashed")
+    assert bootloader.config == {"network": {"staticIpv4": "192.168.1.20"},
+                                 CONFIG_KEY: {"fingerprint": package_fingerprint(PACKAGE)}}
+    assert flash_package(bootloader, PACKAGE, lambda p: None)[1].startswith("skipped")
+    assert flash_package(bootloader, PACKAGE, lambda p: None, force=True)[1].startswith("flashed")
+
+
+def test_an_unreadable_config_is_never_written():
+    bootloader = Bootloader(None)
+    success, message = flash_package(bootloader, PACKAGE, lambda p: None)
+    assert success and "fingerprint not stored" in message
+    assert bootloader.flashed == [("package", PACKAGE)]
+    assert clear_application(bootloader) == (True, "")
+    assert bootloader.flashed[1:] == [("clear", None)]
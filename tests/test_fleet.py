@@ -0,0 +1,103 @@
+# coding=utf-8
+import io
+import threading
+
+import click
+from rich.console import Console
+
+from poe_standalone import fleet
+from poe_standalone.fleet import PackageCache, run_fleet, print_summary
+
+
+def quiet_console():
+    return Console(file=io.StringIO(), width=120)
+
+
+def test_run_fleet_reports_each_device_in_order():
+    def operation(device_info, progress):
+        progress(0.5)
+        progress(1.0)
+        return device_info != "bad", f"flashed {device_info}"
+
+    devices = {"10.0.0.1": "good", "10.0.0.2": "bad", "10.0.0.3": "good"}
+    results = run_fleet(devices, operation, workers=2, retries=0, console=quiet_console())
+    assert [(result.device, result.ok, result.message) for result in results] == [
+        ("10.0.0.1", True, "flashed good"),
+        ("10.0.0.2", False, "flashed bad"),
+        ("10.0.0.3", True, "flashed good"),
+    ]
+    assert all(result.attempts == 1 for result in results)
+
+
+def test_run_fleet_retries_failures_and_exceptions():
+    attempts = {}
+    lock = threading.Lock()
+
+    def operation(device_info, progress):
+        with lock:
+            attempts[device_info] = attempts.get(device_info, 0) + 1
+            attempt = attempts[device_info]
+        if device_info == "flaky" and attempt == 1:
+            raise RuntimeError("Device not found")
+        if device_info == "broken":
+            return False, f"attempt {attempt} failed"
+        return True, "done"
+
+    devices = {"a": "flaky", "b": "broken"}
+    flaky, broken = run_fleet(devices, operation, retries=2, retry_delay=0, console=quiet_console())
+    assert (flaky.ok, flaky.attempts) == (True, 2)
+    assert (broken.ok, broken.attempts, broken.message) == (False, 3, "attempt 3 failed")
+
+
+def test_run_fleet_records_any_exception_as_a_failure():
+    def operation(device_info, progress):
+        if device_info == "unbuildable":
+            raise click.ClickException("Pipeline yolo_decoding can't be built")
+        if device_info == "typo":
+            raise ValueError()
+        return True, "done"
+
+    devices = {"a": "unbuildable", "b": "typo", "c": "fine"}
+    results = run_fleet(devices, operation, retries=1, retry_delay=0, console=quiet_console())
+    assert [(result.ok, result.message) for result in results] == [
+        (False, "Pipeline yolo_decoding can't be built"),
+        (False, "ValueError"),
+        (True, "done"),
+    ]
+
+
+class FakeDapCache:
+    """Packages of the pipelines, which are their digests here."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.built = []
+
+    def get(self, pipeline):
+        self.built.append(pipeline)
+        path = self.directory / f"{pipeline}.dap"
+        path.write_bytes(pipeline.encode())
+        return pipeline, path
+
+
+def test_package_cache_shares_packages_with_the_same_digest(tmp_path, monkeypatch):
+    monkeypatch.setattr(fleet, "get_local_ip", lambda device_ip: device_ip.rsplit(".", 1)[0] + ".1")
+    # The 10.0.1.x and 10.0.2.x subnets have different host IPs but the same package
+    cache = PackageCache(lambda device_ip: "a" if device_ip.startswith("10.0.0.") else "b")
+    cache.dap_cache = FakeDapCache(tmp_path)
+    first = cache.get("10.0.0.2")
+    assert cache.get("10.0.0.3") is first
+    assert cache.get("10.0.1.2").tobytes() == b"b"
+    assert cache.get("10.0.2.2") is cache.get("10.0.1.2")
+    # Built once per host IP, loaded once per digest
+    assert cache.dap_cache.built == ["a", "b", "b"]
+    assert len(cache.packages) == 2
+
+
+def test_print_summary_counts_the_successes():
+    def operation(device_info, progress):
+        return device_info, "message"
+
+    console = quiet_console()
+    print_summary(run_fleet({"a": True, "b": False}, operation, retries=0, console=console), console)
+    assert "1/2 devices succeeded" in console.file.getvalue()
@@ -0,0 +1,205 @@
+# coding=utf-8
+import socket
+import time
+from datetime import timedelta
+
+import pytest
+
+
+@pytest.fixture
+def lib(script_lib):
+    return script_lib("framing", "hub")
+
+
+@pytest.fixture
+def make_hub(lib):
+    hubs = []
+    sockets = []
+
+    def make_hub(topics=("frame",), policies=None, subscribed=None, hub_lib=lib):
+        hub = hub_lib.Hub(0, topics, policies, subscribed)
+        hubs.append(hub)
+        return hub
+
+    def connect(hub):
+        sock = socket.create_connection(hub.server.getsockname()[:2])
+        sock.settimeout(1)
+        sockets.append(sock)
+        deadline = time.monotonic() + 1
+        while len(hub.clients) < len(sockets) and time.monotonic() < deadline:
+            hub.poll(0.01)
+        return sock, list(hub.clients.values())[-1]
+
+    make_hub.connect = connect
+    yield make_hub
+    for sock in sockets:
+        sock.close()
+    for hub in hubs:
+        for client in list(hub.clients.values()):
+            hub.close(client)
+        hub.server.close()
+
+
+def pump(hub, seconds=0.1):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        hub.poll(0.01)
+
+
+def message(lib, n):
+    return lib.pack("FRAME ", timedelta(seconds=n), b"%d" % n)
+
+
+def receive(lib, hub, sock):
+    """The payloads the hub sends to `sock` until it has nothing left to send."""
+    pump(hub)
+    sock.settimeout(0.1)
+    data = b""
+    try:
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    except socket.timeout:
+        pass
+    payloads = []
+    while data:
+        header, data = data[:32], data[32:]
+        size = int(header[24:])
+        payloads.append(int(data[:size]))
+        data = data[size:]
+    return payloads
+
+
+def test_pack_frames_a_32_bytes_header(lib):
+    header, payload = lib.pack("DETECT", timedelta(seconds=1.5), b"[]")
+    assert len(header) == 32
+    assert header.split() == [b"DETECT", b"1.5", b"2"]
+    assert lib.pack("EVENT ", None, b"x")[0].split()[1] == b"0.0"
+
+
+def test_advance_resumes_a_partial_write(lib):
+    buffers = [memoryview(b"head"), memoryview(b"payload")]
+    assert [bytes(buffer) for buffer in lib.advance(buffers, 6)] == [b"yload"]
+    assert [bytes(buffer) for buffer in lib.advance(buffers, 4)] == [b"payload"]
+    assert lib.advance(buffers, 11) == []
+
+
+def test_send_policy_rejects_unknown_modes(lib):
+    with pytest.raises(ValueError):
+        lib.SendPolicy("drop_oldest")
+
+
+def test_every_client_gets_every_message(lib, make_hub):
+    hub = make_hub(policies={"frame": lib.SendPolicy(depth=8)})
+    first, _ = make_hub.connect(hub)
+    second, _ = make_hub.connect(hub)
+    for n in range(3):
+        hub.publish("frame", message(lib, n))
+    assert receive(lib, hub, first) == [0, 1, 2]
+    assert receive(lib, hub, second) == [0, 1, 2]
+
+
+def test_drop_oldest_keeps_the_latest_messages(lib, make_hub):
+    hub = make_hub(policies={"frame": lib.SendPolicy(lib.DROP_OLDEST, depth=2)})
+    sock, _ = make_hub.connect(hub)
+    # Published without polling, like a burst the client can't take
+    for n in range(5):
+        hub.publish("frame", message(lib, n))
+    assert receive(lib, hub, sock) == [3, 4]
+
+
+def test_drop_oldest_limits_the_queued_bytes(lib, make_hub):
+    size = lib.buffers_size(message(lib, 1))
+    hub = make_hub(policies={"frame": lib.SendPolicy(lib.DROP_OLDEST, depth=10, max_bytes=2 * size)})
+    sock, _ = make_hub.connect(hub)
+    for n in range(1, 6):
+        hub.publish("frame", message(lib, n))
+    assert receive(lib, hub, sock) == [4, 5]
+
+
+def test_drop_to_keyframe_skips_until_the_next_keyframe(lib, make_hub):
+    hub = make_hub(policies={"frame": lib.SendPolicy(lib.DROP_TO_KEYFRAME, depth=2)})
+    sock, client = make_hub.connect(hub)
+    hub.publish("frame", message(lib, 1))
+    hub.publish("frame", message(lib, 2), keyframe=False)
+    # Overflows: the queue is cleared, and the deltas are skipped until a keyframe
+    hub.publish("frame", message(lib, 3), keyframe=False)
+    assert "frame" in client.skipping
+    hub.publish("frame", message(lib, 4), keyframe=False)
+    hub.publish("frame", message(lib, 5))
+    hub.publish("frame", message(lib, 6), keyframe=False)
+    assert receive(lib, hub, sock) == [5, 6]
+
+
+def test_disconnect_closes_a_stalled_client(lib, make_hub):
+    hub = make_hub(policies={"frame": lib.SendPolicy(lib.DISCONNECT, depth=1, stall_ms=20)})
+    sock, client = make_hub.connect(hub)
+    hub.publish("frame", message(lib, 1))
+    # Overflowing before the stall delay only drops the oldest
+    hub.publish("frame", message(lib, 2))
+    assert client.conn in hub.clients
+    time.sleep(0.05)
+    hub.publish("frame", message(lib, 3))
+    assert client.conn not in hub.clients
+    assert hub.clients == {}
+
+
+def test_a_slow_client_doesnt_hold_back_the_others(lib, make_hub):
+    hub = make_hub(policies={"frame": lib.SendPolicy(lib.DROP_OLDEST, depth=1)})
+    slow, slow_client = make_hub.connect(hub)
+    fast, _ = make_hub.connect(hub)
+    received = []
+    for n in range(5):
+        hub.publish("frame", message(lib, n))
+        received += receive(lib, hub, fast)
+    assert received == [0, 1, 2, 3, 4]
+    assert len(slow_client.queues["frame"]) <= 1
+
+
+def test_sub_and_unsub_commands(lib, make_hub):
+    hub = make_hub(("preview", "full"), subscribed=("preview",))
+    sock, client = make_hub.connect(hub)
+    assert client.topics == {"preview"}
+    sock.sendall(b"SUB full\nUNSUB preview\nSUB nothing\n")
+    pump(hub)
+    assert client.topics == {"full"}
+    assert hub.wanted("full") and not hub.wanted("preview")
+    assert any("Invalid command" in warning and "nothing" in warning for warning in lib.node.warnings)
+
+
+@pytest.fixture
+def yolo_lib(script_lib):
+    return script_lib("framing", "hub", "ring", "events", "websocket")
+
+
+def test_topics_of_other_servers_are_reserved(yolo_lib, make_hub):
+    lib = yolo_lib
+    hub = make_hub(("reply", "detection", "frame", "sse", "ws-detection", "ws-frame"), subscribed=("detection",),
+                   hub_lib=lib)
+    lib.EventServer(hub, 0, "/detections", "sse")
+    lib.WebSocketServer(hub, 0, "/ws", ("ws-detection", "ws-frame"))
+    lib.serve_snapshots(hub, lib.FrameRing(4, 0))
+    sock, client = make_hub.connect(hub)
+    sock.sendall(b"SUB sse\nSUB ws-frame\nSUB ws-detection\nSUB reply\nSUB frame\n")
+    pump(hub)
+    assert client.topics == {"detection", "frame"}
+    rejected = [warning for warning in lib.node.warnings if "Invalid command" in warning]
+    assert len(rejected) == 4
+
+
+def test_long_poll_clients_that_disconnect_stop_waiting(yolo_lib, make_hub):
+    lib = yolo_lib
+    hub = make_hub(("sse",), hub_lib=lib)
+    events = lib.EventServer(hub, 0, "/detections", "sse")
+    http_server = next(server for server in hub.servers if server is not hub.server)
+    for _ in range(3):
+        sock = socket.create_connection(http_server.getsockname()[:2])
+        sock.sendall(b"GET /detections/next HTTP/1.1\r\n\r\n")
+        pump(hub)
+        assert len(events.waiting) == 1
+        sock.close()
+        pump(hub)
+        assert events.waiting == []
+    assert hub.clients == {}
@@ -0,0 +1,13 @@
+# coding=utf-8
+import depthai as dai
+
+from poe_standalone.registry import PipelineRegistry
+
+
+def test_max_fps_and_stall_ms_reach_the_script():
+    pipeline = PipelineRegistry(plugins=False, paths=[]).build("script_mjpeg_server", 5000, None, None, None,
+                                                               max_fps=5, stall_ms=500)
+    script = next(node for node in pipeline.getAllNodes() if isinstance(node, dai.node.Script))
+    source = bytes(script.getAssetManager().get("__script").data).decode()
+    assert "MAX_FPS = 5\n" in source
+    assert "STALL_S = 500 / 1000\n" in source
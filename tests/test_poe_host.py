@@ -0,0 +1,59 @@
+# coding=utf-8
+import subprocess
+import sys
+
+import pytest
+
+# Run as installed: the console script "poe_host:<module>.cli" imports poe_host, then its module, with the script's argv
+LOAD_ENTRY_POINT = """
+import sys
+from importlib import import_module
+from importlib.metadata import EntryPoint
+
+sys.argv = sys.argv[1:]
+module = sys.argv[0]
+EntryPoint(name=module, value=f"poe_host:{module}.cli", group="console_scripts").load()
+print(sorted(name for name in sys.modules if name.startswith("poe_host.")))
+print(vars(import_module(f"poe_host.{module}").parser.parse_args()))
+"""
+
+
+def load_entry_point(module, *argv):
+    result = subprocess.run([sys.executable, "-c", LOAD_ENTRY_POINT, module, *argv], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    modules, parsed = result.stdout.splitlines()[-2:]
+    return eval(modules), eval(parsed)
+
+
+def test_importing_poe_host_imports_no_host_module():
+    output = subprocess.run([sys.executable, "-c", "import sys, poe_host; print(sorted(sys.modules))"],
+                            capture_output=True, text=True, check=True).stdout
+    assert not [name for name in eval(output) if name.startswith("poe_host.")]
+
+
+def test_poe_host_only_has_the_host_modules():
+    import poe_host
+
+    with pytest.raises(AttributeError):
+        poe_host.no_such_module
+
+
+def test_yolo_host_parses_its_own_options():
+    pytest.importorskip("cv2")
+    modules, parsed = load_entry_point("yolo_host", "-d", "-p", "5001")
+    assert modules == ["poe_host.yolo_host", "poe_host.yolo_utils"]
+    assert parsed == {"host": "169.254.1.222", "port": 5001, "detections_only": True}
+
+
+def test_config_focus_host_parses_its_own_options():
+    pytest.importorskip("cv2")
+    modules, parsed = load_entry_point("tcp_streaming_server_host_config_focus", "-rs", "640", "360")
+    assert modules == ["poe_host.tcp_streaming_server_host_config_focus"]
+    assert parsed["roi_size"] == [640, 360]
+
+
+def test_dual_host_parses_its_own_options():
+    pytest.importorskip("cv2")
+    modules, parsed = load_entry_point("tcp_streaming_server_host_dual", "-t", "1.5")
+    assert modules == ["poe_host.tcp_streaming_server_host_dual"]
+    assert parsed["threshold"] == 1.5
@@ -0,0 +1,96 @@
+# coding=utf-8
+from pathlib import Path
+
+import depthai as dai
+import pytest
+
+from poe_standalone import registry
+from poe_standalone.registry import PipelineRegistry, PipelineSource, file_source, pipeline_options
+from poe_standalone.script_tools import validate_pipeline
+
+CUSTOM_PIPELINE = Path(__file__).parents[1] / "poe_standalone" / "custom_pipeline.py"
+
+
+def write_pipeline(path, result):
+    path.write_text(f"def create_pipeline(port, blob_path, config_path, host_ip):\n    return {result!r}, port\n")
+    return path
+
+
+def test_listing_doesnt_build_the_pipelines():
+    pipelines = PipelineRegistry(plugins=False, paths=[])
+    assert pipelines.names() == list(registry.BUILTIN_PIPELINES)
+    assert pipelines.timings == {}
+
+
+def test_path_sources_are_named_after_the_files(tmp_path):
+    write_pipeline(tmp_path / "dock_cam.py", "dock")
+    write_pipeline(tmp_path / "_helpers.py", "helpers")
+    single = write_pipeline(tmp_path / "gate.txt", "gate")
+    pipelines = PipelineRegistry(plugins=False, paths=[tmp_path, single])
+    assert pipelines.sources["dock_cam"].kind == "file"
+    assert "_helpers" not in pipelines.sources
+    assert pipelines.build("dock_cam", 5000, None, None, "127.0.0.1") == ("dock", 5000)
+    assert set(pipelines.timings["dock_cam"]) == {"import", "build"}
+
+
+def test_path_sources_warn_about_missing_paths(tmp_path):
+    with pytest.warns(UserWarning, match="doesn't exist"):
+        assert registry.path_sources([tmp_path / "missing"]) == []
+
+
+def test_the_first_registered_name_wins_unless_replaced(tmp_path):
+    pipelines = PipelineRegistry(plugins=False, paths=[])
+    custom = write_pipeline(tmp_path / "script_http_server.py", "custom")
+    with pytest.warns(UserWarning, match="already registered"):
+        assert pipelines.register(file_source(custom)).kind == "builtin"
+    assert pipelines.register(file_source(custom), replace=True).kind == "file"
+    assert pipelines.build("script_http_server", 1, None, None, None) == ("custom", 1)
+
+
+def test_broken_pipelines_only_fail_once_selected(tmp_path):
+    broken = tmp_path / "broken.py"
+    broken.write_text("def create_pipeline(:\n")
+    pipelines = PipelineRegistry(plugins=False, paths=[broken])
+    pipelines.register(PipelineSource("missing_plugin", "plugin", "no_such_module_anywhere", origin="nowhere 1.0"))
+    for name in ("broken", "missing_plugin"):
+        with pytest.raises(ValueError, match=f"Pipeline {name} of .* can't be imported"):
+            pipelines.load(name)
+    with pytest.raises(ValueError, match="Unknown pipeline unknown"):
+        pipelines.load("unknown")
+
+
+def test_the_reference_custom_pipeline_builds_as_written():
+    # Its template is indented, as in the README, and flashed without being rewritten
+    pipelines = PipelineRegistry(plugins=False, paths=[])
+    name = pipelines.register(file_source(CUSTOM_PIPELINE), replace=True).name
+    validate_pipeline(pipelines.build(name, 5000, None, None, "127.0.0.1"))
+
+
+def script_source(pipeline):
+    """The source of the only Script node of `pipeline`, as flashed."""
+    scripts = [node for node in pipeline.getAllNodes() if isinstance(node, dai.node.Script)]
+    return bytes(scripts[0].getAssetManager().get("__script").data).decode("utf-8")
+
+
+def test_pipeline_options_are_the_extra_parameters():
+    pipelines = PipelineRegistry(plugins=False, paths=[])
+    assert pipeline_options(pipelines.load("tcp_streaming_server")) == {
+        "send_policy": "drop-oldest", "stall_ms": 1000, "queue_depth": 2}
+    assert pipeline_options(pipelines.load("tcp_streaming_client")) == {}
+
+
+def test_options_reach_the_script():
+    pipelines = PipelineRegistry(plugins=False, paths=[])
+    pipeline = pipelines.build("tcp_streaming_server", 5000, None, None, None, send_policy="disconnect", stall_ms=500,
+                               queue_depth=4)
+    assert 'SendPolicy("disconnect", depth=4, stall_ms=500)' in script_source(pipeline)
+
+
+def test_unknown_options_and_send_policies_are_rejected_on_the_host():
+    pipelines = PipelineRegistry(plugins=False, paths=[])
+    with pytest.raises(ValueError, match="has no option max_fps, its options are: send_policy='drop-oldest'"):
+        pipelines.build("tcp_streaming_server", 5000, None, None, None, max_fps=5)
+    with pytest.raises(ValueError, match="Unknown send_policy 'drop_oldest'"):
+        pipelines.build("tcp_streaming_server", 5000, None, None, None, send_policy="drop_oldest")
+    with pytest.raises(ValueError, match="queue_depth must be a positive integer"):
+        pipelines.build("multi_protocol_server", 5000, None, None, None, queue_depth=0)
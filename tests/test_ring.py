@@ -0,0 +1,95 @@
+# coding=utf-8
+from datetime import timedelta
+
+import pytest
+
+
+class Packet:
+    """An encoded frame message of the VideoEncoder."""
+
+    def __init__(self, seq, size=10):
+        self.seq = seq
+        self.data = bytearray(size)
+
+    def getSequenceNum(self):
+        return self.seq
+
+    def getTimestamp(self):
+        return timedelta(seconds=self.seq / 10)
+
+    def getData(self):
+        return self.data
+
+
+@pytest.fixture
+def ring(script_lib):
+    return script_lib("ring")
+
+
+def filled(ring, size, max_bytes=0, count=5, frame_size=10):
+    frames = ring.FrameRing(size, max_bytes)
+    for seq in range(1, count + 1):
+        frames.append(Packet(seq, frame_size))
+    return frames
+
+
+def seqs(frames):
+    return [frame[0] for frame in frames]
+
+
+def test_keeps_the_last_frames_copied(ring):
+    packet = Packet(1)
+    frames = ring.FrameRing(3)
+    assert frames.append(packet) == (1, timedelta(seconds=0.1), bytes(10))
+    packet.data[0] = 1
+    assert frames.latest()[2] == bytes(10)
+    for seq in range(2, 6):
+        frames.append(Packet(seq))
+    assert seqs(frames.frames) == [3, 4, 5]
+    assert frames.bytes == 30
+
+
+def test_size_0_keeps_nothing(ring):
+    frames = filled(ring, 0)
+    assert frames.latest() is None
+    assert frames.find(5) is None
+    assert frames.bytes == 0
+
+
+def test_byte_budget_drops_the_oldest_but_keeps_the_latest(ring):
+    assert seqs(filled(ring, 10, max_bytes=25).frames) == [4, 5]
+    # A frame larger than the budget is still kept, alone
+    assert seqs(filled(ring, 10, max_bytes=5).frames) == [5]
+
+
+def test_lookups(ring):
+    frames = filled(ring, 4)
+    assert frames.latest()[0] == 5
+    assert frames.find(3)[0] == 3
+    assert frames.find(1) is None
+    assert seqs(frames.after(2, 2)) == [4, 5]
+    assert frames.after(2, 0) == []
+
+
+def test_between_seq_and_ts(ring):
+    frames = filled(ring, 10)
+    assert seqs(frames.between(2, 4)) == [2, 3, 4]
+    assert seqs(frames.between(0.25, 0.45, by="ts")) == [3, 4]
+    assert frames.between(7, 9) == []
+    with pytest.raises(ValueError):
+        frames.between(1, 2, by="frame")
+
+
+@pytest.mark.parametrize("arg, expected", [
+    ("1 4", (1, 4, "seq")),
+    ("seq 1 4", (1, 4, "seq")),
+    ("ts 0.5 1.5", (0.5, 1.5, "ts")),
+])
+def test_parse_range(ring, arg, expected):
+    assert ring.parse_range(arg) == expected
+
+
+@pytest.mark.parametrize("arg", ["", "1", "ts 1", "1 2 3", "seq 0.5 1", "frame 1 2"])
+def test_parse_range_rejects(ring, arg):
+    with pytest.raises(ValueError):
+        ring.parse_range(arg)
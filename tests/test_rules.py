@@ -0,0 +1,62 @@
+# coding=utf-8
+from types import SimpleNamespace
+
+import pytest
+
+from poe_standalone.utils import parse_rules
+
+LABELS = ["person", "car"]
+
+
+def detections(**confidences):
+    """An ImgDetections message, eg. `detections(person=0.8)`."""
+    return SimpleNamespace(detections=[SimpleNamespace(label=LABELS.index(label), confidence=confidence)
+                                       for label, confidence in confidences.items()])
+
+
+@pytest.fixture
+def engine(script_lib):
+    lib = script_lib("rules")
+
+    def make(*rules):
+        return lib.RuleEngine(parse_rules(rules, LABELS, confidence=0.5))
+
+    return make
+
+
+def test_parse_rules_resolves_labels_and_defaults():
+    assert parse_rules([{"label": "car", "event": "appear"}, {"label": 0, "event": "above", "confidence": 0.9,
+                                                              "pre": 2, "post": 3}], LABELS, confidence=0.5) == [
+        {"label": 1, "event": "appear", "confidence": 0.5, "pre": 0, "post": 0},
+        {"label": 0, "event": "above", "confidence": 0.9, "pre": 2, "post": 3},
+    ]
+    assert parse_rules(None) == []
+
+
+@pytest.mark.parametrize("rule", [
+    {"label": "bike", "event": "appear"},
+    {"label": "person", "event": "stays"},
+])
+def test_parse_rules_rejects(rule):
+    with pytest.raises(ValueError):
+        parse_rules([rule], LABELS)
+
+
+def test_appear_and_leave_fire_on_changes(engine):
+    rules = engine({"label": "person", "event": "appear"}, {"label": "person", "event": "leave"})
+    events = [[rule["event"] for rule in rules.update(dets)]
+              for dets in (detections(), detections(person=0.8), detections(person=0.9), detections(person=0.3))]
+    assert events == [[], ["appear"], [], ["leave"]]
+
+
+def test_above_fires_while_present(engine):
+    rules = engine({"label": "car", "event": "above", "confidence": 0.7})
+    assert [bool(rules.update(dets)) for dets in (detections(car=0.8), detections(car=0.6, person=0.9),
+                                                  detections(car=0.75))] == [True, False, True]
+
+
+def test_post_window_includes_the_frame_of_the_detections(engine):
+    rules = engine({"label": "person", "event": "appear", "post": 2})
+    assert not rules.take()
+    rules.update(detections(person=0.8))
+    assert [rules.take() for _ in range(4)] == [True, True, True, False]
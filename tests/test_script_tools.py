@@ -0,0 +1,146 @@
+# coding=utf-8
+import re
+import warnings
+from textwrap import dedent
+
+import depthai as dai
+import pytest
+
+from poe_standalone import script_tools
+
+INDENTED = """
+    import socket
+
+    PORT = 5000
+
+    def unused():
+        '''Never called.'''
+        return 1
+
+    class Server:
+        '''Docstring.'''
+
+        def serve(self):
+            # Comment
+            text = '''
+      kept as written
+            '''
+            return socket.socket(), text
+
+    Server().serve()
+"""
+
+
+def test_check_script_accepts_an_indented_script():
+    script_tools.check_script(INDENTED)
+
+
+def test_check_script_reports_the_line():
+    with pytest.raises(ValueError, match="line 3"):
+        script_tools.check_script("a = 1\n\nb = (\n")
+
+
+def test_minify_drops_docstrings_comments_and_unused_definitions():
+    minified = script_tools.minify(INDENTED)
+    assert "unused" not in minified
+    assert "Docstring" not in minified
+    assert "# Comment" not in minified
+    assert "PORT" not in minified
+    # Strings spanning lines are values, only dedented with the rest of the script
+    assert "\n  kept as written\n        '''" in minified
+    assert minified.startswith("import socket\nclass Server:\n def serve(self):\n")
+    compile(minified, "<minified>", "exec")
+
+
+def test_minify_keeps_a_block_of_only_strings_valid():
+    minified = script_tools.minify("def f():\n    '''Only a docstring.'''\nf()\n")
+    assert minified == "def f():\n pass\nf()\n"
+
+
+def test_minify_keeps_what_is_read_indirectly():
+    minified = script_tools.minify("A = 1\nB = A\ndef f():\n    return B\nf()\n")
+    assert minified == "A = 1\nB = A\ndef f():\n return B\nf()\n"
+
+
+def test_minify_keeps_what_is_only_incremented():
+    source = "n = 0\nwhile True:\n    n += 1\n"
+    assert script_tools.minify(source) == "n = 0\nwhile True:\n n += 1\n"
+
+
+def test_minify_keeps_assignments_reading_names():
+    # Reading an attribute may have side effects
+    assert script_tools.minify("inputs = node.io\nalias = inputs\n") == "inputs = node.io\nalias = inputs\n"
+
+
+def test_minify_doesnt_drop_part_of_a_line():
+    minified = script_tools.minify("def f(): return 1\nx = 1; y = 2\nprint(y)\n")
+    assert "x = 1; y = 2" in minified
+
+
+@pytest.mark.parametrize("minify", ["0", "1"])
+def test_set_script_accepts_an_indented_template(monkeypatch, minify):
+    monkeypatch.setenv(script_tools.MINIFY_ENV, minify)
+    pipeline = dai.Pipeline()
+    script = pipeline.create(dai.node.Script)
+    script_tools.set_script(script, INDENTED, "indented")
+    flashed = bytes(script.getAssetManager().get("__script").data).decode("utf-8")
+    assert flashed == (dedent(INDENTED) if minify == "0" else script_tools.minify(INDENTED))
+    assert script.getScriptName() == "indented"
+
+
+def test_validate_script_accepts_an_indented_script():
+    script_tools.validate_script(INDENTED)
+
+
+def test_validate_script_lists_every_problem():
+    source = """
+        import os
+        from . import sibling
+        HOST_IP = "None"
+        PORT = ${_PORT}
+    """
+    with pytest.raises(ValueError) as info:
+        script_tools.validate_script(source.replace("${_PORT}", "5000"), "script")
+    message = str(info.value)
+    assert message.startswith("Script script is invalid:")
+    assert "os" not in message
+    assert "line 3: relative import" in message
+    assert 'line 4: "None" string' in message
+    with pytest.raises(ValueError, match=r"line 5: unresolved placeholder \$\{_PORT\}"):
+        script_tools.validate_script(source)
+
+
+@pytest.mark.parametrize("line, placeholder", [
+    ("PORT = $PORT", "$PORT"),
+    ("PORT = '${port}'", "${port}"),
+    ("PRICE = '$$5 $$_each'", None),
+    ("PRICE = '5$'", None),
+])
+def test_validate_script_finds_the_template_placeholders(line, placeholder):
+    if placeholder is None:
+        script_tools.validate_script(line)
+    else:
+        with pytest.raises(ValueError, match=f"unresolved placeholder {re.escape(placeholder)}"):
+            script_tools.validate_script(line)
+
+
+def test_validate_script_warns_about_unknown_modules(monkeypatch):
+    script_tools.validate_script("import os\nimport sys\nimport http.server\nfrom urllib.parse import urlparse\n")
+    with pytest.warns(UserWarning, match="line 1: module numpy.linalg isn't known"):
+        script_tools.validate_script("import numpy.linalg\n")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        script_tools.validate_script("import numpy\n", allowed_modules=("numpy",))
+        monkeypatch.setenv(script_tools.MODULES_ENV, "numpy,array")
+        script_tools.validate_script("import numpy.linalg\nimport array\n")
+
+
+def test_validate_pipeline_checks_scripts_set_directly():
+    pipeline = dai.Pipeline()
+    script = pipeline.create(dai.node.Script)
+    # Set like the custom pipelines do, indented and without set_script
+    script.setScript(INDENTED)
+    script_tools.validate_pipeline(pipeline)
+    script.setScript("from . import sibling\n", "direct")
+    with pytest.raises(ValueError, match="Script direct is invalid"):
+        script_tools.validate_pipeline(pipeline)
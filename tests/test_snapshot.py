@@ -0,0 +1,87 @@
+# coding=utf-8
+import threading
+import time
+
+import depthai as dai
+import pytest
+
+from poe_standalone.registry import PipelineRegistry
+
+
+@pytest.fixture
+def snapshot(script_lib):
+    return script_lib("snapshot")
+
+
+def test_latest_value_is_none_until_the_first_publish(snapshot):
+    frames = snapshot.LatestValue()
+    # What multi_protocol_server's /img gets when a client connects before the first frame
+    assert frames.wait(frames.seq, 0.01) == (0, None)
+    frames.publish((1.0, b"jpeg"))
+    assert frames.wait(0, 0.01) == (1, (1.0, b"jpeg"))
+    # Nothing newer, the current value
+    assert frames.wait(1, 0.01) == (1, (1.0, b"jpeg"))
+
+
+def test_latest_value_readers_skip_the_values_they_were_too_slow_for(snapshot):
+    frames = snapshot.LatestValue()
+    for value in range(3):
+        frames.publish(value)
+    assert frames.wait(0) == (3, 2)
+
+
+def test_single_flight_coalesces_concurrent_requests(snapshot):
+    started = threading.Event()
+    release = threading.Event()
+    fetched = []
+
+    def fetch(key):
+        fetched.append(key)
+        started.set()
+        release.wait(1)
+        return f"jpeg {len(fetched)}"
+
+    cache = snapshot.SingleFlight(fetch, max_age_ms=1000)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("full"))) for _ in range(4)]
+    threads[0].start()
+    started.wait(1)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(1)
+    assert fetched == ["full"]
+    assert results == ["jpeg 1"] * 4
+    # Fresh enough for a later request
+    assert cache.get("full") == "jpeg 1"
+
+
+def test_single_flight_fetches_again_once_expired(snapshot):
+    fetched = []
+    cache = snapshot.SingleFlight(lambda key: fetched.append(key) or len(fetched), max_age_ms=0)
+    assert cache.get() == 1
+    time.sleep(0.01)
+    assert cache.get() == 2
+
+
+def test_max_age_ms_reaches_the_script():
+    pipeline = PipelineRegistry(plugins=False, paths=[]).build("script_http_server", 5000, None, None, None,
+                                                               max_age_ms=50, cache_size=2)
+    script = next(node for node in pipeline.getAllNodes() if isinstance(node, dai.node.Script))
+    assert "SingleFlight(capture, 50, size=2)" in bytes(script.getAssetManager().get("__script").data).decode()
+
+
+def test_a_request_without_q_gets_the_first_quality():
+    pipeline = PipelineRegistry(plugins=False, paths=[]).build("script_http_server", 5000, None, None, None,
+                                                               qualities=[90, 60])
+    script = next(node for node in pipeline.getAllNodes() if isinstance(node, dai.node.Script))
+    assert "DEFAULT_QUALITY = 90\n" in bytes(script.getAssetManager().get("__script").data).decode()
+
+
+@pytest.mark.parametrize("qualities", [[], [50, 50], [0], ["80"]])
+def test_bad_qualities_fail_the_build(qualities):
+    with pytest.raises(ValueError, match="qualities must be"):
+        PipelineRegistry(plugins=False, paths=[]).build("script_http_server", 5000, None, None, None,
+                                                        qualities=qualities)
@@ -0,0 +1,64 @@
+# coding=utf-8
+import json
+from functools import partial
+
+import pytest
+from click.testing import CliRunner
+
+from poe_standalone import standalone
+from poe_standalone.dap_cache import DapCache
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    monkeypatch.setattr(standalone, "DapCache", partial(DapCache, tmp_path / "dap"))
+    monkeypatch.chdir(tmp_path)
+
+    def run(*args):
+        return CliRunner().invoke(standalone.cli, args, obj={})
+
+    return run
+
+
+def test_offline_build_needs_the_host_ip_of_tcp_streaming_client(run):
+    result = run("-P", "tcp_streaming_client", "build", "client.dap")
+    assert result.exit_code != 0
+    assert "needs the host IP" in result.output
+
+
+def test_build_manifest_records_the_host_ip_the_package_embeds(run, tmp_path):
+    result = run("-P", "tcp_streaming_client", "--host_ip", "10.0.0.5", "build", "client.dap")
+    assert result.exit_code == 0, result.output
+    manifest = json.loads((tmp_path / "client.dap.json").read_text())
+    assert manifest["host_ip"] == "10.0.0.5"
+    assert manifest["pipeline"] == "tcp_streaming_client"
+    assert (tmp_path / "client.dap").stat().st_size == manifest["size"]
+
+
+def test_build_resolves_the_host_ip_on_the_device_subnet(run, tmp_path):
+    result = run("--device_ip", "127.0.0.1", "-P", "tcp_streaming_client", "build", "client.dap")
+    assert result.exit_code == 0, result.output
+    assert json.loads((tmp_path / "client.dap.json").read_text())["host_ip"] == "127.0.0.1"
+
+
+def test_offline_build_of_a_pipeline_without_host_ip(run, tmp_path):
+    result = run("-P", "script_http_server", "build", "http.dap")
+    assert result.exit_code == 0, result.output
+    assert json.loads((tmp_path / "http.dap.json").read_text())["host_ip"] is None
+
+
+def test_options_are_parsed_as_json_and_recorded(run, tmp_path):
+    result = run("-P", "tcp_streaming_server", "-o", "send_policy=disconnect", "-o", "stall_ms=500", "build", "tcp.dap")
+    assert result.exit_code == 0, result.output
+    manifest = json.loads((tmp_path / "tcp.dap.json").read_text())
+    assert manifest["options"] == {"send_policy": "disconnect", "stall_ms": 500}
+
+
+@pytest.mark.parametrize("option, error", [
+    ("stall_ms", "Expected NAME=VALUE"),
+    ("max_fps=5", "has no option max_fps"),
+])
+def test_bad_options_fail_before_building(run, option, error):
+    result = run("-P", "tcp_streaming_server", "-o", option, "build", "tcp.dap")
+    assert result.exit_code != 0
+    assert error in " ".join(result.output.replace("│", " ").split())
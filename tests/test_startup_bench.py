@@ -0,0 +1,15 @@
+# coding=utf-8
+import subprocess
+import sys
+
+from poe_standalone import startup_bench
+
+
+def test_cli_import_is_lazy():
+    # In a fresh interpreter, the tests already imported depthai and the pipelines
+    startup_bench.run(["-c", startup_bench.LAZINESS_CHECK])
+
+
+def test_importing_the_package_doesnt_import_depthai():
+    code = "import sys, poe_standalone, poe_standalone.utils; print('depthai' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout == "False\n"
@@ -0,0 +1,141 @@
+# coding=utf-8
+import json
+import socket
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+
+class Input:
+    """A non-blocking `node.io` input."""
+
+    def __init__(self):
+        self.messages = []
+
+    def tryGet(self):
+        return self.messages.pop(0) if self.messages else None
+
+
+class Frame:
+    def __init__(self, seq):
+        self.seq = seq
+
+    def getSequenceNum(self):
+        return self.seq
+
+    def getTimestamp(self):
+        return timedelta(seconds=self.seq / 10)
+
+    def getData(self):
+        return b"jpeg %d" % self.seq
+
+
+class Detections:
+    def __init__(self, seq, *detections):
+        self.seq = seq
+        self.detections = [SimpleNamespace(label=label, confidence=confidence, xmin=0.1, ymin=0.2, xmax=0.3, ymax=0.4,
+                                           depth=1000) for label, confidence in detections]
+
+    def getSequenceNum(self):
+        return self.seq
+
+    def getTimestamp(self):
+        return timedelta(seconds=self.seq / 10)
+
+
+@pytest.fixture
+def lib(script_lib):
+    lib = script_lib("framing", "hub", "ring", "rules", "events", "websocket", "yolo_loop")
+    lib.node.io = {"frame": Input(), "detection": Input()}
+    return lib
+
+
+@pytest.fixture
+def make_server(lib):
+    servers = []
+
+    def make_server(rules=(), **kwargs):
+        kwargs.setdefault("frames", lib.FrameRing(10))
+        server = lib.DetectionServer(0, ["person", "car"], list(rules), lib.SendPolicy(depth=10), True,
+                                     http_port=None, ws_port=None, **kwargs)
+        servers.append(server)
+        return server
+
+    yield make_server
+    for server in servers:
+        for client in list(server.hub.clients.values()):
+            server.hub.close(client)
+        server.hub.server.close()
+
+
+def step(lib, server, frames=(), detections=()):
+    lib.node.io["frame"].messages += frames
+    lib.node.io["detection"].messages += detections
+    while lib.node.io["frame"].messages or lib.node.io["detection"].messages:
+        server.step(0)
+
+
+def receive(server, sock):
+    """The (tag, payload) messages the server sends to `sock`."""
+    deadline = time.monotonic() + 0.1
+    while time.monotonic() < deadline:
+        server.step(0.01)
+    sock.settimeout(0.1)
+    data = b""
+    try:
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    except socket.timeout:
+        pass
+    messages = []
+    while data:
+        header, data = data[:32], data[32:]
+        size = int(header[24:])
+        messages.append((header[:6].decode(), data[:size]))
+        data = data[size:]
+    return messages
+
+
+def connect(server):
+    sock = socket.create_connection(server.hub.server.getsockname()[:2])
+    deadline = time.monotonic() + 1
+    while not server.hub.clients and time.monotonic() < deadline:
+        server.step(0.01)
+    return sock
+
+
+def test_frames_and_detections_are_pushed(lib, make_server):
+    server = make_server()
+    sock = connect(server)
+    step(lib, server, [Frame(1)], [Detections(1, (0, 0.9))])
+    messages = receive(server, sock)
+    sock.close()
+    assert messages[0][0] == "DETECT"
+    assert json.loads(messages[0][1]) == [{"seq": 1, "label": "person", "confidence": 0.9, "xmin": 0.1, "ymin": 0.2,
+                                          "xmax": 0.3, "ymax": 0.4}]
+    assert messages[1] == ("FRAME ", b"jpeg 1")
+
+
+def test_fields_add_to_each_detection(lib, make_server):
+    server = make_server(fields=lambda detection: {"z": detection.depth})
+    assert json.loads(server.encode_detections(Detections(1, (1, 0.5))))[0]["z"] == 1000
+
+
+def test_frames_and_rules_keep_up_while_no_client_is_connected(lib, make_server):
+    rules = [{"label": 0, "event": "appear", "confidence": 0.5, "pre": 2, "post": 0}]
+    server = make_server(rules)
+    step(lib, server, [Frame(seq) for seq in range(1, 4)], [Detections(1, (0, 0.9))])
+    assert [frame[0] for frame in server.frames.frames] == [1, 2, 3]
+    sock = connect(server)
+    sock.sendall(b"RANGE 2 3\n")
+    # "person" appeared before the client connected, it doesn't fire again while it stays
+    step(lib, server, [Frame(4)], [Detections(4, (0, 0.9))])
+    tags = sorted(tag for tag, _ in receive(server, sock))
+    sock.close()
+    # No window was opened for frame 4
+    assert tags == ["DETECT", "ENDRNG", "RANGE ", "RANGE "]